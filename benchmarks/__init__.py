@@ -0,0 +1,10 @@
+import os
+import sys
+
+# service modules import each other top level, same as pytest `pythonpath` setting
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "src", "authenv_service"),
+)
+# settings are read from .env.example, same as tests
+os.environ.setdefault("IS_PYTEST", "True")
@@ -0,0 +1,82 @@
+"""
+The service as the load benchmark runs it, with the in memory mongo stand-in
+Seeds a gateway route to the stub upstream, a user to log in as and env props
+Run from project root:
+python -m benchmarks.bench_app --port 9999 --upstream-url http://127.0.0.1:9998
+"""
+
+import argparse
+import time
+
+# constants, main and utils are the service modules, see benchmarks/__init__.py
+import bcrypt
+import constants
+import main
+import utils
+import uvicorn
+from fastapi import FastAPI
+
+from benchmarks.load_bench import BENCH_APPNAME, BENCH_PASSWORD, BENCH_USERNAME
+from benchmarks.stub_mongo import StubMongoClient
+
+
+def seed(mongo_client: StubMongoClient, upstream_url: str):
+    # written straight into the stand-in, so seeding pays no latency
+    mongo_client[constants.ENV_DETAILS_DATABASE][
+        constants.GATEWAY_APP_NAME
+    ].documents.append(
+        {
+            "name": constants.GATEWAY_BASE_URLS.format(constants.APP_ENV),
+            "mapValue": {f"/{BENCH_APPNAME}/": upstream_url},
+        }
+    )
+    mongo_client[constants.ENV_DETAILS_DATABASE][BENCH_APPNAME].documents.extend(
+        {"name": f"prop-{i}", "stringValue": f"value-{i}"} for i in range(20)
+    )
+    mongo_client.user_details.userdetails.documents.append(
+        {
+            "username": BENCH_USERNAME,
+            "firstName": "Bench",
+            "lastName": "User",
+            "status": "ACTIVE",
+            "email": "bench-user@example.com",
+            "phone": "0000000000",
+            "password": bcrypt.hashpw(
+                BENCH_PASSWORD.encode("utf-8"),
+                bcrypt.gensalt(rounds=constants.BCRYPT_ROUNDS),
+            ).decode("utf-8"),
+        }
+    )
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--upstream-url", default="http://127.0.0.1:9998")
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0)
+    # stands for resolving a srv connection string when the client is created
+    parser.add_argument("--mongo-client-ms", type=float, default=0.0)
+    parser.add_argument("--fast-start", action="store_true")
+    args = parser.parse_args()
+
+    mongo_client = StubMongoClient(latency_seconds=args.mongo_latency_ms / 1000)
+    seed(mongo_client, args.upstream_url)
+
+    def startup_db_client(app: FastAPI):
+        time.sleep(args.mongo_client_ms / 1000)
+        app.mongo_client = mongo_client
+
+    # the lifespan connects through utils, so the stand-in is swapped in there
+    utils.startup_db_client = startup_db_client
+    constants.FAST_START = args.fast_start or constants.FAST_START
+    uvicorn.run(
+        main.app,
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main_bench()
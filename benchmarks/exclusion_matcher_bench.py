@@ -0,0 +1,51 @@
+"""
+Per-request cost of the gateway auth exclusion check as the exclusion list grows
+Compares the old linear substring scan over the full url with the compiled matcher
+Run from project root: python -m benchmarks.exclusion_matcher_bench
+"""
+
+import random
+import string
+import timeit
+
+from src.authenv_service.exclusion_matcher import ExclusionMatcher
+
+SIZES = [10, 100, 1_000, 10_000]
+URL = "https://authenv-service.appspot.com/gateway/app-one/api/v1/items/42?page=1"
+PATH = "/gateway/app-one/api/v1/items/42"
+
+
+def exclusions(size: int, rng: random.Random):
+    return [
+        "/{}/tests/{}".format(
+            "".join(rng.choices(string.ascii_lowercase, k=8)),
+            "".join(rng.choices(string.ascii_lowercase, k=6)),
+        )
+        for _ in range(size)
+    ]
+
+
+def linear_scan(auth_exclusions: list[str], url: str):
+    for auth_exclusion in auth_exclusions:
+        if auth_exclusion in url:
+            return True
+    return False
+
+
+def main():
+    rng = random.Random(86)
+    print(f"{'exclusions':>10} | {'linear scan (us)':>16} | {'matcher (us)':>12}")
+    for size in SIZES:
+        auth_exclusions = exclusions(size, rng)
+        matcher = ExclusionMatcher(auth_exclusions)
+        number = 2_000
+        linear = timeit.timeit(lambda: linear_scan(auth_exclusions, URL), number=number)
+        compiled = timeit.timeit(lambda: matcher.matches(PATH), number=number)
+        print(
+            f"{size:>10} | {linear / number * 1e6:>16.2f} "
+            f"| {compiled / number * 1e6:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
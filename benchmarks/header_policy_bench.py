@@ -0,0 +1,93 @@
+"""
+Per-request cost of gateway header filtering, inbound and outbound
+Compares the old lower-casing scan over a restricted list and the loose `x-` test
+with the header policy built once from frozensets
+Most of the response side is httpx decoding the header list, which both pay, and the
+policy keeps the cache headers (Cache-Control, ETag) that the old test dropped
+Run from project root: python -m benchmarks.header_policy_bench
+"""
+
+import timeit
+
+import httpx
+from starlette.datastructures import Headers
+
+from src.authenv_service.header_policy import DEFAULT_HEADER_POLICY
+
+RESTRICTED_HEADERS_LIST = sorted(DEFAULT_HEADER_POLICY.restricted_headers)
+REQUEST_HEADERS = Headers(
+    raw=[
+        (b"host", b"authenv-service.appspot.com"),
+        (b"connection", b"keep-alive"),
+        (b"accept", b"application/json, text/plain, */*"),
+        (b"accept-encoding", b"gzip, deflate, br"),
+        (b"accept-language", b"en-US,en;q=0.9"),
+        (b"authorization", b"Bearer eyJhbGciOiJIUzI1NiJ9.eyJ1c2VybmFtZSI6InUifQ.x"),
+        (b"content-type", b"application/json"),
+        (b"cookie", b"session=abc"),
+        (b"origin", b"https://app-one.example.com"),
+        (b"referer", b"https://app-one.example.com/items"),
+        (b"sec-fetch-mode", b"cors"),
+        (b"user-agent", b"Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36"),
+        (b"x-requested-with", b"XMLHttpRequest"),
+    ]
+)
+RESPONSE_HEADERS = httpx.Headers(
+    {
+        "Content-Type": "application/json",
+        "Content-Length": "2048",
+        "Cache-Control": "max-age=60",
+        "ETag": '"v1"',
+        "Date": "Fri, 16 Oct 2026 00:00:00 GMT",
+        "Server": "gunicorn",
+        "Connection": "keep-alive",
+        "X-Request-Id": "42",
+        "X-Process-Time": "0.01",
+    }
+)
+
+
+def list_request_headers(headers):
+    request_headers = dict()
+    for k, v in headers.items():
+        if k.lower() not in RESTRICTED_HEADERS_LIST:
+            request_headers[k] = v
+    return request_headers
+
+
+def loose_response_headers(headers):
+    response_headers = dict()
+    for k, v in headers.items():
+        if "x-" in k.lower() or k.lower() == "content-type":
+            response_headers[k] = v
+    return response_headers
+
+
+def main():
+    number = 100_000
+    rows = [
+        (
+            "request",
+            lambda: list_request_headers(REQUEST_HEADERS),
+            lambda: DEFAULT_HEADER_POLICY.request_headers(REQUEST_HEADERS.items()),
+        ),
+        (
+            "response",
+            lambda: loose_response_headers(RESPONSE_HEADERS),
+            lambda: DEFAULT_HEADER_POLICY.response_headers(
+                RESPONSE_HEADERS.multi_items()
+            ),
+        ),
+    ]
+    print(f"{'headers':>8} | {'old (us)':>8} | {'policy (us)':>11}")
+    for name, old, policy in rows:
+        old_seconds = timeit.timeit(old, number=number)
+        policy_seconds = timeit.timeit(policy, number=number)
+        print(
+            f"{name:>8} | {old_seconds / number * 1e6:>8.2f} "
+            f"| {policy_seconds / number * 1e6:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
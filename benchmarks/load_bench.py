@@ -0,0 +1,308 @@
+"""
+Load benchmark of the service against a stub upstream and an in memory mongo
+Starts the service and the upstream in their own processes, drives concurrent
+requests at each scenario and reports p50/p95/p99 latency, requests per second
+and the service RSS, results go to a json file to compare between commits
+Run from project root:
+python -m benchmarks.load_bench --duration 10 --concurrency 32 --output new.json
+python -m benchmarks.load_bench --compare old.json new.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional
+
+import constants
+import httpx
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_APPNAME = "bench"
+BENCH_USERNAME = "bench-user"
+BENCH_PASSWORD = "bench-password"
+POST_BODY = json.dumps({"items": "x" * 1000}).encode()
+
+
+class Scenario(NamedTuple):
+    name: str
+    # request number -> httpx.AsyncClient.request kwargs
+    request: Callable[[int], dict]
+
+
+def scenarios(token: str) -> dict[str, Scenario]:
+    basic_auth = (constants.BASIC_AUTH_USR, constants.BASIC_AUTH_PWD)
+    bearer = {"Authorization": f"Bearer {token}"}
+    return {
+        scenario.name: scenario
+        for scenario in (
+            # a query per request, so single flight does not fold them into one
+            Scenario(
+                "gateway_get",
+                lambda i: {
+                    "method": "GET",
+                    "url": f"/gateway/{BENCH_APPNAME}/items?page={i}",
+                    "headers": bearer,
+                },
+            ),
+            Scenario(
+                "gateway_post",
+                lambda i: {
+                    "method": "POST",
+                    "url": f"/gateway/{BENCH_APPNAME}/items",
+                    "headers": {**bearer, "content-type": "application/json"},
+                    "content": POST_BODY,
+                },
+            ),
+            Scenario(
+                "login",
+                lambda i: {
+                    "method": "POST",
+                    "url": "/authenv-service/auth-users/login",
+                    "auth": basic_auth,
+                    "json": {"username": BENCH_USERNAME, "password": BENCH_PASSWORD},
+                },
+            ),
+            Scenario(
+                "profile",
+                lambda i: {
+                    "method": "GET",
+                    "url": f"/authenv-service/auth-users/{BENCH_USERNAME}",
+                    "headers": bearer,
+                },
+            ),
+            Scenario(
+                "env_props",
+                lambda i: {
+                    "method": "GET",
+                    "url": f"/authenv-service/env-props/{BENCH_APPNAME}",
+                    "auth": basic_auth,
+                },
+            ),
+        )
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    concurrency: int,
+    duration_seconds: float,
+) -> dict:
+    latencies = []
+    status_codes = Counter()
+    request_numbers = itertools.count()
+    deadline = time.perf_counter() + duration_seconds
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            request_kwargs = scenario.request(next(request_numbers))
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(**request_kwargs)
+                status_code = str(response.status_code)
+            except httpx.HTTPError as ex:
+                status_code = type(ex).__name__
+            latencies.append(time.perf_counter() - started_at)
+            status_codes[status_code] += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed_seconds = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(n for status, n in status_codes.items() if status != "200"),
+        "status_codes": dict(status_codes),
+        "rps": round(len(latencies) / elapsed_seconds, 1),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "max_ms": percentile_ms(latencies, 100),
+    }
+
+
+def percentile_ms(sorted_values: list[float], percent: float) -> Optional[float]:
+    # nearest rank
+    if not sorted_values:
+        return None
+    rank = max(1, round(percent / 100 * len(sorted_values)))
+    return round(sorted_values[rank - 1] * 1000, 3)
+
+
+def rss_mb(pid: int) -> dict:
+    # linux only, current and peak resident set size of the service process
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status_file:
+            status = dict(line.split(":", 1) for line in status_file if ":" in line)
+    except OSError:
+        return {"rss_mb": None, "peak_rss_mb": None}
+    return {
+        "rss_mb": round(int(status["VmRSS"].split()[0]) / 1024, 1),
+        "peak_rss_mb": round(int(status["VmHWM"].split()[0]) / 1024, 1),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_process(module: str, *args) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", module, *map(str, args)], cwd=PROJECT_ROOT
+    )
+
+
+async def wait_until_up(url: str, process: subprocess.Popen, timeout_seconds=30):
+    deadline = time.perf_counter() + timeout_seconds
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Process exited before it was up: {url}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise TimeoutError(f"Not up after {timeout_seconds} seconds: {url}")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def run(args) -> dict:
+    upstream_port, app_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    upstream = start_process(
+        "benchmarks.stub_upstream",
+        "--port",
+        upstream_port,
+        "--body-bytes",
+        args.upstream_body_bytes,
+        "--latency-ms",
+        args.upstream_latency_ms,
+    )
+    app = start_process(
+        "benchmarks.bench_app",
+        "--port",
+        app_port,
+        "--upstream-url",
+        upstream_url,
+        "--mongo-latency-ms",
+        args.mongo_latency_ms,
+    )
+    try:
+        await wait_until_up(upstream_url, upstream)
+        await wait_until_up(app_url + "/authenv-service/tests/ping", app)
+        results = {}
+        limits = httpx.Limits(
+            max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+        )
+        async with httpx.AsyncClient(
+            base_url=app_url, limits=limits, timeout=30
+        ) as client:
+            response = await client.post(
+                "/authenv-service/auth-users/login",
+                auth=(constants.BASIC_AUTH_USR, constants.BASIC_AUTH_PWD),
+                json={"username": BENCH_USERNAME, "password": BENCH_PASSWORD},
+            )
+            response.raise_for_status()
+            all_scenarios = scenarios(token=response.json()["token"])
+            for name in args.scenarios:
+                scenario = all_scenarios[name]
+                # warms connections, caches and the upstream pool, not counted
+                await run_scenario(
+                    client, scenario, args.concurrency, args.warmup_seconds
+                )
+                result = await run_scenario(
+                    client, scenario, args.concurrency, args.duration
+                )
+                result.update(rss_mb(app.pid))
+                results[name] = result
+                print_result(name, result)
+        return {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "settings": vars(args),
+            "scenarios": results,
+        }
+    finally:
+        for process in (app, upstream):
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name:>12} | {result['rps']:>8.1f} rps | p50 {result['p50_ms']:>8.2f} ms "
+        f"| p95 {result['p95_ms']:>8.2f} ms | p99 {result['p99_ms']:>8.2f} ms "
+        f"| errors {result['errors']:>5} | rss {result['rss_mb']} mb"
+    )
+
+
+def compare(old_file: str, new_file: str):
+    with open(old_file, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_file, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old.get('commit') or old_file} -> {new.get('commit') or new_file}")
+    for name, new_result in new["scenarios"].items():
+        old_result = old["scenarios"].get(name)
+        if old_result is None:
+            continue
+        changes = []
+        for key in ("rps", "p50_ms", "p99_ms", "rss_mb"):
+            if old_result.get(key) and new_result.get(key) is not None:
+                change = (new_result[key] - old_result[key]) / old_result[key] * 100
+                changes.append(f"{key} {change:+6.1f}%")
+        print(f"{name:>12} | " + " | ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--warmup-seconds", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=["gateway_get", "gateway_post", "login", "profile", "env_props"],
+        choices=["gateway_get", "gateway_post", "login", "profile", "env_props"],
+    )
+    parser.add_argument("--upstream-latency-ms", type=float, default=5.0)
+    parser.add_argument("--upstream-body-bytes", type=int, default=2048)
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0)
+    parser.add_argument("--output", default="load_bench_results.json")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = asyncio.run(run(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Cold start benchmark, import time of the service and time to first byte
+Time to first byte is from process start to the first answer of the ping endpoint,
+time to ready is to the first 200 of the ready endpoint, with and without fast start
+Mongo is the in memory stand-in, --mongo-client-ms stands for srv resolution
+Run from project root:
+python -m benchmarks.startup_bench --runs 5 --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.load_bench import PROJECT_ROOT, free_port, git_commit, start_process
+
+IMPORT_SCRIPT = (
+    "import benchmarks, time; started_at = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started_at)"
+)
+
+
+def import_seconds() -> float:
+    # a new interpreter each time, so nothing is imported already
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=PROJECT_ROOT, text=True
+    )
+    return float(output.strip().splitlines()[-1])
+
+
+async def startup_seconds(args, fast_start: bool) -> dict:
+    port = free_port()
+    app_url = f"http://127.0.0.1:{port}"
+    started_at = time.perf_counter()
+    app = start_process(
+        "benchmarks.bench_app",
+        "--port",
+        port,
+        "--mongo-latency-ms",
+        args.mongo_latency_ms,
+        "--mongo-client-ms",
+        args.mongo_client_ms,
+        *(["--fast-start"] if fast_start else []),
+    )
+    first_byte_seconds = ready_seconds = None
+    try:
+        async with httpx.AsyncClient(base_url=app_url) as client:
+            while ready_seconds is None:
+                if process_exited(app) or time.perf_counter() - started_at > 60:
+                    raise RuntimeError("Service exited or timed out before ready")
+                try:
+                    if first_byte_seconds is None:
+                        await client.get("/authenv-service/tests/ping")
+                        first_byte_seconds = time.perf_counter() - started_at
+                    response = await client.get("/authenv-service/tests/ready")
+                    if response.status_code == 200:
+                        ready_seconds = time.perf_counter() - started_at
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.005)
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+    return {"first_byte_seconds": first_byte_seconds, "ready_seconds": ready_seconds}
+
+
+def process_exited(process: subprocess.Popen) -> bool:
+    return process.poll() is not None
+
+
+def summary(values: list[float]) -> dict:
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "min_ms": round(min(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+async def run(args) -> dict:
+    results = {"import": summary([import_seconds() for _ in range(args.runs)])}
+    print(f"{'import':>10} | {results['import']['median_ms']:>8.1f} ms")
+    for mode, fast_start in (("default", False), ("fast_start", True)):
+        runs = [await startup_seconds(args, fast_start) for _ in range(args.runs)]
+        results[mode] = {
+            "first_byte": summary([r["first_byte_seconds"] for r in runs]),
+            "ready": summary([r["ready_seconds"] for r in runs]),
+        }
+        print(
+            f"{mode:>10} | first byte {results[mode]['first_byte']['median_ms']:>8.1f}"
+            f" ms | ready {results[mode]['ready']['median_ms']:>8.1f} ms"
+        )
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "settings": vars(args),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mongo-latency-ms", type=float, default=20.0)
+    parser.add_argument("--mongo-client-ms", type=float, default=500.0)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+In memory stand-in for the AsyncMongoClient, only what the service calls
+Equality filters, projections and $set updates, each call waits latency_seconds
+to stand for the network round trip to a real server
+Change streams are not supported, so the config watcher falls back to polling
+"""
+
+import asyncio
+import copy
+from typing import NamedTuple, Optional
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+
+class InsertOneResult(NamedTuple):
+    inserted_id: object
+
+
+class UpdateResult(NamedTuple):
+    matched_count: int
+    modified_count: int
+    upserted_id: object = None
+
+
+class DeleteResult(NamedTuple):
+    deleted_count: int
+
+
+class StubCursor:
+    def __init__(self, documents: list[dict]):
+        self.__documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return next(self.__documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class StubCollection:
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.unique_keys: set[str] = set()
+        self.documents: list[dict] = []
+        self.calls = 0
+
+    async def create_index(self, keys, unique: bool = False, **kwargs):
+        await self.__round_trip()
+        if unique and isinstance(keys, list) and len(keys) == 1:
+            self.unique_keys.add(keys[0][0])
+        return "_".join(key for key, _ in keys) if isinstance(keys, list) else keys
+
+    async def find_one(self, filter: dict = None, projection: dict = None):
+        await self.__round_trip()
+        for document in self.documents:
+            if self.__matches(document, filter):
+                return self.__project(document, projection)
+        return None
+
+    def find(self, filter: dict = None, projection: dict = None) -> "StubCursor":
+        # a cursor is lazy, the round trip is paid once here for the whole batch
+        documents = [
+            self.__project(document, projection)
+            for document in self.documents
+            if self.__matches(document, filter)
+        ]
+        return StubCursor(documents)
+
+    async def insert_one(self, document: dict) -> InsertOneResult:
+        await self.__round_trip()
+        for key in self.unique_keys:
+            if any(d.get(key) == document.get(key) for d in self.documents):
+                raise DuplicateKeyError(f"duplicate key: {key}")
+        document = copy.deepcopy(document)
+        document.setdefault("_id", len(self.documents) + 1)
+        self.documents.append(document)
+        return InsertOneResult(inserted_id=document["_id"])
+
+    async def update_one(
+        self, filter: dict, update: dict, upsert: bool = False
+    ) -> UpdateResult:
+        await self.__round_trip()
+        for document in self.documents:
+            if self.__matches(document, filter):
+                before = dict(document)
+                document.update(copy.deepcopy(update.get("$set", {})))
+                return UpdateResult(1, int(before != document))
+        if upsert:
+            result = await self.insert_one({**filter, **update.get("$set", {})})
+            return UpdateResult(0, 0, result.inserted_id)
+        return UpdateResult(0, 0)
+
+    async def delete_one(self, filter: dict) -> DeleteResult:
+        await self.__round_trip()
+        for i, document in enumerate(self.documents):
+            if self.__matches(document, filter):
+                del self.documents[i]
+                return DeleteResult(1)
+        return DeleteResult(0)
+
+    async def watch(self, **kwargs):
+        raise OperationFailure("change streams need a replica set", code=40573)
+
+    async def __round_trip(self):
+        self.calls += 1
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+
+    @staticmethod
+    def __matches(document: dict, filter: Optional[dict]) -> bool:
+        return all(document.get(k) == v for k, v in (filter or {}).items())
+
+    @staticmethod
+    def __project(document: dict, projection: Optional[dict]) -> dict:
+        document = copy.deepcopy(document)
+        if not projection:
+            return document
+        included = {k for k, v in projection.items() if v}
+        return {
+            k: v
+            for k, v in document.items()
+            if k in included or (k == "_id" and projection.get("_id", 1))
+        }
+
+
+class StubDatabase:
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.collections: dict[str, StubCollection] = {}
+
+    def __getitem__(self, name: str) -> StubCollection:
+        if name not in self.collections:
+            self.collections[name] = StubCollection(self.latency_seconds)
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> StubCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self) -> list[str]:
+        return list(self.collections)
+
+    async def watch(self, **kwargs):
+        raise OperationFailure("change streams need a replica set", code=40573)
+
+
+class StubMongoClient:
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.databases: dict[str, StubDatabase] = {}
+
+    def __getitem__(self, name: str) -> StubDatabase:
+        if name not in self.databases:
+            self.databases[name] = StubDatabase(self.latency_seconds)
+        return self.databases[name]
+
+    def __getattr__(self, name: str) -> StubDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def calls(self) -> int:
+        return sum(
+            collection.calls
+            for database in self.databases.values()
+            for collection in database.collections.values()
+        )
+
+    async def close(self):
+        pass
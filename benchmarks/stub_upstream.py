@@ -0,0 +1,64 @@
+"""
+Bare ASGI upstream for the load benchmark, so it costs as little as possible
+GET returns a json body of body_bytes, other methods echo the request body back
+Both wait latency_seconds first, to stand for the work a real upstream does
+Run from project root: python -m benchmarks.stub_upstream --port 9998
+"""
+
+import argparse
+import asyncio
+import json
+
+import uvicorn
+
+
+class StubUpstream:
+    def __init__(self, body_bytes: int, latency_seconds: float):
+        self.body = json.dumps({"items": "x" * max(0, body_bytes - 13)}).encode()
+        self.latency_seconds = latency_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+        if scope["method"] == "GET":
+            body = self.body
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9998)
+    parser.add_argument("--body-bytes", type=int, default=2048)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    uvicorn.run(
+        StubUpstream(
+            body_bytes=args.body_bytes, latency_seconds=args.latency_ms / 1000
+        ),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
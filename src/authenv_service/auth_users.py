@@ -1,12 +1,18 @@
 import http
+import logging
 from typing import Optional
 
-import bcrypt
-from fastapi import APIRouter, Depends, Request
+import caches
+import constants
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBasicCredentials
-from pydantic import BaseModel, Field, TypeAdapter
-from pymongo.collection import Collection
+from hashing import check_password, hash_password
+from logger import Logger
+from login_throttle import login_throttle
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.errors import PyMongoError
 from utils import (
     encode_http_auth_credentials,
@@ -18,6 +24,8 @@ from utils import (
     validate_http_basic_credentials,
 )
 
+log = Logger(logging.getLogger(__name__))
+
 router = APIRouter(
     prefix="/authenv-service/auth-users",
     tags=["Users"],
@@ -43,6 +51,24 @@ class UserDetailsInput(UserDetailsOutput):
     )
 
 
+# fetch only the fields the response model uses, password hash only when verifying
+USER_DETAILS_OUTPUT_PROJECTION = {
+    "_id": 0,
+    **{
+        field.alias or name: 1 for name, field in UserDetailsOutput.model_fields.items()
+    },
+}
+USER_DETAILS_PASSWORD_PROJECTION = {**USER_DETAILS_OUTPUT_PROJECTION, "password": 1}
+USER_PASSWORD_PROJECTION = {"_id": 0, "password": 1}
+
+# profiles by username, the password hash is never cached
+user_details_cache = caches.LRUTTLCache(
+    name="user_details",
+    max_size=constants.USER_DETAILS_CACHE_MAX_SIZE,
+    ttl_seconds=constants.USER_DETAILS_CACHE_TTL_SECONDS,
+)
+
+
 class UserDetailsRequest(BaseModel):
     user_details: UserDetailsInput
 
@@ -62,17 +88,32 @@ class LoginResponse(BaseModel):
 
 
 @router.post("/login", response_model=LoginResponse, status_code=http.HTTPStatus.OK)
-def login(
+async def login(
     request: Request,
     login_request: LoginRequest,
     http_basic_credentials: HTTPBasicCredentials = Depends(http_basic_security),
 ):
     validate_http_basic_credentials(request, http_basic_credentials)
-    user_details = __get_user_details(
-        request=request,
-        username=login_request.username,
-        password=login_request.password,
-    )
+    # throttled attempts are turned away before any db or bcrypt work, the others
+    # count as failed until they succeed, so a parallel burst is throttled too
+    login_throttle.reserve(request=request, username=login_request.username)
+    try:
+        user_details = await __get_user_details(
+            request=request,
+            username=login_request.username,
+            password=login_request.password,
+        )
+    except HTTPException as ex:
+        if ex.status_code not in (
+            http.HTTPStatus.UNAUTHORIZED,
+            http.HTTPStatus.NOT_FOUND,
+        ):
+            login_throttle.release(request=request, username=login_request.username)
+        raise
+    except BaseException:
+        login_throttle.release(request=request, username=login_request.username)
+        raise
+    login_throttle.record_success(request=request, username=login_request.username)
     token = encode_http_auth_credentials(
         username=login_request.username, source_ip=request.client.host
     )
@@ -82,7 +123,7 @@ def login(
 @router.post(
     "/{username}", response_model=UserDetailsResponse, status_code=http.HTTPStatus.OK
 )
-def insert(
+async def insert(
     request: Request,
     username: str,
     user_details_request: UserDetailsRequest,
@@ -99,7 +140,7 @@ def insert(
             error="Invalid Request! / Invalid User and/or Password!",
         )
 
-    __insert_user_details(
+    await __insert_user_details(
         request=request, user_details_input=user_details_request.user_details
     )
     return UserDetailsResponse(detail="Insert Successful!")
@@ -108,7 +149,7 @@ def insert(
 @router.put(
     "/{username}", response_model=UserDetailsResponse, status_code=http.HTTPStatus.OK
 )
-def update(
+async def update(
     request: Request,
     username: str,
     user_details_request: UserDetailsRequest,
@@ -122,25 +163,34 @@ def update(
             error="Invalid Request! / Invalid Username!",
         )
 
-    __update_user_details(
+    await __update_user_details(
         request=request, user_details_input=user_details_request.user_details
     )
     return UserDetailsResponse(detail="Update Successful!")
 
 
 @router.get("/{username}", response_model=LoginResponse, status_code=http.HTTPStatus.OK)
-def find(
+async def find(
     request: Request,
     username: str,
     http_auth_credentials: HTTPAuthorizationCredentials = Depends(http_bearer_security),
 ):
     validate_http_auth_credentials(request, http_auth_credentials, username)
-    user_details = __find_user_by_username(request=request, username=username)
+    user_details = await __find_user_details(request=request, username=username)
     return LoginResponse(
         user_details=user_details, token=http_auth_credentials.credentials
     )
 
 
+async def create_indexes(mongo_client: AsyncMongoClient):
+    try:
+        await mongo_client.user_details.userdetails.create_index(
+            [("username", ASCENDING)], unique=True
+        )
+    except PyMongoError as ex:
+        log.error("Error creating user details indexes...", extra=ex)
+
+
 def __user_details_collection(request: Request):
     mongo_client = request.app.mongo_client
     mongo_database = mongo_client.user_details
@@ -148,12 +198,14 @@ def __user_details_collection(request: Request):
     return mongo_collection
 
 
-def __find_user_by_username(request, username, is_include_password=False):
-    mongo_collection: Collection = __user_details_collection(request)
+async def __find_user_by_username(request, username, projection: dict) -> dict:
+    mongo_collection: AsyncCollection = __user_details_collection(request)
 
     user_details = None
     try:
-        user_details = mongo_collection.find_one({"username": username})
+        user_details = await mongo_collection.find_one(
+            {"username": username}, projection=projection
+        )
     except PyMongoError as ex:
         raise_http_exception(
             request=request,
@@ -168,23 +220,44 @@ def __find_user_by_username(request, username, is_include_password=False):
             error="Invalid Request! / Matching User and/or Password Not Found!",
         )
 
-    if is_include_password:
-        return TypeAdapter(UserDetailsInput).validate_python(user_details)
-    else:
-        return TypeAdapter(UserDetailsOutput).validate_python(user_details)
+    return user_details
 
 
-def __get_user_details(request, username, password):
-    user_details = __find_user_by_username(
-        request=request, username=username, is_include_password=True
+async def __find_user_details(request, username) -> UserDetailsOutput:
+    user_details = user_details_cache.get(username)
+    if user_details is None:
+        user_details_document = await __find_user_by_username(
+            request=request,
+            username=username,
+            projection=USER_DETAILS_OUTPUT_PROJECTION,
+        )
+        user_details = UserDetailsOutput.model_validate(user_details_document)
+        user_details_cache.set(username, user_details)
+    return user_details
+
+
+async def __get_user_details(request, username, password):
+    # password hash is never cached, profile is fetched with it only on a cache miss
+    user_details = user_details_cache.get(username)
+    user_details_document = await __find_user_by_username(
+        request=request,
+        username=username,
+        projection=(
+            USER_PASSWORD_PROJECTION
+            if user_details
+            else USER_DETAILS_PASSWORD_PROJECTION
+        ),
     )
 
-    result = bcrypt.checkpw(
-        password=password.encode("utf-8"),
-        hashed_password=user_details.password.encode("utf-8"),
+    hashed_password = user_details_document.get("password")
+    result = hashed_password and await check_password(
+        request=request, password=password, hashed_password=hashed_password
     )
     if result:
-        return TypeAdapter(UserDetailsOutput).validate_python(user_details)
+        if user_details is None:
+            user_details = UserDetailsOutput.model_validate(user_details_document)
+            user_details_cache.set(username, user_details)
+        return user_details
     else:
         raise_http_exception(
             request=request,
@@ -193,16 +266,16 @@ def __get_user_details(request, username, password):
         )
 
 
-def __insert_user_details(request, user_details_input: UserDetailsInput):
-    mongo_collection: Collection = __user_details_collection(request)
-    hashed_password = bcrypt.hashpw(
-        user_details_input.password.encode("utf-8"), bcrypt.gensalt()
+async def __insert_user_details(request, user_details_input: UserDetailsInput):
+    mongo_collection: AsyncCollection = __user_details_collection(request)
+    user_details_input.password = await hash_password(
+        request=request, password=user_details_input.password
     )
-    user_details_input.password = hashed_password
     try:
-        mongo_collection.insert_one(
+        await mongo_collection.insert_one(
             jsonable_encoder(user_details_input, exclude_none=True)
         )
+        user_details_cache.pop(user_details_input.username)
     except PyMongoError as ex:
         raise_http_exception(
             request=request,
@@ -213,20 +286,20 @@ def __insert_user_details(request, user_details_input: UserDetailsInput):
         )
 
 
-def __update_user_details(request, user_details_input: UserDetailsInput):
-    mongo_collection: Collection = __user_details_collection(request)
+async def __update_user_details(request, user_details_input: UserDetailsInput):
+    mongo_collection: AsyncCollection = __user_details_collection(request)
 
     if user_details_input.password:
-        hashed_password = bcrypt.hashpw(
-            user_details_input.password.encode("utf-8"), bcrypt.gensalt()
+        user_details_input.password = await hash_password(
+            request=request, password=user_details_input.password
         )
-        user_details_input.password = hashed_password
 
     try:
-        update_result = mongo_collection.update_one(
+        update_result = await mongo_collection.update_one(
             {"username": user_details_input.username},
             {"$set": jsonable_encoder(obj=user_details_input, exclude_none=True)},
         )
+        user_details_cache.pop(user_details_input.username)
         if update_result.modified_count == 0:
             raise_http_exception(
                 request=request,
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# every cache registers here by name, so its stats can be exposed
+registry: dict[str, "LRUTTLCache"] = {}
+
+
+class LRUTTLCache:
+    """
+    Bounded, thread safe LRU cache where every entry also expires after a ttl
+    """
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.__lock = threading.Lock()
+        registry[name] = self
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key: Hashable, default=None):
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self.__entries[key]
+                self.misses += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value, ttl_seconds: Optional[float] = None):
+        # an entry never lives longer than the cache ttl, but can be shorter
+        ttl = self.ttl_seconds
+        if ttl_seconds is not None:
+            ttl = min(ttl, ttl_seconds)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + ttl
+        with self.__lock:
+            self.__entries[key] = (expires_at, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable):
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+        return None if entry is None else entry[1]
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def set_generation(self, generation):
+        # flushes everything cached under a previous generation (eg: rotated key)
+        if generation != self.generation:
+            with self.__lock:
+                self.__entries.clear()
+                self.generation = generation
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.__entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def stats() -> dict:
+    return {name: cache.stats() for name, cache in registry.items()}
+
+
+def clear_all():
+    # eg: on a cache reset, every cache reloads from the database on next lookup
+    for cache in registry.values():
+        cache.clear()
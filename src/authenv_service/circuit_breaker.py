@@ -0,0 +1,155 @@
+import time
+from collections import deque
+from enum import Enum
+from typing import Optional
+
+import constants
+
+
+class CircuitState(str, Enum):
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """
+    Tracks a sliding window of upstream calls for one appname
+    Opens when the failure rate or slow call rate crosses its threshold, then fails
+    fast until open_seconds pass, when a few probe calls decide to close or reopen
+    Every state change starts a new generation, outcomes of calls allowed in an
+    earlier one are ignored, so a slow call from before a trip is never a probe
+    Only used from the event loop, so it needs no locking
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int,
+        minimum_calls: int,
+        failure_rate_threshold: float,
+        slow_call_rate_threshold: float,
+        slow_call_seconds: float,
+        open_seconds: float,
+        half_open_calls: int,
+    ):
+        self.name = name
+        self.minimum_calls = minimum_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.generation = 0
+        # (is_failure, is_slow) of the most recent calls
+        self.__outcomes: deque[tuple[bool, bool]] = deque(maxlen=window_size)
+        self.__half_open_in_flight = 0
+        self.__half_open_successes = 0
+
+    def allow(self) -> Optional[int]:
+        """
+        Generation to record the call outcome with, None when the call is rejected
+        """
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return None
+            self.__set_state(CircuitState.HALF_OPEN)
+            self.__half_open_in_flight = 0
+            self.__half_open_successes = 0
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self.__half_open_in_flight >= self.half_open_calls:
+                self.rejected += 1
+                return None
+            self.__half_open_in_flight += 1
+        return self.generation
+
+    def record(self, generation: int, is_failure: bool, elapsed_seconds: float):
+        if generation != self.generation:
+            return
+        is_slow = elapsed_seconds >= self.slow_call_seconds
+        if self.state == CircuitState.HALF_OPEN:
+            self.__half_open_in_flight = max(0, self.__half_open_in_flight - 1)
+            if is_failure or is_slow:
+                self.__open()
+            else:
+                self.__half_open_successes += 1
+                if self.__half_open_successes >= self.half_open_calls:
+                    self.__set_state(CircuitState.CLOSED)
+                    self.__outcomes.clear()
+        elif self.state == CircuitState.CLOSED:
+            self.__outcomes.append((is_failure, is_slow))
+            if len(self.__outcomes) >= self.minimum_calls and (
+                self.failure_rate() >= self.failure_rate_threshold
+                or self.slow_call_rate() >= self.slow_call_rate_threshold
+            ):
+                self.__open()
+
+    def release(self, generation: int):
+        # call was abandoned (eg: client went away), count nothing but free the slot
+        if generation == self.generation and self.state == CircuitState.HALF_OPEN:
+            self.__half_open_in_flight = max(0, self.__half_open_in_flight - 1)
+
+    def retry_after_seconds(self) -> int:
+        remaining = self.open_seconds - (time.monotonic() - self.opened_at)
+        return max(1, int(remaining + 0.5))
+
+    def failure_rate(self) -> float:
+        if not self.__outcomes:
+            return 0.0
+        return sum(1 for is_failure, _ in self.__outcomes if is_failure) / len(
+            self.__outcomes
+        )
+
+    def slow_call_rate(self) -> float:
+        if not self.__outcomes:
+            return 0.0
+        return sum(1 for _, is_slow in self.__outcomes if is_slow) / len(
+            self.__outcomes
+        )
+
+    def __open(self):
+        self.__set_state(CircuitState.OPEN)
+        self.opened_at = time.monotonic()
+        self.__outcomes.clear()
+
+    def __set_state(self, state: CircuitState):
+        self.state = state
+        self.generation += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 4),
+            "slow_call_rate": round(self.slow_call_rate(), 4),
+            "calls_in_window": len(self.__outcomes),
+            "rejected": self.rejected,
+        }
+
+
+circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    circuit_breaker = circuit_breakers.get(name)
+    if circuit_breaker is None:
+        circuit_breaker = CircuitBreaker(
+            name=name,
+            window_size=constants.CIRCUIT_BREAKER_WINDOW_SIZE,
+            minimum_calls=constants.CIRCUIT_BREAKER_MINIMUM_CALLS,
+            failure_rate_threshold=constants.CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD,
+            slow_call_rate_threshold=constants.CIRCUIT_BREAKER_SLOW_CALL_RATE_THRESHOLD,
+            slow_call_seconds=constants.CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=constants.CIRCUIT_BREAKER_OPEN_SECONDS,
+            half_open_calls=constants.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+        )
+        circuit_breakers[name] = circuit_breaker
+    return circuit_breaker
+
+
+def stats() -> dict:
+    return {name: cb.stats() for name, cb in circuit_breakers.items()}
@@ -0,0 +1,183 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    # brotli is optional, without it only gzip is offered
+    brotli = None
+
+# bodies of other types (eg: images, archives) are usually compressed already
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "+json",
+    "+xml",
+)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses at or above minimum_size with brotli or gzip, as the
+    client accepts, when nothing upstream set a content-encoding already
+    Streamed responses are compressed chunk by chunk as they go out, each chunk
+    flushed, so a progressive stream (eg: ndjson) is not held back in the compressor
+    Partial (206) and no-transform responses are never touched
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        gzip_level: int,
+        brotli_quality: int,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["method"] != "HEAD":
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+            if encoding is not None:
+                responder = CompressionResponder(self, encoding)
+                await self.app(scope, receive, responder.send(send))
+                return
+        await self.app(scope, receive, send)
+
+    def compressor(self, encoding: str):
+        if encoding == "br":
+            return BrotliCompressor(self.brotli_quality)
+        return GzipCompressor(self.gzip_level)
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self.__compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.__compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.__compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self.__compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.__compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.__compressor.finish()
+
+
+class CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.compressor = None
+        self.is_started = False
+
+    def send(self, send: Send):
+        async def send_compressed(message: Message):
+            await self.__send(send, message)
+
+        return send_compressed
+
+    async def __send(self, send: Send, message: Message):
+        if message["type"] == "http.response.start":
+            # held back until the first body tells if it is worth compressing
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.is_started:
+            self.is_started = True
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if self.__is_compressible(headers, body, more_body):
+                self.compressor = self.middleware.compressor(self.encoding)
+                headers["content-encoding"] = self.encoding
+                headers.add_vary_header("accept-encoding")
+                # the encoded body is no longer byte for byte what a strong etag named
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["etag"] = "W/" + etag
+                message = self.__compress(body, more_body)
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                else:
+                    headers["content-length"] = str(len(message["body"]))
+            await send(self.start_message)
+            await send(message)
+            return
+
+        if self.compressor is not None:
+            message = self.__compress(body, more_body)
+        await send(message)
+
+    def __compress(self, body: bytes, more_body: bool) -> Message:
+        body = self.compressor.compress(body)
+        # flushed, otherwise small chunks wait in the compressor until the end
+        body += self.compressor.flush() if more_body else self.compressor.finish()
+        return {"type": "http.response.body", "body": body, "more_body": more_body}
+
+    def __is_compressible(
+        self, headers: MutableHeaders, body: bytes, more_body: bool
+    ) -> bool:
+        if "content-encoding" in headers or self.start_message["status"] in (204, 304):
+            return False
+        # byte ranges name offsets in the body as it is, not in a compressed one
+        if self.start_message["status"] == 206 or "content-range" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", "").lower():
+            return False
+        content_type = headers.get("content-type", "").lower()
+        if not any(t in content_type for t in COMPRESSIBLE_CONTENT_TYPES):
+            return False
+        content_length = headers.get("content-length", "")
+        if content_length.isdigit():
+            return int(content_length) >= self.middleware.minimum_size
+        # streamed without a length, compress unless it is a single small chunk
+        return more_body or len(body) >= self.middleware.minimum_size
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+    if brotli is not None and qualities.get("br", 0) > 0:
+        return "br"
+    if qualities.get("gzip", qualities.get("*", 0)) > 0:
+        return "gzip"
+    return None
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timezone
+
+import caches
+import constants
+import env_props
+import gateway
+from fastapi import FastAPI
+from logger import Logger
+from pymongo.errors import OperationFailure, PyMongoError
+
+log = Logger(logging.getLogger(__name__))
+
+# eg: standalone server, $changeStream not recognized, missing privilege
+CHANGE_STREAM_UNSUPPORTED_CODES = frozenset([13, 115, 40324, 40573])
+
+
+async def startup_config_watcher(app: FastAPI):
+    app.config_watcher = ConfigWatcher(
+        app=app,
+        poll_interval_seconds=constants.CONFIG_WATCHER_POLL_INTERVAL_SECONDS,
+        poll_jitter_seconds=constants.CONFIG_WATCHER_POLL_JITTER_SECONDS,
+        retry_seconds=constants.CONFIG_WATCHER_RETRY_SECONDS,
+    )
+    await app.config_watcher.start()
+    log.info("Started Config Watcher...")
+
+
+async def shutdown_config_watcher(app: FastAPI):
+    await app.config_watcher.stop()
+    log.info("Stopped Config Watcher...")
+
+
+class ConfigWatcher:
+    """
+    Keeps gateway config and env props caches in sync with the env_details database
+    Uses a change stream on the shared client, falls back to polling with jitter
+    when change streams are not supported (eg: standalone server, missing privilege)
+    Any other failure, eg: history lost or an expired resume token, reopens the stream
+    Cache resets are broadcast through a document in their own collection, watched the
+    same way, so a reset received by one worker process reaches every worker
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        poll_interval_seconds: float,
+        poll_jitter_seconds: float,
+        retry_seconds: float,
+    ):
+        self.app = app
+        self.poll_interval_seconds = poll_interval_seconds
+        self.poll_jitter_seconds = poll_jitter_seconds
+        self.retry_seconds = retry_seconds
+        self.modes = {"env_details": "starting", "resets": "starting"}
+        self.reloads = 0
+        self.resets = 0
+        self.__reset_id = None
+        self.__resume_tokens: dict[str, dict | None] = {}
+        self.__tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        # first load is awaited, so gateway is ready before serving requests
+        await gateway.reload_env_details(mongo_client=self.app.mongo_client)
+        try:
+            # resets before this worker started are already in what it just loaded
+            self.__reset_id = await self.__find_reset_id()
+        except PyMongoError as ex:
+            log.error("Error finding last cache reset...", extra=ex)
+        self.__tasks = [
+            asyncio.create_task(
+                self.__run(
+                    "env_details",
+                    self.__env_details_database,
+                    self.__on_env_details_change,
+                    self.__poll_env_details,
+                ),
+                name="config-watcher",
+            ),
+            asyncio.create_task(
+                self.__run(
+                    "resets",
+                    self.__reset_collection,
+                    self.__on_reset_change,
+                    self.__poll_resets,
+                ),
+                name="config-watcher-resets",
+            ),
+        ]
+
+    async def stop(self):
+        for task in self.__tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.__tasks = []
+
+    async def reset(self):
+        # this worker right away, the others when they see the broadcast
+        await self.__reset_caches()
+        self.__reset_id = uuid.uuid4().hex
+        await self.__reset_collection().update_one(
+            {"name": constants.CACHE_RESET_NAME},
+            {
+                "$set": {
+                    "resetId": self.__reset_id,
+                    "resetAt": datetime.now(timezone.utc),
+                    "resetBy": os.getpid(),
+                }
+            },
+            upsert=True,
+        )
+        log.info("Reset Caches And Broadcast To Workers...")
+
+    async def __run(self, name: str, watched, on_change, poll):
+        # never ends on an error, a dead watcher would keep stale config until restart
+        while True:
+            try:
+                await self.__watch(name, watched(), on_change)
+            except OperationFailure as ex:
+                if ex.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                    log.error("Change stream not supported, polling...", extra=ex)
+                    self.modes[name] = "polling"
+                    await poll()
+                else:
+                    log.error("Change stream failed, reopening...", extra=ex)
+                    self.__resume_tokens.pop(name, None)
+                    await asyncio.sleep(self.__jitter(self.retry_seconds))
+            except Exception as ex:
+                log.error("Change stream interrupted, retrying...", extra=ex)
+                await asyncio.sleep(self.__jitter(self.retry_seconds))
+
+    async def __watch(self, name: str, watched, on_change):
+        async with await watched.watch(
+            resume_after=self.__resume_tokens.get(name)
+        ) as change_stream:
+            self.modes[name] = "change_stream"
+            async for change in change_stream:
+                await on_change(change)
+                # after the change is applied, so a failed reload is seen again
+                self.__resume_tokens[name] = change_stream.resume_token
+
+    async def __on_env_details_change(self, change: dict):
+        app_name = change.get("ns", {}).get("coll")
+        if app_name:
+            await self.__on_change(app_name)
+
+    async def __on_reset_change(self, change: dict):
+        await self.__on_reset(self.__changed_reset_id(change))
+
+    async def __on_change(self, app_name: str):
+        env_props.invalidate_env_details_cache(app_name=app_name)
+        if app_name == constants.GATEWAY_APP_NAME:
+            await gateway.reload_env_details(mongo_client=self.app.mongo_client)
+            self.reloads += 1
+            log.info("Reloaded Gateway Config From Change Stream...")
+
+    async def __on_reset(self, reset_id: str | None):
+        # skips resets already applied, including the ones this worker broadcast
+        if reset_id is not None and reset_id != self.__reset_id:
+            self.__reset_id = reset_id
+            await self.__reset_caches()
+            log.info("Reset Caches From Broadcast...")
+
+    async def __reset_caches(self):
+        caches.clear_all()
+        await gateway.reload_env_details(mongo_client=self.app.mongo_client)
+        self.resets += 1
+
+    def __env_details_database(self):
+        return self.app.mongo_client[constants.ENV_DETAILS_DATABASE]
+
+    def __reset_collection(self):
+        mongo_database = self.app.mongo_client[constants.CACHE_RESETS_DATABASE]
+        return mongo_database[constants.CACHE_RESETS_COLLECTION]
+
+    async def __find_reset_id(self) -> str | None:
+        reset = await self.__reset_collection().find_one(
+            {"name": constants.CACHE_RESET_NAME}
+        )
+        return reset.get("resetId") if reset else None
+
+    @staticmethod
+    def __changed_reset_id(change: dict) -> str | None:
+        # inserts carry the full document, updates only the changed fields
+        reset = change.get("fullDocument") or change.get("updateDescription", {}).get(
+            "updatedFields", {}
+        )
+        return reset.get("resetId")
+
+    async def __poll_env_details(self):
+        while True:
+            await asyncio.sleep(self.__jitter(self.poll_interval_seconds))
+            try:
+                env_details = await env_props.load_env_details(
+                    self.app.mongo_client, app_name=constants.GATEWAY_APP_NAME
+                )
+            except Exception as ex:
+                log.error("Error polling gateway config...", extra=ex)
+                continue
+            # only rebuild when the config actually changed
+            if tuple(env_details) != gateway.route_table.env_details:
+                gateway.apply_env_details(env_details=env_details)
+                self.reloads += 1
+                log.info("Reloaded Gateway Config From Polling...")
+
+    async def __poll_resets(self):
+        while True:
+            await asyncio.sleep(self.__jitter(self.poll_interval_seconds))
+            try:
+                await self.__on_reset(await self.__find_reset_id())
+            except Exception as ex:
+                log.error("Error polling cache resets...", extra=ex)
+
+    def __jitter(self, seconds: float) -> float:
+        return seconds + random.uniform(0, self.poll_jitter_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.modes["env_details"],
+            "reloads": self.reloads,
+            "resets": self.resets,
+        }
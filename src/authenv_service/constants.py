@@ -1,4 +1,3 @@
-import datetime
 import os
 from functools import lru_cache
 
@@ -12,37 +11,76 @@ GATEWAY_AUTH_EXCLUSIONS = "authExclusions"
 GATEWAY_AUTH_CONFIGS = "authConfigs"
 GATEWAY_ROUTE_PATHS = "routePaths"
 GATEWAY_BASE_URLS = "baseUrls_{}"
-SCHEDULER_ENV_DETAILS_EXECUTE_TIME = [
-    datetime.time(0, 0, 1).strftime("%H:%M:%S"),
-    datetime.time(6, 0, 1).strftime("%H:%M:%S"),
-    datetime.time(12, 0, 1).strftime("%H:%M:%S"),
-    datetime.time(6, 0, 1).strftime("%H:%M:%S"),
-]
+GATEWAY_LOAD_BALANCERS = "loadBalancers"
+GATEWAY_RESPONSE_CACHES = "responseCaches"
+GATEWAY_HEADER_POLICIES = "headerPolicies"
+GATEWAY_RATE_LIMITS = "rateLimits"
+GATEWAY_APP_NAME = "app_authgateway"
+ENV_DETAILS_DATABASE = "env_details"
+# a reset in one worker is written here, the config watcher of every worker sees it
+# not in env_details, where every collection is an app of env props
+CACHE_RESETS_DATABASE = "gateway"
+CACHE_RESETS_COLLECTION = "cache_resets"
+CACHE_RESET_NAME = "cacheReset"
+RATE_LIMITS_DATABASE = "gateway"
+RATE_LIMITS_COLLECTION = "rate_limits"
+# hop-by-hop headers only apply to a single connection, never forwarded either way
+HOP_BY_HOP_HEADERS = frozenset(
+    [
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "proxy-connection",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+    ]
+)
 # https://github.com/bibekaryal86/pets-gateway-simple/blob/main/app/src/main/java/pets/gateway/app/util/Util.java#L42
-RESTRICTED_HEADERS = [
-    "accept-charset",
-    "accept-encoding",
-    "access-control-request-headers",
-    "access-control-request-method",
-    "connection",
-    "content-length",
-    "cookie",
-    "cookie2",
-    "content-transfer-encoding",
-    "date",
-    "expect",
-    "host",
-    "keep-alive",
-    "origin",
-    "referer",
-    "te",
-    "trailer",
-    "transfer-encoding",
-    "upgrade",
-    "user-agent",
-    "via",
-    "authorization",  # auth is set separately using auth parameter
-]
+RESTRICTED_HEADERS = HOP_BY_HOP_HEADERS | frozenset(
+    [
+        "accept-charset",
+        "access-control-request-headers",
+        "access-control-request-method",
+        "content-length",
+        "cookie",
+        "cookie2",
+        "content-transfer-encoding",
+        "date",
+        "expect",
+        "host",
+        "origin",
+        "referer",
+        "user-agent",
+        "via",
+        "authorization",  # auth is set separately using auth parameter
+    ]
+)
+# upstream response headers sent back to the client, besides custom `x-` headers
+# bodies are passed through raw, so content-length still matches, the compression
+# middleware drops it when it re-encodes a body
+RESPONSE_HEADERS = frozenset(
+    [
+        "accept-ranges",
+        "cache-control",
+        "content-disposition",
+        "content-encoding",
+        "content-language",
+        "content-length",
+        "content-range",
+        "content-type",
+        "etag",
+        "expires",
+        "last-modified",
+        "location",
+        "retry-after",
+        "vary",
+        "www-authenticate",
+    ]
+)
+RESPONSE_HEADER_PREFIXES = ("x-",)
 
 
 # ENVIRONMENT VARIABLES
@@ -52,6 +90,92 @@ class Settings(BaseSettings):
     else:
         model_config = SettingsConfigDict(env_file=".env", extra="allow")
 
+    # worker processes, each with its own caches and its own mongodb client
+    app_workers: int = 1
+    # fast start, serve right away and warm up mongodb and caches in the background
+    fast_start: bool = False
+    fast_start_wait_seconds: float = 10.0
+    fast_start_retry_seconds: float = 5.0
+    # mongodb client pool, all optional
+    mongodb_max_pool_size: int = 50
+    mongodb_min_pool_size: int = 0
+    mongodb_max_idle_time_ms: int = 60000
+    mongodb_server_selection_timeout_ms: int = 5000
+    mongodb_connect_timeout_ms: int = 5000
+    # gateway circuit breaker, per appname
+    circuit_breaker_window_size: int = 20
+    circuit_breaker_minimum_calls: int = 10
+    circuit_breaker_failure_rate_threshold: float = 0.5
+    circuit_breaker_slow_call_rate_threshold: float = 0.8
+    circuit_breaker_slow_call_seconds: float = 5.0
+    circuit_breaker_open_seconds: float = 30.0
+    circuit_breaker_half_open_calls: int = 3
+    # gateway config watcher
+    config_watcher_poll_interval_seconds: float = 30.0
+    config_watcher_poll_jitter_seconds: float = 5.0
+    config_watcher_retry_seconds: float = 5.0
+    # gateway proxy engine
+    gateway_max_connections: int = 100
+    gateway_max_keepalive_connections: int = 20
+    gateway_keepalive_expiry: float = 30.0
+    gateway_connect_timeout: float = 5.0
+    gateway_read_timeout: float = 30.0
+    gateway_http2: bool = True
+    # gateway load balancing and health checks, for routes with many base urls
+    gateway_load_balancer_strategy: str = "round_robin"
+    gateway_ewma_alpha: float = 0.3
+    gateway_health_check_path: str = "tests/ping"
+    gateway_health_check_interval_seconds: float = 10.0
+    gateway_health_check_timeout_seconds: float = 2.0
+    gateway_health_check_unhealthy_threshold: int = 2
+    gateway_health_check_healthy_threshold: int = 1
+    # gateway response cache, only for routes opted in via env details
+    gateway_response_cache_max_size: int = 1000
+    gateway_response_cache_ttl_seconds: float = 300.0
+    gateway_response_cache_max_body_bytes: int = 262144
+    # gateway single flight, identical GETs in flight wait for one upstream call
+    gateway_single_flight_max_wait_seconds: float = 5.0
+    gateway_single_flight_max_body_bytes: int = 262144
+    # gateway rate limits, "memory" per process or "mongo" shared by all processes
+    rate_limit_store: str = "memory"
+    rate_limit_max_keys: int = 100000
+    # response compression, when upstream did not compress already
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    # verified jwt cache
+    token_cache_max_size: int = 10000
+    token_cache_ttl_seconds: float = 300.0
+    # user profile cache
+    user_details_cache_max_size: int = 1000
+    user_details_cache_ttl_seconds: float = 300.0
+    # env props cache
+    env_details_cache_max_size: int = 100
+    env_details_cache_ttl_seconds: float = 60.0
+    # login throttling, failed attempts by username and by source ip
+    login_throttle_window_seconds: float = 900.0
+    login_throttle_user_delay_after: int = 3
+    login_throttle_user_lockout_after: int = 10
+    login_throttle_ip_delay_after: int = 10
+    login_throttle_ip_lockout_after: int = 50
+    login_throttle_base_delay_seconds: float = 1.0
+    login_throttle_max_delay_seconds: float = 60.0
+    login_throttle_lockout_seconds: float = 900.0
+    login_throttle_max_keys: int = 100000
+    # logging, "text" or "json" lines, written by one background thread
+    log_format: str = "text"
+    log_timezone: str = "America/Denver"
+    log_queue_max_size: int = 10000
+    # tracing, spans are exported to "none", "memory" or a json lines "file"
+    trace_exporter: str = "none"
+    trace_file: str = ""
+    trace_memory_max_spans: int = 10000
+    # bcrypt hashing executor
+    bcrypt_rounds: int = 12
+    hashing_max_workers: int = 2
+    hashing_max_queue_depth: int = 16
+    hashing_retry_after_seconds: int = 1
+
 
 @lru_cache()
 def get_settings():
@@ -65,6 +189,93 @@ MONGODB_USR_PWD = get_settings().mongodb_usr_pwd
 BASIC_AUTH_USR = get_settings().basic_auth_usr
 BASIC_AUTH_PWD = get_settings().basic_auth_pwd
 REPO_HOME = get_settings().repo_home
+APP_WORKERS = get_settings().app_workers
+FAST_START = get_settings().fast_start
+FAST_START_WAIT_SECONDS = get_settings().fast_start_wait_seconds
+FAST_START_RETRY_SECONDS = get_settings().fast_start_retry_seconds
+MONGODB_MAX_POOL_SIZE = get_settings().mongodb_max_pool_size
+MONGODB_MIN_POOL_SIZE = get_settings().mongodb_min_pool_size
+MONGODB_MAX_IDLE_TIME_MS = get_settings().mongodb_max_idle_time_ms
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = get_settings().mongodb_server_selection_timeout_ms
+MONGODB_CONNECT_TIMEOUT_MS = get_settings().mongodb_connect_timeout_ms
+CIRCUIT_BREAKER_WINDOW_SIZE = get_settings().circuit_breaker_window_size
+CIRCUIT_BREAKER_MINIMUM_CALLS = get_settings().circuit_breaker_minimum_calls
+CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD = (
+    get_settings().circuit_breaker_failure_rate_threshold
+)
+CIRCUIT_BREAKER_SLOW_CALL_RATE_THRESHOLD = (
+    get_settings().circuit_breaker_slow_call_rate_threshold
+)
+CIRCUIT_BREAKER_SLOW_CALL_SECONDS = get_settings().circuit_breaker_slow_call_seconds
+CIRCUIT_BREAKER_OPEN_SECONDS = get_settings().circuit_breaker_open_seconds
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = get_settings().circuit_breaker_half_open_calls
+CONFIG_WATCHER_POLL_INTERVAL_SECONDS = (
+    get_settings().config_watcher_poll_interval_seconds
+)
+CONFIG_WATCHER_POLL_JITTER_SECONDS = get_settings().config_watcher_poll_jitter_seconds
+CONFIG_WATCHER_RETRY_SECONDS = get_settings().config_watcher_retry_seconds
+GATEWAY_MAX_CONNECTIONS = get_settings().gateway_max_connections
+GATEWAY_MAX_KEEPALIVE_CONNECTIONS = get_settings().gateway_max_keepalive_connections
+GATEWAY_KEEPALIVE_EXPIRY = get_settings().gateway_keepalive_expiry
+GATEWAY_CONNECT_TIMEOUT = get_settings().gateway_connect_timeout
+GATEWAY_READ_TIMEOUT = get_settings().gateway_read_timeout
+GATEWAY_HTTP2 = get_settings().gateway_http2
+GATEWAY_LOAD_BALANCER_STRATEGY = get_settings().gateway_load_balancer_strategy
+GATEWAY_EWMA_ALPHA = get_settings().gateway_ewma_alpha
+GATEWAY_HEALTH_CHECK_PATH = get_settings().gateway_health_check_path
+GATEWAY_HEALTH_CHECK_INTERVAL_SECONDS = (
+    get_settings().gateway_health_check_interval_seconds
+)
+GATEWAY_HEALTH_CHECK_TIMEOUT_SECONDS = (
+    get_settings().gateway_health_check_timeout_seconds
+)
+GATEWAY_HEALTH_CHECK_UNHEALTHY_THRESHOLD = (
+    get_settings().gateway_health_check_unhealthy_threshold
+)
+GATEWAY_HEALTH_CHECK_HEALTHY_THRESHOLD = (
+    get_settings().gateway_health_check_healthy_threshold
+)
+GATEWAY_RESPONSE_CACHE_MAX_SIZE = get_settings().gateway_response_cache_max_size
+GATEWAY_RESPONSE_CACHE_TTL_SECONDS = get_settings().gateway_response_cache_ttl_seconds
+GATEWAY_RESPONSE_CACHE_MAX_BODY_BYTES = (
+    get_settings().gateway_response_cache_max_body_bytes
+)
+GATEWAY_SINGLE_FLIGHT_MAX_WAIT_SECONDS = (
+    get_settings().gateway_single_flight_max_wait_seconds
+)
+GATEWAY_SINGLE_FLIGHT_MAX_BODY_BYTES = (
+    get_settings().gateway_single_flight_max_body_bytes
+)
+RATE_LIMIT_STORE = get_settings().rate_limit_store
+RATE_LIMIT_MAX_KEYS = get_settings().rate_limit_max_keys
+COMPRESSION_MINIMUM_SIZE = get_settings().compression_minimum_size
+COMPRESSION_GZIP_LEVEL = get_settings().compression_gzip_level
+COMPRESSION_BROTLI_QUALITY = get_settings().compression_brotli_quality
+TOKEN_CACHE_MAX_SIZE = get_settings().token_cache_max_size
+TOKEN_CACHE_TTL_SECONDS = get_settings().token_cache_ttl_seconds
+USER_DETAILS_CACHE_MAX_SIZE = get_settings().user_details_cache_max_size
+USER_DETAILS_CACHE_TTL_SECONDS = get_settings().user_details_cache_ttl_seconds
+ENV_DETAILS_CACHE_MAX_SIZE = get_settings().env_details_cache_max_size
+ENV_DETAILS_CACHE_TTL_SECONDS = get_settings().env_details_cache_ttl_seconds
+LOGIN_THROTTLE_WINDOW_SECONDS = get_settings().login_throttle_window_seconds
+LOGIN_THROTTLE_USER_DELAY_AFTER = get_settings().login_throttle_user_delay_after
+LOGIN_THROTTLE_USER_LOCKOUT_AFTER = get_settings().login_throttle_user_lockout_after
+LOGIN_THROTTLE_IP_DELAY_AFTER = get_settings().login_throttle_ip_delay_after
+LOGIN_THROTTLE_IP_LOCKOUT_AFTER = get_settings().login_throttle_ip_lockout_after
+LOGIN_THROTTLE_BASE_DELAY_SECONDS = get_settings().login_throttle_base_delay_seconds
+LOGIN_THROTTLE_MAX_DELAY_SECONDS = get_settings().login_throttle_max_delay_seconds
+LOGIN_THROTTLE_LOCKOUT_SECONDS = get_settings().login_throttle_lockout_seconds
+LOGIN_THROTTLE_MAX_KEYS = get_settings().login_throttle_max_keys
+LOG_FORMAT = get_settings().log_format
+LOG_TIMEZONE = get_settings().log_timezone
+LOG_QUEUE_MAX_SIZE = get_settings().log_queue_max_size
+TRACE_EXPORTER = get_settings().trace_exporter
+TRACE_FILE = get_settings().trace_file
+TRACE_MEMORY_MAX_SPANS = get_settings().trace_memory_max_spans
+BCRYPT_ROUNDS = get_settings().bcrypt_rounds
+HASHING_MAX_WORKERS = get_settings().hashing_max_workers
+HASHING_MAX_QUEUE_DEPTH = get_settings().hashing_max_queue_depth
+HASHING_RETRY_AFTER_SECONDS = get_settings().hashing_retry_after_seconds
 
 
 # startup
@@ -1,10 +1,16 @@
+import hashlib
 import http
-from typing import Optional
+import logging
+from typing import NamedTuple, Optional
 
-from fastapi import APIRouter, Depends, Request
+import caches
+import constants
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.security import HTTPBasicCredentials
+from logger import Logger
 from pydantic import BaseModel, Field, TypeAdapter
-from pymongo.collection import Collection
+from pymongo import ASCENDING, AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.errors import PyMongoError
 from utils import (
     get_err_msg,
@@ -13,6 +19,8 @@ from utils import (
     validate_http_basic_credentials,
 )
 
+log = Logger(logging.getLogger(__name__))
+
 router = APIRouter(prefix="/authenv-service/env-props", tags=["Env Properties"])
 
 
@@ -23,40 +31,70 @@ class EnvDetails(BaseModel):
     map_value: Optional[dict] = Field(alias="mapValue", default={})
 
 
+ENV_DETAILS_PROJECTION = {
+    "_id": 0,
+    **{field.alias or name: 1 for name, field in EnvDetails.model_fields.items()},
+}
+
+
 class EnvDetailsResponse(BaseModel):
     msg: Optional[str] = None
 
 
+class EnvDetailsCacheEntry(NamedTuple):
+    etag: str
+    body: bytes
+
+
+ENV_DETAILS_LIST_ADAPTER = TypeAdapter(list[EnvDetails])
+# serialized property list per app, the etag is a hash of it, so every worker and
+# restart gives the same etag for the same content
+env_details_cache = caches.LRUTTLCache(
+    name="env_details",
+    max_size=constants.ENV_DETAILS_CACHE_MAX_SIZE,
+    ttl_seconds=constants.ENV_DETAILS_CACHE_TTL_SECONDS,
+)
+# app collections known to have the unique name index, new ones get it on first save
+indexed_app_names: set[str] = set()
+
+
 @router.get(
     "/{appname}", response_model=list[EnvDetails], status_code=http.HTTPStatus.OK
 )
-def find(
+async def find(
     request: Request,
     appname: str,
     http_basic_credentials: HTTPBasicCredentials = Depends(http_basic_security),
 ):
     validate_http_basic_credentials(request, http_basic_credentials)
-    return __find_env_details(request, app_name=appname)
+    env_details_entry = await __find_env_details_cached(request, app_name=appname)
+    headers = {"ETag": env_details_entry.etag, "Cache-Control": "no-cache"}
+    if __is_not_modified(request, env_details_entry.etag):
+        return Response(status_code=http.HTTPStatus.NOT_MODIFIED, headers=headers)
+    return Response(
+        content=env_details_entry.body, media_type="application/json", headers=headers
+    )
 
 
-def find_internal(
+async def find_internal(
     request: Request,
     appname: str,
 ):
-    return __find_env_details(request, app_name=appname)
+    return await __find_env_details(request, app_name=appname)
 
 
 @router.post(
     "/{appname}", response_model=EnvDetailsResponse, status_code=http.HTTPStatus.CREATED
 )
-def save(
+async def save(
     request: Request,
     appname: str,
     env_detail: EnvDetails,
     http_basic_credentials: HTTPBasicCredentials = Depends(http_basic_security),
 ):
     validate_http_basic_credentials(request, http_basic_credentials)
-    __save_env_details(request=request, app_name=appname, env_detail=env_detail)
+    await __save_env_details(request=request, app_name=appname, env_detail=env_detail)
+    invalidate_env_details_cache(app_name=appname)
     return EnvDetailsResponse(msg="Saved Successfully!")
 
 
@@ -65,17 +103,36 @@ def save(
     response_model=EnvDetailsResponse,
     status_code=http.HTTPStatus.ACCEPTED,
 )
-def remove(
+async def remove(
     request: Request,
     appname: str,
     propname: str,
     http_basic_credentials: HTTPBasicCredentials = Depends(http_basic_security),
 ):
     validate_http_basic_credentials(request, http_basic_credentials)
-    __remove_env_details(request=request, app_name=appname, prop_name=propname)
+    await __remove_env_details(request=request, app_name=appname, prop_name=propname)
+    invalidate_env_details_cache(app_name=appname)
     return EnvDetailsResponse(msg="Removed Successfully")
 
 
+async def create_indexes(mongo_client: AsyncMongoClient):
+    mongo_database = mongo_client.env_details
+    try:
+        for app_name in await mongo_database.list_collection_names():
+            await __create_name_index(mongo_database[app_name], app_name=app_name)
+    except PyMongoError as ex:
+        log.error("Error creating env details indexes...", extra=ex)
+
+
+async def __create_name_index(mongo_collection: AsyncCollection, app_name: str):
+    await mongo_collection.create_index([("name", ASCENDING)], unique=True)
+    indexed_app_names.add(app_name)
+
+
+def invalidate_env_details_cache(app_name: str):
+    env_details_cache.pop(app_name)
+
+
 def __env_details_collection(request: Request, app_name: str):
     mongo_client = request.app.mongo_client
     mongo_database = mongo_client.env_details
@@ -83,18 +140,23 @@ def __env_details_collection(request: Request, app_name: str):
     return mongo_collection
 
 
-def __find_env_details(request, app_name):
-    mongo_collection: Collection = __env_details_collection(
-        request=request, app_name=app_name
-    )
+async def load_env_details(
+    mongo_client: AsyncMongoClient, app_name: str
+) -> list[EnvDetails]:
+    # no request, for background tasks, mongodb errors are raised as they are
+    mongo_collection: AsyncCollection = mongo_client.env_details[app_name]
     env_details_output: list[EnvDetails] = []
+    env_details = mongo_collection.find(projection=ENV_DETAILS_PROJECTION)
+    env_details_type_adapter = TypeAdapter(EnvDetails)
+    async for env_detail in env_details:
+        env_detail_output = env_details_type_adapter.validate_python(env_detail)
+        env_details_output.append(env_detail_output)
+    return env_details_output
+
+
+async def __find_env_details(request, app_name):
     try:
-        env_details = mongo_collection.find()
-        env_details_type_adapter = TypeAdapter(EnvDetails)
-        for env_detail in env_details:
-            env_detail_output = env_details_type_adapter.validate_python(env_detail)
-            env_details_output.append(env_detail_output)
-        return env_details_output
+        return await load_env_details(request.app.mongo_client, app_name=app_name)
     except PyMongoError as ex:
         raise_http_exception(
             request=request,
@@ -103,17 +165,22 @@ def __find_env_details(request, app_name):
         )
 
 
-def __save_env_details(request, app_name, env_detail):
-    mongo_collection: Collection = __env_details_collection(
+async def __save_env_details(request, app_name, env_detail):
+    mongo_collection: AsyncCollection = __env_details_collection(
         request=request, app_name=app_name
     )
+    if app_name not in indexed_app_names:
+        try:
+            # created after startup, index it before its first document is written
+            await __create_name_index(mongo_collection, app_name=app_name)
+        except PyMongoError as ex:
+            log.error("Error creating env details index: [ %s ]", app_name, extra=ex)
     try:
         document_filter = {"name": env_detail.name}
         document_value = __get_document_value_for_upsert(env_detail)
-        mongo_collection.update_one(
+        await mongo_collection.update_one(
             filter=document_filter, update=document_value, upsert=True
         )
-        return __find_env_details(request=request, app_name=app_name)
     except PyMongoError as ex:
         raise_http_exception(
             request=request,
@@ -122,19 +189,18 @@ def __save_env_details(request, app_name, env_detail):
         )
 
 
-def __remove_env_details(request, app_name, prop_name):
-    mongo_collection: Collection = __env_details_collection(
+async def __remove_env_details(request, app_name, prop_name):
+    mongo_collection: AsyncCollection = __env_details_collection(
         request=request, app_name=app_name
     )
     try:
-        delete_result = mongo_collection.delete_one({"name": prop_name})
+        delete_result = await mongo_collection.delete_one({"name": prop_name})
         if delete_result.deleted_count == 0:
             raise_http_exception(
                 request=request,
                 status_code=http.HTTPStatus.NOT_FOUND,
                 error=f"Prop Not Found: {app_name} -- {prop_name}",
             )
-        return __find_env_details(request=request, app_name=app_name)
     except PyMongoError as ex:
         raise_http_exception(
             request=request,
@@ -143,6 +209,29 @@ def __remove_env_details(request, app_name, prop_name):
         )
 
 
+async def __find_env_details_cached(request, app_name) -> EnvDetailsCacheEntry:
+    env_details_entry = env_details_cache.get(app_name)
+    if env_details_entry is None:
+        env_details = await __find_env_details(request=request, app_name=app_name)
+        body = ENV_DETAILS_LIST_ADAPTER.dump_json(env_details, by_alias=True)
+        env_details_entry = EnvDetailsCacheEntry(
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', body=body
+        )
+        env_details_cache.set(app_name, env_details_entry)
+    return env_details_entry
+
+
+def __is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
 def __get_document_value_for_upsert(env_detail: EnvDetails):
     document_value = {}
     document_value_set = {"name": env_detail.name}
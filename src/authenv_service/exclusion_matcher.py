@@ -0,0 +1,58 @@
+from collections import deque
+from typing import Iterable
+
+
+class ExclusionMatcher:
+    """
+    Aho-Corasick automaton over the gateway auth exclusions
+    Matches if any exclusion is a substring of the request path (query is not checked)
+    Cost per request depends on the length of the path, not the number of exclusions
+    """
+
+    def __init__(self, exclusions: Iterable[str] = ()):
+        self.exclusions = tuple(exclusion for exclusion in exclusions if exclusion)
+        self.__goto: list[dict[str, int]] = [{}]
+        self.__is_match: list[bool] = [False]
+        self.__fail: list[int] = [0]
+
+        for exclusion in self.exclusions:
+            state = 0
+            for char in exclusion:
+                next_state = self.__goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.__goto)
+                    self.__goto.append({})
+                    self.__is_match.append(False)
+                    self.__fail.append(0)
+                    self.__goto[state][char] = next_state
+                state = next_state
+            self.__is_match[state] = True
+
+        # breadth first, so fail links of shallower states are set before deeper ones
+        queue = deque(self.__goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.__goto[state].items():
+                queue.append(next_state)
+                fail_state = self.__fail[state]
+                while fail_state and char not in self.__goto[fail_state]:
+                    fail_state = self.__fail[fail_state]
+                self.__fail[next_state] = self.__goto[fail_state].get(char, 0)
+                if self.__is_match[self.__fail[next_state]]:
+                    self.__is_match[next_state] = True
+
+    def __len__(self):
+        return len(self.exclusions)
+
+    def matches(self, path: str) -> bool:
+        goto = self.__goto
+        fail = self.__fail
+        is_match = self.__is_match
+        state = 0
+        for char in path:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if is_match[state]:
+                return True
+        return False
@@ -1,51 +1,166 @@
 import http
-import json
 import logging
-import random
-import re
 import time
-from typing import Callable, Optional
+from typing import AsyncIterator, Callable, NamedTuple
 
-import requests
+import httpx
+import metrics
+from circuit_breaker import get_circuit_breaker
 from constants import (
     APP_ENV,
-    GATEWAY_AUTH_CONFIGS,
-    GATEWAY_AUTH_EXCLUSIONS,
-    GATEWAY_BASE_URLS,
-    RESTRICTED_HEADERS,
+    GATEWAY_APP_NAME,
+    GATEWAY_SINGLE_FLIGHT_MAX_BODY_BYTES,
+    GATEWAY_SINGLE_FLIGHT_MAX_WAIT_SECONDS,
 )
-from env_props import EnvDetails, find_internal
+from env_props import EnvDetails, find_internal, load_env_details
 from fastapi import APIRouter, HTTPException, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRoute
 from fastapi.security import HTTPAuthorizationCredentials
+from load_balancer import Target, choose_target
 from logger import Logger
-from utils import get_trace_int, raise_http_exception, validate_http_auth_credentials
+from response_cache import CachedResponse, cache_key, response_cache
+from route_table import EMPTY_ROUTE_TABLE, Route, RouteTable, build_route_table
+from singleflight import SingleFlight
+from starlette.background import BackgroundTask
+from tracing import get_trace_id, tracer
+from utils import raise_http_exception, validate_http_auth_credentials
 
 log = Logger(logging.getLogger(__name__))
 
+# the response depends on more than the url, eg: a 206 part or a 304, not shared
+SINGLE_FLIGHT_SKIP_HEADERS = ("range", "if-range", "if-none-match", "if-modified-since")
+
 
 class GatewayAPIRoute(APIRoute):
     def get_route_handler(self) -> Callable:
         original_route_handler = super().get_route_handler()
 
         async def log_auth_filter_handler(request: Request) -> Response:
-            start_time = time.time()
-            request.state.trace_int = random.randint(1000, 9999)
-            if request.method != http.HTTPMethod.OPTIONS:
-                log.info(
-                    f"[ {request.state.trace_int} ] | REQUEST::: Incoming: "
-                    f"[ {request.url} ] | Method: [ {request.method} ]"
-                )
-                validate_request_header_auth(request)
-                # response is logged in __gateway method below
-            response = await original_route_handler(request)
-            end_time = time.time() - start_time
+            start_time = time.perf_counter()
+            request.state.upstream_seconds = 0.0
+            if request.method == http.HTTPMethod.OPTIONS:
+                response = await original_route_handler(request)
+            else:
+                # continues the caller trace from its traceparent, or starts one
+                with tracer.span(request, "gateway", method=request.method) as span:
+                    response = await self.__handle(
+                        request, original_route_handler, start_time
+                    )
+                    span.attributes["status"] = response.status_code
+            end_time = time.perf_counter() - start_time
             response.headers["x-process-time"] = str(end_time)
             return response
 
         return log_auth_filter_handler
 
+    @staticmethod
+    async def __handle(
+        request: Request, original_route_handler: Callable, start_time: float
+    ) -> Response:
+        log.info(
+            "[ %s ] | REQUEST::: Incoming: [ %s ] | Method: [ %s ]",
+            get_trace_id(request),
+            request.url,
+            request.method,
+        )
+        with tracer.span(request, "route_lookup"):
+            # one table snapshot per request, reloads swap in a new one
+            request.state.route_table = await get_route_table(request)
+            route = request.state.route_table.route(
+                request.path_params.get("appname", "")
+            )
+        with tracer.span(request, "auth"):
+            await validate_request_header_auth(request)
+        # response is logged in __gateway method below
+        if route is None:
+            return await original_route_handler(request)
+
+        # metrics only for configured appnames, so their labels stay bounded
+        metrics.GATEWAY_REQUESTS_IN_FLIGHT.inc(route.appname)
+        status_code = http.HTTPStatus.INTERNAL_SERVER_ERROR
+        try:
+            if route.rate_limit is None:
+                response = await original_route_handler(request)
+            else:
+                async with request.app.rate_limiter.limit(
+                    request=request, appname=route.appname, rate_limit=route.rate_limit
+                ) as admission:
+                    response = await original_route_handler(request)
+                    # a streamed body still holds its slots until it is sent
+                    if isinstance(response, StreamingResponse) and isinstance(
+                        response.body_iterator, UpstreamBody
+                    ):
+                        response.body_iterator.on_close.append(admission.hold())
+            status_code = response.status_code
+            return response
+        except HTTPException as ex:
+            status_code = ex.status_code
+            raise
+        finally:
+            metrics.GATEWAY_REQUESTS_IN_FLIGHT.dec(route.appname)
+            metrics.observe_gateway_request(
+                appname=route.appname,
+                status_code=status_code,
+                elapsed_seconds=time.perf_counter() - start_time,
+                upstream_seconds=request.state.upstream_seconds,
+            )
+
+
+class UpstreamBody:
+    """
+    Streams an upstream body to the client and closes the upstream exactly once
+    Closed in a finally when the body is done or fails midway, eg: upstream reset,
+    where the background task does not run, and by the background task when the
+    client disconnects and the body is abandoned
+    on_close callbacks run once it is closed, eg: to release rate limit slots
+    """
+
+    def __init__(
+        self,
+        response: httpx.Response,
+        target: Target,
+        chunks: list[bytes] = None,
+        body_iterator: AsyncIterator[bytes] = None,
+    ):
+        self.response = response
+        self.target = target
+        self.chunks = chunks or []
+        self.body_iterator = body_iterator or response.aiter_raw()
+        self.is_closed = False
+        self.on_close: list[Callable[[], None]] = []
+
+    async def __aiter__(self):
+        try:
+            for chunk in self.chunks:
+                yield chunk
+            async for chunk in self.body_iterator:
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        # target stays outstanding until its body is fully streamed
+        try:
+            await self.response.aclose()
+        finally:
+            self.target.release()
+            for on_close in self.on_close:
+                on_close()
+
+
+class SharedResponse(NamedTuple):
+    status_code: int
+    headers: dict
+    body: bytes
+
+
+single_flight = SingleFlight(
+    name="gateway", max_wait_seconds=GATEWAY_SINGLE_FLIGHT_MAX_WAIT_SECONDS
+)
 
 router = APIRouter(
     prefix="/gateway",
@@ -54,33 +169,41 @@ router = APIRouter(
     tags=["Gateway"],
 )
 
-env_details_cache: list[EnvDetails] = []
-routes_map_cache: dict = {}
-auth_exclusions_cache: list[str] = []
-auth_configs_cache: dict = {}
-
-
-def set_env_details(request: Request, force_reset: bool = False):
-    if force_reset or len(env_details_cache) == 0:
-        # reset
-        auth_configs_cache.clear()
-        auth_exclusions_cache.clear()
-        routes_map_cache.clear()
-        env_details_cache.clear()
-        env_details = find_internal(request=request, appname="app_authgateway")
-        # set
-        env_details_cache.extend(env_detail for env_detail in env_details)
-        __auth_configs(request)
-        __auth_exclusions(request)
-        __routes_map(request)
-    return env_details_cache
-
-
-def validate_request_header_auth(request: Request) -> str:
-    auth_exclusions = __auth_exclusions(request)
-    for auth_exclusion in auth_exclusions:
-        if auth_exclusion in str(request.url):
-            return "auth_exclusion"
+route_table: RouteTable = EMPTY_ROUTE_TABLE
+
+
+async def set_env_details(request: Request, force_reset: bool = False):
+    if force_reset or not route_table.is_loaded:
+        env_details = await find_internal(request=request, appname=GATEWAY_APP_NAME)
+        apply_env_details(env_details=env_details)
+    return route_table.env_details
+
+
+async def reload_env_details(mongo_client) -> tuple[EnvDetails, ...]:
+    # for background reloads, mongodb errors are raised to the caller to retry
+    env_details = await load_env_details(mongo_client, app_name=GATEWAY_APP_NAME)
+    apply_env_details(env_details=env_details)
+    return route_table.env_details
+
+
+def apply_env_details(env_details: list[EnvDetails]):
+    global route_table
+    # build aside and publish with a single reference swap
+    route_table = build_route_table(env_details=env_details, app_env=APP_ENV)
+
+
+async def get_route_table(request: Request) -> RouteTable:
+    table = getattr(request.state, "route_table", None) or route_table
+    if not table.is_loaded:
+        await set_env_details(request=request)
+        table = route_table
+    return table
+
+
+async def validate_request_header_auth(request: Request) -> str:
+    auth_exclusions = (await get_route_table(request)).auth_exclusions
+    if auth_exclusions.matches(request.url.path):
+        return "auth_exclusion"
 
     auth_header = request.headers.get("Authorization")
     if auth_header is None:
@@ -93,155 +216,367 @@ def validate_request_header_auth(request: Request) -> str:
     http_auth_credentials = HTTPAuthorizationCredentials(
         scheme=access_token[0], credentials=access_token[1]
     )
-    return validate_http_auth_credentials(request, http_auth_credentials)
+    username = validate_http_auth_credentials(request, http_auth_credentials)
+    # keys per user responses, eg: in the gateway response cache
+    request.state.username = username
+    return username
 
 
 @router.options("/{appname}/{path:path}", status_code=http.HTTPStatus.OK)
 def gateway_options(appname: str, path: str):
-    log.debug(f"Options Request: {appname}/{path}")
+    log.debug("Options Request: %s/%s", appname, path)
 
 
 @router.get("/{appname}/{path:path}", status_code=http.HTTPStatus.OK)
-def gateway_get(request: Request, appname: str, path: str, body: Optional[dict] = None):
-    return __gateway(request=request, appname=appname, path=path, body=body)
+async def gateway_get(request: Request, appname: str, path: str):
+    return await __gateway(request=request, appname=appname, path=path)
 
 
 @router.post("/{appname}/{path:path}", status_code=http.HTTPStatus.OK)
-def gateway_post(
-    request: Request, appname: str, path: str, body: Optional[dict] = None
-):
-    return __gateway(request=request, appname=appname, path=path, body=body)
+async def gateway_post(request: Request, appname: str, path: str):
+    return await __gateway(request=request, appname=appname, path=path)
 
 
 @router.put("/{appname}/{path:path}", status_code=http.HTTPStatus.OK)
-def gateway_put(request: Request, appname: str, path: str, body: Optional[dict] = None):
-    return __gateway(request=request, appname=appname, path=path, body=body)
+async def gateway_put(request: Request, appname: str, path: str):
+    return await __gateway(request=request, appname=appname, path=path)
 
 
 @router.patch("/{appname}/{path:path}", status_code=http.HTTPStatus.OK)
-def gateway_patch(
-    request: Request, appname: str, path: str, body: Optional[dict] = None
-):
-    return __gateway(request=request, appname=appname, path=path, body=body)
+async def gateway_patch(request: Request, appname: str, path: str):
+    return await __gateway(request=request, appname=appname, path=path)
 
 
 @router.delete("/{appname}/{path:path}", status_code=http.HTTPStatus.OK)
-def gateway_delete(
-    request: Request, appname: str, path: str, body: Optional[dict] = None
-):
-    return __gateway(request=request, appname=appname, path=path, body=body)
+async def gateway_delete(request: Request, appname: str, path: str):
+    return await __gateway(request=request, appname=appname, path=path)
 
 
-def __gateway(request: Request, appname: str, path: str, body: dict):
-    base_url = __base_url(request, appname)
+async def __gateway(request: Request, appname: str, path: str):
+    route = (await get_route_table(request)).route(appname)
 
-    if base_url is None:
+    if route is None:
         raise_http_exception(
             request=request,
             status_code=http.HTTPStatus.SERVICE_UNAVAILABLE,
             error=f"Error! Route for {appname} Not Found!! Please Try Again!!!",
         )
 
-    outgoing_url = base_url + "/" + appname + "/" + path
-    http_method = request.method
-    request_body = None if body is None else json.dumps(body)
-    request_headers = dict()
-    for k, v in request.headers.items():
-        if k.lower() not in RESTRICTED_HEADERS:
-            request_headers[k] = v
+    if request.method == http.HTTPMethod.GET:
+        if route.cache_ttl_seconds is not None:
+            return await __gateway_cached(request=request, route=route, path=path)
+        if __request_content(request, {}) is None and not any(
+            header in request.headers for header in SINGLE_FLIGHT_SKIP_HEADERS
+        ):
+            return await __gateway_single_flight(
+                request=request, route=route, path=path
+            )
 
-    try:
-        response = requests.request(
-            method=http_method,
-            url=outgoing_url,
-            params=request.query_params,
-            headers=request_headers,
-            auth=__auth_config(request),
-            data=request_body,
+    response, target = await __send_upstream(request=request, route=route, path=path)
+    return await __stream_response(request, route, response, target)
+
+
+async def __gateway_cached(request: Request, route: Route, path: str):
+    key = cache_key(request=request, appname=route.appname, path=path)
+    entry = response_cache.get(key, request.headers)
+    # concurrent misses wait for the one fetch in flight, then look again
+    if entry is None or not entry.is_fresh():
+        if await response_cache.wait_for_leader(key):
+            entry = response_cache.get(key, request.headers)
+    if entry is not None and entry.is_fresh():
+        response_cache.hit(entry)
+        return __cached_response(entry, "HIT")
+
+    with response_cache.lead(key):
+        extra_headers = None
+        if entry is not None and entry.etag:
+            extra_headers = {"if-none-match": entry.etag}
+        response, target = await __send_upstream(
+            request=request, route=route, path=path, extra_headers=extra_headers
         )
-        log.info(
-            f"[ {get_trace_int(request)} ] | RESPONSE::: Outgoing: [ {outgoing_url} ] "
-            f"| Status: [ {response.status_code} ]"
-        )
-        content = None if response.json() is None else response.json()
-        response_headers = dict()
-        for k, v in response.headers.items():
-            # Custom headers typically have an "X-" prefix
-            if "x-" in k.lower():
-                response_headers[k] = v
-        return JSONResponse(
-            content=content, status_code=response.status_code, headers=response_headers
+
+        if extra_headers and response.status_code == http.HTTPStatus.NOT_MODIFIED:
+            await __close_upstream(response, target)
+            entry = response_cache.revalidate(
+                key, entry, response.headers, route.cache_ttl_seconds
+            )
+            response_cache.hit(entry)
+            return __cached_response(entry, "REVALIDATED")
+
+        response_cache.miss()
+        if response.status_code != http.HTTPStatus.OK or not (
+            response_cache.is_storable(key, response.headers)
+        ):
+            return await __stream_response(request, route, response, target)
+
+        chunks = []
+        body_iterator = response.aiter_raw()
+        # None until read, so a failed read closes the upstream too
+        is_complete = None
+        try:
+            is_complete = await __read_body(
+                response, body_iterator, chunks, response_cache.max_body_bytes
+            )
+        except httpx.HTTPError as ex:
+            raise __upstream_read_error(request, ex)
+        finally:
+            # a body too big to cache is closed once the rest is streamed
+            if is_complete is not False:
+                await __close_upstream(response, target)
+        if not is_complete:
+            # too big to cache, send what was read and stream the rest
+            return __stream_response_rest(
+                route, response, target, chunks, body_iterator
+            )
+
+        body = b"".join(chunks)
+        response_headers = route.header_policy.response_headers(
+            response.headers.multi_items()
         )
-    except Exception as ex:
-        log.error(
-            f"[ {get_trace_int(request)} ] | CONNECTION_ERROR::: "
-            f"Outgoing: [ {outgoing_url} ]",
-            extra=ex,
+        response_cache.store(
+            key=key,
+            request_headers=request.headers,
+            upstream_headers=response.headers,
+            response_headers=response_headers,
+            body=body,
+            max_ttl_seconds=route.cache_ttl_seconds,
         )
-        raise HTTPException(
-            status_code=http.HTTPStatus.BAD_GATEWAY, detail={"error": str(ex)}
+        return Response(
+            content=body,
+            status_code=response.status_code,
+            headers={**response_headers, "x-cache": "MISS"},
         )
 
 
-def __routes_map(request: Request):
-    if len(routes_map_cache) == 0:
-        env_details = set_env_details(request=request)
-        env_detail_base_urls = list(
-            filter(
-                lambda env_detail: env_detail.name == GATEWAY_BASE_URLS.format(APP_ENV),
-                env_details,
-            )
-        )
-        base_urls = env_detail_base_urls[0].map_value
-        for k, v in base_urls.items():
-            appname = re.findall(pattern="/(.*?)/", string=k)[0]
-            routes_map_cache.update({appname: v})
-    return routes_map_cache
+async def __gateway_single_flight(request: Request, route: Route, path: str):
+    # identical GETs in flight wait for the first one, instead of calling upstream
+    key = ("GET", request.headers.get("accept", "")) + cache_key(
+        request=request, appname=route.appname, path=path
+    )
+    _, shared_response = await single_flight.wait(key)
+    if shared_response is not None:
+        return __shared_response(shared_response)
 
+    with single_flight.lead(key) as flight:
+        response, target = await __send_upstream(
+            request=request, route=route, path=path
+        )
+        # only small fixed length 200 bodies are buffered to share, others stream
+        content_length = response.headers.get("content-length", "")
+        if (
+            not flight.is_leader
+            or response.status_code != http.HTTPStatus.OK
+            or not content_length.isdigit()
+            or int(content_length) > GATEWAY_SINGLE_FLIGHT_MAX_BODY_BYTES
+        ):
+            return await __stream_response(request, route, response, target)
+
+        try:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        except httpx.HTTPError as ex:
+            raise __upstream_read_error(request, ex)
+        finally:
+            await __close_upstream(response, target)
+        shared_response = SharedResponse(
+            status_code=response.status_code,
+            headers=route.header_policy.response_headers(
+                response.headers.multi_items()
+            ),
+            body=body,
+        )
+        flight.share(shared_response)
+        return __shared_response(shared_response)
 
-def __base_url(request: Request, appname: str):
-    routes_map = __routes_map(request)
-    return routes_map.get(appname)
 
+async def __send_upstream(
+    request: Request, route: Route, path: str, extra_headers: dict = None
+) -> tuple[httpx.Response, Target]:
+    appname = route.appname
+    circuit_breaker = get_circuit_breaker(appname)
+    generation = circuit_breaker.allow()
+    if generation is None:
+        raise_http_exception(
+            request=request,
+            status_code=http.HTTPStatus.SERVICE_UNAVAILABLE,
+            error=f"Error! Route for {appname} Unavailable!! Please Try Again!!!",
+            headers={"Retry-After": str(circuit_breaker.retry_after_seconds())},
+        )
 
-def __auth_exclusions(request: Request):
-    if len(auth_exclusions_cache) == 0:
-        env_details = set_env_details(request=request)
-        env_details_auth_exclusions = list(
-            filter(
-                lambda env_detail: env_detail.name == GATEWAY_AUTH_EXCLUSIONS,
-                env_details,
+    target = choose_target(
+        appname=appname, base_urls=route.base_urls, strategy=route.strategy
+    )
+    base_url = target.base_url
+    outgoing_url = base_url + "/" + appname + "/" + path
+    http_method = request.method
+    request_headers = route.header_policy.request_headers(request.headers.items())
+    # set explicitly, otherwise httpx asks for its own defaults and bodies are
+    # passed through raw, so upstream must only use what the client accepts
+    request_headers["accept-encoding"] = request.headers.get(
+        "accept-encoding", "identity"
+    )
+    if extra_headers:
+        request_headers.update(extra_headers)
+
+    # None when the call is abandoned, so it does not count for the circuit breaker
+    is_failure = None
+    response = None
+    target.acquire()
+    with tracer.span(request, "upstream", url=outgoing_url) as span:
+        # upstream continues the trace as a child of this span
+        request_headers["traceparent"] = span.traceparent()
+        start_time = time.perf_counter()
+        try:
+            response = await request.app.proxy_engine.request(
+                method=http_method,
+                base_url=base_url,
+                url=outgoing_url,
+                params=request.query_params.multi_items(),
+                headers=request_headers,
+                auth=route.auth,
+                content=__request_content(request, request_headers),
+                stream=True,
+            )
+            is_failure = response.status_code >= http.HTTPStatus.INTERNAL_SERVER_ERROR
+            span.attributes["status"] = response.status_code
+            log.info(
+                "[ %s ] | RESPONSE::: Outgoing: [ %s ] | Status: [ %s ]",
+                get_trace_id(request),
+                outgoing_url,
+                response.status_code,
+            )
+        except Exception as ex:
+            is_failure = True
+            log.error(
+                "[ %s ] | CONNECTION_ERROR::: Outgoing: [ %s ]",
+                get_trace_id(request),
+                outgoing_url,
+                extra=ex,
             )
+            raise HTTPException(
+                status_code=http.HTTPStatus.BAD_GATEWAY, detail={"error": str(ex)}
+            )
+        finally:
+            elapsed_seconds = time.perf_counter() - start_time
+            if is_failure is None:
+                circuit_breaker.release(generation)
+            else:
+                circuit_breaker.record(
+                    generation, is_failure=is_failure, elapsed_seconds=elapsed_seconds
+                )
+                target.observe_latency(elapsed_seconds)
+                metrics.GATEWAY_UPSTREAM_SECONDS.observe(elapsed_seconds, route.appname)
+                # what is left of the request time is gateway overhead
+                request.state.upstream_seconds = (
+                    getattr(request.state, "upstream_seconds", 0.0) + elapsed_seconds
+                )
+            if response is None:
+                target.release()
+    return response, target
+
+
+async def __stream_response(
+    request: Request, route: Route, response: httpx.Response, target: Target
+) -> Response:
+    # the body is streamed after the handler returns, so it is not in the span
+    with tracer.span(request, "response"):
+        response_headers = route.header_policy.response_headers(
+            response.headers.multi_items()
         )
-        auth_exclusions = env_details_auth_exclusions[0].list_value
-        auth_exclusions_cache.extend(
-            auth_exclusion for auth_exclusion in auth_exclusions
+        if request.method == http.HTTPMethod.HEAD or response.status_code in (
+            http.HTTPStatus.NO_CONTENT,
+            http.HTTPStatus.NOT_MODIFIED,
+        ):
+            await __close_upstream(response, target)
+            return Response(status_code=response.status_code, headers=response_headers)
+        # raw, so an upstream content-encoding reaches the client untouched
+        body = UpstreamBody(response, target)
+        return StreamingResponse(
+            content=body,
+            status_code=response.status_code,
+            headers=response_headers,
+            background=BackgroundTask(body.aclose),
         )
-    return auth_exclusions_cache
 
 
-def __auth_configs(request: Request):
-    if len(auth_configs_cache) == 0:
-        env_details = set_env_details(request=request)
-        env_details_auth_configs = list(
-            filter(
-                lambda env_detail: env_detail.name == GATEWAY_AUTH_CONFIGS, env_details
-            )
-        )
-        auth_configs = env_details_auth_configs[0].map_value
-        auth_configs_cache.update(auth_configs)
-    return auth_configs_cache
+def __stream_response_rest(
+    route: Route,
+    response: httpx.Response,
+    target: Target,
+    chunks: list[bytes],
+    body_iterator: AsyncIterator[bytes],
+) -> Response:
+    body = UpstreamBody(response, target, chunks=chunks, body_iterator=body_iterator)
+    return StreamingResponse(
+        content=body,
+        status_code=response.status_code,
+        headers=route.header_policy.response_headers(response.headers.multi_items()),
+        background=BackgroundTask(body.aclose),
+    )
 
 
-def __auth_config(request: Request):
-    auth_configs = __auth_configs(request)
-    appname = request.path_params.get("appname")
+async def __read_body(
+    response: httpx.Response,
+    body_iterator: AsyncIterator[bytes],
+    chunks: list[bytes],
+    max_body_bytes: int,
+) -> bool:
+    # buffers up to max_body_bytes, False when the body is bigger than that
+    content_length = response.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body_bytes:
+        return False
+    size = 0
+    async for chunk in body_iterator:
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_body_bytes:
+            return False
+    return True
+
+
+def __shared_response(shared_response: SharedResponse) -> Response:
+    return Response(
+        content=shared_response.body,
+        status_code=shared_response.status_code,
+        headers=shared_response.headers,
+    )
 
-    if appname:
-        appname_user_prop_name = appname + "-usr"
-        appname_pwd_prop_name = appname + "-pwd"
-        username = auth_configs.get(appname_user_prop_name)
-        password = auth_configs.get(appname_pwd_prop_name)
 
-        if username and password:
-            return username, password
+def __cached_response(entry: CachedResponse, x_cache: str) -> Response:
+    return Response(
+        content=entry.body,
+        status_code=entry.status_code,
+        headers={**entry.headers, "x-cache": x_cache},
+    )
+
+
+def __upstream_read_error(request: Request, ex: httpx.HTTPError) -> HTTPException:
+    # upstream failed after it answered, eg: connection reset while reading the body
+    log.error(
+        "[ %s ] | CONNECTION_ERROR::: Reading: [ %s ]",
+        get_trace_id(request),
+        request.url,
+        extra=ex,
+    )
+    return HTTPException(
+        status_code=http.HTTPStatus.BAD_GATEWAY, detail={"error": str(ex)}
+    )
+
+
+async def __close_upstream(response: httpx.Response, target: Target):
+    # target stays outstanding until its body is fully streamed
+    try:
+        await response.aclose()
+    finally:
+        target.release()
+
+
+def __request_content(request: Request, request_headers: dict):
+    # stream the inbound body as is, only when the client actually sent one
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        # keeps upstream request fixed length instead of chunked
+        request_headers["content-length"] = content_length
+        return request.stream()
+    if "transfer-encoding" in request.headers:
+        return request.stream()
+    return None
@@ -0,0 +1,157 @@
+import asyncio
+import http
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+import bcrypt
+import constants
+from fastapi import FastAPI, Request
+from logger import Logger
+from metrics import BCRYPT_QUEUE_WAIT_SECONDS, BCRYPT_SECONDS
+from utils import raise_http_exception
+
+log = Logger(logging.getLogger(__name__))
+
+
+def startup_hashing_executor(app: FastAPI):
+    app.hashing_executor = HashingExecutor(
+        max_workers=constants.HASHING_MAX_WORKERS,
+        max_queue_depth=constants.HASHING_MAX_QUEUE_DEPTH,
+    )
+    log.info("Started Hashing Executor...")
+
+
+def shutdown_hashing_executor(app: FastAPI):
+    app.hashing_executor.shutdown()
+    log.info("Stopped Hashing Executor...")
+
+
+class HashingExecutorSaturated(Exception):
+    pass
+
+
+class HashingExecutor:
+    """
+    Dedicated, bounded thread pool for bcrypt work (bcrypt releases the GIL)
+    Keeps login bursts out of the shared threadpool, rejects when the queue is full
+    """
+
+    def __init__(self, max_workers: int, max_queue_depth: int):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hashing"
+        )
+        self.__slots = threading.BoundedSemaphore(max_workers + max_queue_depth)
+        self.__stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_seconds_total = 0.0
+        self.queue_wait_seconds_max = 0.0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if not self.__slots.acquire(blocking=False):
+            with self.__stats_lock:
+                self.rejected += 1
+            raise HashingExecutorSaturated("Hashing executor queue is full")
+
+        queued_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.__record(
+                    fn.__name__,
+                    started_at - queued_at,
+                    time.perf_counter() - started_at,
+                )
+                self.__release()
+
+        with self.__stats_lock:
+            self.in_flight += 1
+        try:
+            return self.__executor.submit(timed)
+        except RuntimeError:
+            self.__release()
+            raise
+
+    def __release(self):
+        with self.__stats_lock:
+            self.in_flight -= 1
+        self.__slots.release()
+
+    def __record(self, operation: str, queue_wait_seconds: float, hash_seconds: float):
+        with self.__stats_lock:
+            # histograms are not thread safe, hashing threads observe under the lock
+            BCRYPT_QUEUE_WAIT_SECONDS.observe(queue_wait_seconds)
+            BCRYPT_SECONDS.observe(hash_seconds, operation)
+            self.completed += 1
+            self.queue_wait_seconds_total += queue_wait_seconds
+            self.queue_wait_seconds_max = max(
+                self.queue_wait_seconds_max, queue_wait_seconds
+            )
+            self.hash_seconds_total += hash_seconds
+            self.hash_seconds_max = max(self.hash_seconds_max, hash_seconds)
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        completed = self.completed
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "completed": completed,
+            "rejected": self.rejected,
+            "queue_wait_seconds_avg": (
+                self.queue_wait_seconds_total / completed if completed else 0.0
+            ),
+            "queue_wait_seconds_max": self.queue_wait_seconds_max,
+            "hash_seconds_avg": (
+                self.hash_seconds_total / completed if completed else 0.0
+            ),
+            "hash_seconds_max": self.hash_seconds_max,
+        }
+
+
+async def hash_password(request: Request, password: str) -> str:
+    hashed_password = await __run(
+        request, bcrypt.hashpw, password.encode("utf-8"), __gensalt()
+    )
+    return hashed_password.decode("utf-8")
+
+
+async def check_password(request: Request, password: str, hashed_password: str) -> bool:
+    return await __run(
+        request,
+        bcrypt.checkpw,
+        password.encode("utf-8"),
+        hashed_password.encode("utf-8"),
+    )
+
+
+def __gensalt():
+    return bcrypt.gensalt(rounds=constants.BCRYPT_ROUNDS)
+
+
+async def __run(request: Request, fn: Callable, *args):
+    hashing_executor: HashingExecutor = request.app.hashing_executor
+    try:
+        future = hashing_executor.submit(fn, *args)
+    except HashingExecutorSaturated as ex:
+        raise_http_exception(
+            request=request,
+            status_code=http.HTTPStatus.SERVICE_UNAVAILABLE,
+            error=str(ex),
+            headers={"Retry-After": str(constants.HASHING_RETRY_AFTER_SECONDS)},
+        )
+    return await asyncio.wrap_future(future)
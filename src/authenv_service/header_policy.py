@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from constants import (
+    HOP_BY_HOP_HEADERS,
+    RESPONSE_HEADER_PREFIXES,
+    RESPONSE_HEADERS,
+    RESTRICTED_HEADERS,
+)
+
+
+@dataclass(frozen=True)
+class HeaderPolicy:
+    """
+    Which headers the gateway forwards, built once per route at config load
+    Takes (name, value) pairs with lower case names, as ASGI and httpx multi_items
+    give them, so each header is one set lookup in a single pass
+    Hop-by-hop headers and the ones named in Connection never pass
+    """
+
+    restricted_headers: frozenset[str] = RESTRICTED_HEADERS
+    allowed_response_headers: frozenset[str] = RESPONSE_HEADERS
+    allowed_response_header_prefixes: tuple[str, ...] = RESPONSE_HEADER_PREFIXES
+
+    def request_headers(self, header_items: Iterable[tuple[str, str]]) -> dict:
+        restricted_headers = self.restricted_headers
+        request_headers = {}
+        connection = None
+        for k, v in header_items:
+            if k not in restricted_headers:
+                request_headers[k] = v
+            elif k == "connection":
+                connection = v
+        return self.__drop_connection_headers(request_headers, connection)
+
+    def response_headers(self, header_items: Iterable[tuple[str, str]]) -> dict:
+        allowed_headers = self.allowed_response_headers
+        allowed_prefixes = self.allowed_response_header_prefixes
+        response_headers = {}
+        connection = None
+        for k, v in header_items:
+            if k in allowed_headers or k.startswith(allowed_prefixes):
+                # repeated headers are combined, as http allows for list values
+                if k in response_headers:
+                    v = response_headers[k] + ", " + v
+                response_headers[k] = v
+            elif k == "connection":
+                connection = v
+        return self.__drop_connection_headers(response_headers, connection)
+
+    @staticmethod
+    def __drop_connection_headers(headers: dict, connection: Optional[str]) -> dict:
+        # headers named in Connection are hop-by-hop too
+        if connection:
+            for name in connection.split(","):
+                headers.pop(name.strip().lower(), None)
+        return headers
+
+
+def build_header_policy(
+    restricted_headers: Iterable[str] = (), response_headers: Iterable[str] = ()
+) -> HeaderPolicy:
+    # routes add to the defaults, hop-by-hop headers stay restricted regardless
+    restricted_headers = frozenset(h.lower() for h in restricted_headers)
+    response_headers = frozenset(h.lower() for h in response_headers)
+    if not restricted_headers and not response_headers:
+        return DEFAULT_HEADER_POLICY
+    return HeaderPolicy(
+        restricted_headers=RESTRICTED_HEADERS | restricted_headers,
+        allowed_response_headers=(RESPONSE_HEADERS | response_headers)
+        - HOP_BY_HOP_HEADERS,
+    )
+
+
+DEFAULT_HEADER_POLICY = HeaderPolicy()
@@ -0,0 +1,198 @@
+import asyncio
+import itertools
+import logging
+from enum import Enum
+from typing import Callable, Iterable
+
+import constants
+from fastapi import FastAPI
+from logger import Logger
+
+log = Logger(logging.getLogger(__name__))
+
+
+class LoadBalancerStrategy(str, Enum):
+    ROUND_ROBIN = "round_robin"
+    LEAST_OUTSTANDING = "least_outstanding"
+    EWMA = "ewma"
+
+
+class Target:
+    """
+    One upstream base url of an appname, state outlives route table reloads
+    """
+
+    def __init__(self, appname: str, base_url: str):
+        self.appname = appname
+        self.base_url = base_url
+        self.outstanding = 0
+        self.ewma_seconds = 0.0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+
+    def acquire(self):
+        self.outstanding += 1
+
+    def release(self):
+        self.outstanding = max(0, self.outstanding - 1)
+
+    def observe_latency(self, elapsed_seconds: float):
+        if self.ewma_seconds == 0.0:
+            self.ewma_seconds = elapsed_seconds
+        else:
+            self.ewma_seconds += constants.GATEWAY_EWMA_ALPHA * (
+                elapsed_seconds - self.ewma_seconds
+            )
+
+    def ewma_cost(self) -> float:
+        # expected wait if sent here: latency scaled by what is already in flight
+        return self.ewma_seconds * (self.outstanding + 1)
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "ewma_seconds": round(self.ewma_seconds, 6),
+        }
+
+
+targets: dict[tuple[str, str], Target] = {}
+round_robin_counters: dict[str, itertools.count] = {}
+
+
+def get_target(appname: str, base_url: str) -> Target:
+    target = targets.get((appname, base_url))
+    if target is None:
+        target = Target(appname=appname, base_url=base_url)
+        targets[(appname, base_url)] = target
+    return target
+
+
+def choose_target(
+    appname: str, base_urls: tuple[str, ...], strategy: LoadBalancerStrategy
+) -> Target:
+    candidates = [get_target(appname, base_url) for base_url in base_urls]
+    if len(candidates) == 1:
+        return candidates[0]
+    # fail open, if every target is unhealthy keep trying all of them
+    candidates = [target for target in candidates if target.healthy] or candidates
+
+    if strategy == LoadBalancerStrategy.LEAST_OUTSTANDING:
+        return min(candidates, key=lambda target: target.outstanding)
+    if strategy == LoadBalancerStrategy.EWMA:
+        return min(candidates, key=lambda target: target.ewma_cost())
+
+    counter = round_robin_counters.get(appname)
+    if counter is None:
+        counter = round_robin_counters.setdefault(appname, itertools.count())
+    return candidates[next(counter) % len(candidates)]
+
+
+def stats() -> dict:
+    targets_stats = {}
+    for (appname, _), target in targets.items():
+        targets_stats.setdefault(appname, []).append(target.stats())
+    return targets_stats
+
+
+# health checks
+async def startup_health_checker(app: FastAPI, routes_provider: Callable[[], Iterable]):
+    app.health_checker = HealthChecker(
+        app=app,
+        routes_provider=routes_provider,
+        interval_seconds=constants.GATEWAY_HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout_seconds=constants.GATEWAY_HEALTH_CHECK_TIMEOUT_SECONDS,
+    )
+    app.health_checker.start()
+    log.info("Started Gateway Health Checker...")
+
+
+async def shutdown_health_checker(app: FastAPI):
+    await app.health_checker.stop()
+    log.info("Stopped Gateway Health Checker...")
+
+
+class HealthChecker:
+    """
+    Pings every target of the routes with more than one target, using their pools
+    Unhealthy targets are skipped by choose_target until they pass again
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        routes_provider: Callable[[], Iterable],
+        interval_seconds: float,
+        timeout_seconds: float,
+    ):
+        self.app = app
+        self.routes_provider = routes_provider
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.__task: asyncio.Task | None = None
+
+    def start(self):
+        self.__task = asyncio.create_task(self.__run(), name="health-checker")
+
+    async def stop(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+    async def __run(self):
+        # never ends on an error, unhealthy targets would never come back
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.check_all()
+            except Exception as ex:
+                log.error("Error checking gateway targets...", extra=ex)
+
+    async def check_all(self):
+        checks = [
+            self.check(get_target(route.appname, base_url))
+            for route in self.routes_provider()
+            if len(route.base_urls) > 1
+            for base_url in route.base_urls
+        ]
+        await asyncio.gather(*checks)
+
+    async def check(self, target: Target):
+        health_check_url = "{}/{}/{}".format(
+            target.base_url, target.appname, constants.GATEWAY_HEALTH_CHECK_PATH
+        )
+        try:
+            client = self.app.proxy_engine.client(target.base_url)
+            response = await client.get(health_check_url, timeout=self.timeout_seconds)
+            is_success = response.status_code < 500
+        except Exception as ex:
+            # eg: connection refused, or a bad base url in config (httpx.InvalidURL)
+            log.error("Gateway Health Check Error: [ %s ]", health_check_url, extra=ex)
+            is_success = False
+
+        if is_success:
+            target.consecutive_failures = 0
+            target.consecutive_successes += 1
+            if (
+                not target.healthy
+                and target.consecutive_successes
+                >= constants.GATEWAY_HEALTH_CHECK_HEALTHY_THRESHOLD
+            ):
+                target.healthy = True
+                log.info("Gateway Target Healthy: [ %s ]", health_check_url)
+        else:
+            target.consecutive_successes = 0
+            target.consecutive_failures += 1
+            if (
+                target.healthy
+                and target.consecutive_failures
+                >= constants.GATEWAY_HEALTH_CHECK_UNHEALTHY_THRESHOLD
+            ):
+                target.healthy = False
+                log.error("Gateway Target Unhealthy: [ %s ]", health_check_url)
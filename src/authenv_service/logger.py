@@ -1,39 +1,110 @@
+import atexit
 import datetime
+import json
 import logging
 import os
+import queue
 import sys
-from logging.handlers import TimedRotatingFileHandler
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
 import pytz
-from constants import REPO_HOME
+from constants import LOG_FORMAT, LOG_QUEUE_MAX_SIZE, LOG_TIMEZONE, REPO_HOME
 
+SERVICE_NAME = "authenv-service"
+TEXT_FORMAT = (
+    "[%(asctime)s][" + SERVICE_NAME + "][%(name)s][%(levelname)s] %(message)s "
+    "| %(extra)s"
+)
+# looked up once, not on every record
+LOG_TZ = pytz.timezone(LOG_TIMEZONE)
 
-class Logger:
-    def __init__(self, logger: logging.Logger):
-        self.logger = logger
-        self.logger.setLevel(logging.INFO)
 
-        # console logger
-        self.stream_handler = logging.StreamHandler(sys.stdout)
-        self.stream_handler.setLevel(logging.INFO)
+@lru_cache(maxsize=4)
+def __time_tuple(seconds: int):
+    return datetime.datetime.fromtimestamp(seconds, LOG_TZ).timetuple()
 
-        self.formatter = logging.Formatter(
-            "[%(asctime)s][trackcase-service][%(name)s]"
-            "[%(levelname)s] %(message)s | %(extra)s"
-        )
 
-        def converter(timestamp):
-            dt = datetime.datetime.fromtimestamp(timestamp)
-            return pytz.timezone("America/Denver").localize(dt).timetuple()
+def converter(timestamp):
+    # records come in bursts within the same second, msecs are added separately
+    return __time_tuple(int(timestamp))
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One json object per line, for log shippers that parse fields
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_line = {
+            "time": self.formatTime(record),
+            "service": SERVICE_NAME,
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        extra = getattr(record, "extra", None)
+        if extra is not None:
+            log_line["extra"] = str(extra)
+        if record.exc_info:
+            log_line["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(log_line, default=str)
 
-        self.formatter.converter = converter
-        self.stream_handler.setFormatter(self.formatter)
 
-        self.logger.addHandler(self.stream_handler)
+def build_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+    formatter.converter = converter
+    return formatter
+
+
+class LogQueueHandler(QueueHandler):
+    """
+    Puts records on the queue as they are, the listener thread formats them
+    So a log call on the request path is one non-blocking put, when the queue is
+    full the record is dropped and counted rather than making the request wait
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # waits for room, so stopping a full queue still writes what is in it
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """
+    The console and file handlers, shared by every Logger behind one queue
+    A single background thread drains the queue, formats and writes the records
+    """
+
+    def __init__(self, repo_home, log_format: str, queue_max_size: int):
+        formatter = build_formatter(log_format)
+
+        # console logger
+        self.stream_handler = logging.StreamHandler(sys.stdout)
+        self.stream_handler.setLevel(logging.INFO)
+        self.stream_handler.setFormatter(formatter)
 
         # file logger
-        if REPO_HOME is not None and str(REPO_HOME).strip() != "":
-            log_file_location = REPO_HOME + "/logs/authenv-service/authenv-service.log"
+        self.file_handler = None
+        if repo_home is not None and str(repo_home).strip() != "":
+            log_file_location = repo_home + "/logs/authenv-service/authenv-service.log"
             log_dir = os.path.dirname(log_file_location)
             os.makedirs(log_dir, exist_ok=True)
             self.file_handler = TimedRotatingFileHandler(
@@ -47,21 +118,74 @@ class Logger:
             self.file_handler.setLevel(logging.INFO)
             # if file logger is present, set console logger level at ERROR
             self.stream_handler.setLevel(logging.ERROR)
-            self.file_handler.setFormatter(self.formatter)
-            self.logger.addHandler(self.file_handler)
+            self.file_handler.setFormatter(formatter)
 
-    def debug(self, msg, extra=None):
-        self.logger.debug(msg, extra={"extra": extra})
+        self.queue_handler = LogQueueHandler(queue.Queue(maxsize=queue_max_size))
+        self.listener = LogQueueListener(
+            self.queue_handler.queue, *self.handlers(), respect_handler_level=True
+        )
+        self.is_started = False
+
+    def handlers(self) -> list[logging.Handler]:
+        return [h for h in (self.stream_handler, self.file_handler) if h is not None]
 
-    def info(self, msg, extra=None):
-        self.logger.info(msg, extra={"extra": extra})
+    def start(self):
+        if not self.is_started:
+            self.listener.start()
+            self.is_started = True
+            atexit.register(self.stop)
 
-    def error(self, msg, extra=None):
-        self.logger.error(msg, extra={"extra": extra})
+    def stop(self):
+        # writes out the records still queued
+        if self.is_started:
+            self.listener.stop()
+            self.is_started = False
+
+    def set_level(self, level):
+        for handler in self.handlers():
+            handler.setLevel(level)
+
+    def stats(self) -> dict:
+        return {
+            "format": LOG_FORMAT,
+            "queued": self.queue_handler.queue.qsize(),
+            "max_queued": self.queue_handler.queue.maxsize,
+            "dropped": self.queue_handler.dropped,
+        }
+
+
+log_pipeline = LogPipeline(
+    repo_home=REPO_HOME, log_format=LOG_FORMAT, queue_max_size=LOG_QUEUE_MAX_SIZE
+)
+log_pipeline.start()
+
+
+class Logger:
+    """
+    Messages take %-style args, formatted by the listener only when the level is on
+    eg: log.info("[ %s ] | Status: [ %s ]", trace_id, status_code)
+    """
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        self.logger.setLevel(logging.INFO)
+        # a module may build its Logger more than once, handlers are added only once
+        if log_pipeline.queue_handler not in self.logger.handlers:
+            self.logger.addHandler(log_pipeline.queue_handler)
+
+    def debug(self, msg, *args, extra=None):
+        self.logger.debug(msg, *args, extra={"extra": extra})
+
+    def info(self, msg, *args, extra=None):
+        self.logger.info(msg, *args, extra={"extra": extra})
+
+    def error(self, msg, *args, extra=None):
+        self.logger.error(msg, *args, extra={"extra": extra})
 
     def set_level(self, level):
         self.logger.setLevel(level)
-        self.stream_handler.setLevel(level)
+        log_pipeline.set_level(level)
+
 
-        if self.file_handler is not None:
-            self.file_handler.setLevel(level)
+def stats() -> dict:
+    return log_pipeline.stats()
@@ -0,0 +1,203 @@
+import http
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import constants
+from fastapi import Request
+from utils import get_client_ip, raise_http_exception
+
+
+@dataclass
+class FailureWindow:
+    window_start: float
+    previous_count: int = 0
+    current_count: int = 0
+    last_failure_at: float = 0.0
+
+
+class SlidingWindowCounter:
+    """
+    Failed attempts per key over a sliding window, in this process
+    Approximated from the current and previous fixed windows, so each key is O(1)
+    Least recently used keys go beyond max_keys, only used from the event loop
+    """
+
+    def __init__(self, window_seconds: float, max_keys: int):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.__windows: OrderedDict[str, FailureWindow] = OrderedDict()
+
+    def __len__(self):
+        return len(self.__windows)
+
+    def add(self, key: str, now: float):
+        window = self.__roll(key, now)
+        if window is None:
+            window = self.__windows[key] = FailureWindow(window_start=now)
+            if len(self.__windows) > self.max_keys:
+                self.__windows.popitem(last=False)
+        window.current_count += 1
+        window.last_failure_at = now
+        self.__windows.move_to_end(key)
+
+    def count(self, key: str, now: float) -> tuple[float, float]:
+        """
+        (weighted failures in the last window, time of the last failure)
+        """
+        window = self.__roll(key, now)
+        if window is None:
+            return 0.0, 0.0
+        previous_weight = 1 - (now - window.window_start) / self.window_seconds
+        count = window.current_count + window.previous_count * previous_weight
+        return count, window.last_failure_at
+
+    def discard(self, key: str, now: float):
+        # takes one add back, eg: an attempt counted up front that did not fail
+        window = self.__roll(key, now)
+        if window is None:
+            return
+        if window.current_count > 0:
+            window.current_count -= 1
+        elif window.previous_count > 0:
+            window.previous_count -= 1
+
+    def reset(self, key: str):
+        self.__windows.pop(key, None)
+
+    def __roll(self, key: str, now: float):
+        window = self.__windows.get(key)
+        if window is None:
+            return None
+        elapsed_windows = int((now - window.window_start) // self.window_seconds)
+        if elapsed_windows >= 2:
+            del self.__windows[key]
+            return None
+        if elapsed_windows == 1:
+            window.previous_count = window.current_count
+            window.current_count = 0
+            window.window_start += self.window_seconds
+        return window
+
+
+@dataclass(frozen=True)
+class ThrottleLimit:
+    delay_after: int
+    lockout_after: int
+
+
+class LoginThrottle:
+    """
+    Turns away logins for a username or source ip with too many recent failures
+    Past delay_after failures each next attempt must wait a doubling delay, past
+    lockout_after the key is locked for lockout_seconds since its last failure
+    Checked before any db or bcrypt work, so a rejection costs a dict lookup
+    An attempt is counted as a failure when it is checked, before anything is
+    awaited, so a burst in parallel is throttled too, a success takes it back
+    """
+
+    def __init__(
+        self,
+        counter: SlidingWindowCounter,
+        user_limit: ThrottleLimit,
+        ip_limit: ThrottleLimit,
+        base_delay_seconds: float,
+        max_delay_seconds: float,
+        lockout_seconds: float,
+    ):
+        self.counter = counter
+        self.user_limit = user_limit
+        self.ip_limit = ip_limit
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.lockout_seconds = lockout_seconds
+        self.delayed = 0
+        self.locked = 0
+
+    def reserve(self, request: Request, username: str):
+        # checked and counted in one step, nothing is awaited in between
+        now = time.monotonic()
+        keys = self.__keys(request, username)
+        for key, limit in keys:
+            retry_after_seconds = self.__retry_after_seconds(key, limit, now)
+            if retry_after_seconds > 0:
+                raise_http_exception(
+                    request=request,
+                    status_code=http.HTTPStatus.TOO_MANY_REQUESTS,
+                    error="Too Many Failed Attempts! Please Try Again Later!!",
+                    headers={"Retry-After": str(math.ceil(retry_after_seconds))},
+                )
+        for key, _ in keys:
+            self.counter.add(key, now)
+
+    def release(self, request: Request, username: str):
+        # the attempt did not fail on credentials, eg: db error, not counted
+        now = time.monotonic()
+        for key, _ in self.__keys(request, username):
+            self.counter.discard(key, now)
+
+    def record_success(self, request: Request, username: str):
+        # the source ip keeps its failures, it may be trying many usernames
+        self.counter.reset(self.__user_key(username))
+        for key, _ in self.__keys(request, username)[1:]:
+            self.counter.discard(key, time.monotonic())
+
+    def __retry_after_seconds(self, key: str, limit: ThrottleLimit, now: float):
+        failures, last_failure_at = self.counter.count(key, now)
+        if failures >= limit.lockout_after:
+            retry_after_seconds = last_failure_at + self.lockout_seconds - now
+            if retry_after_seconds > 0:
+                self.locked += 1
+            return retry_after_seconds
+        if failures >= limit.delay_after:
+            delay_seconds = min(
+                self.max_delay_seconds,
+                self.base_delay_seconds * 2 ** int(failures - limit.delay_after),
+            )
+            retry_after_seconds = last_failure_at + delay_seconds - now
+            if retry_after_seconds > 0:
+                self.delayed += 1
+            return retry_after_seconds
+        return 0.0
+
+    def __keys(self, request: Request, username: str):
+        keys = [(self.__user_key(username), self.user_limit)]
+        client_ip = get_client_ip(request)
+        if client_ip:
+            keys.append(("ip:" + client_ip, self.ip_limit))
+        return keys
+
+    @staticmethod
+    def __user_key(username: str) -> str:
+        return "user:" + username.lower()
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self.counter),
+            "delayed": self.delayed,
+            "locked": self.locked,
+        }
+
+
+login_throttle = LoginThrottle(
+    counter=SlidingWindowCounter(
+        window_seconds=constants.LOGIN_THROTTLE_WINDOW_SECONDS,
+        max_keys=constants.LOGIN_THROTTLE_MAX_KEYS,
+    ),
+    user_limit=ThrottleLimit(
+        delay_after=constants.LOGIN_THROTTLE_USER_DELAY_AFTER,
+        lockout_after=constants.LOGIN_THROTTLE_USER_LOCKOUT_AFTER,
+    ),
+    ip_limit=ThrottleLimit(
+        delay_after=constants.LOGIN_THROTTLE_IP_DELAY_AFTER,
+        lockout_after=constants.LOGIN_THROTTLE_IP_LOCKOUT_AFTER,
+    ),
+    base_delay_seconds=constants.LOGIN_THROTTLE_BASE_DELAY_SECONDS,
+    max_delay_seconds=constants.LOGIN_THROTTLE_MAX_DELAY_SECONDS,
+    lockout_seconds=constants.LOGIN_THROTTLE_LOCKOUT_SECONDS,
+)
+
+
+def stats() -> dict:
+    return login_throttle.stats()
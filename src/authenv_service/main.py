@@ -1,19 +1,37 @@
+import asyncio
+import http
 import logging
 import os
 import time
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager
 
 import auth_users as users_api
+import caches as caches
+import circuit_breaker as circuit_breaker
+import config_watcher as config_watcher
 import constants as constants
 import env_props as env_props_api
 import gateway as gateway_api
+import hashing as hashing
+import load_balancer as load_balancer
+import logger as logger
+import login_throttle as login_throttle
+import metrics as metrics
+import proxy as proxy
+import rate_limiter as rate_limiter
+import response_cache as response_cache
+import singleflight as singleflight
+import tracing as tracing
 import utils as utils
 import uvicorn
-from fastapi import Depends, FastAPI, Request
+from compression import CompressionMiddleware
+from fastapi import Depends, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBasicCredentials
 from logger import Logger
+from readiness import NOT_WAITING_PATHS, not_ready_response, readiness
 
 log = Logger(logging.getLogger(__name__))
 
@@ -21,11 +39,35 @@ log = Logger(logging.getLogger(__name__))
 @asynccontextmanager
 async def lifespan(application: FastAPI):
     constants.validate_input()
-    utils.startup_db_client(application)
-    stop_event, schedule_thread = utils.start_scheduler()
+    proxy.startup_proxy_engine(application)
+    hashing.startup_hashing_executor(application)
+
+    async def warmup(exit_stack: AsyncExitStack):
+        await warmup_mongo_and_caches(application, exit_stack)
+
+    if constants.FAST_START:
+        readiness.start(warmup, retry_seconds=constants.FAST_START_RETRY_SECONDS)
+    else:
+        await readiness.warm_up(warmup)
     yield
-    utils.shutdown_db_client(application)
-    utils.stop_scheduler(stop_event, schedule_thread)
+    await readiness.stop()
+    await proxy.shutdown_proxy_engine(application)
+    hashing.shutdown_hashing_executor(application)
+
+
+async def warmup_mongo_and_caches(application: FastAPI, exit_stack: AsyncExitStack):
+    # a srv connection string is resolved in the client constructor, off the loop
+    await asyncio.to_thread(utils.startup_db_client, application)
+    exit_stack.push_async_callback(utils.shutdown_db_client, application)
+    await users_api.create_indexes(application.mongo_client)
+    await env_props_api.create_indexes(application.mongo_client)
+    await rate_limiter.startup_rate_limiter(application)
+    await config_watcher.startup_config_watcher(application)
+    exit_stack.push_async_callback(config_watcher.shutdown_config_watcher, application)
+    await load_balancer.startup_health_checker(
+        application, routes_provider=lambda: gateway_api.route_table.routes.values()
+    )
+    exit_stack.push_async_callback(load_balancer.shutdown_health_checker, application)
 
 
 app = FastAPI(
@@ -45,6 +87,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=constants.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=constants.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=constants.COMPRESSION_BROTLI_QUALITY,
+)
 app.include_router(users_api.router)
 app.include_router(env_props_api.router)
 app.include_router(gateway_api.router)
@@ -52,14 +100,35 @@ app.include_router(gateway_api.router)
 
 @app.middleware("http")
 async def log_request_response(request: Request, call_next):
-    log.info(f"Receiving [ {request.method} ] URL [ {request.url} ]")
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
+    log.info("Receiving [ %s ] URL [ %s ]", request.method, request.url)
+    start_time = time.perf_counter()
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc()
+    try:
+        # until warmed up, requests wait for it, up to a limit
+        if request.url.path in NOT_WAITING_PATHS or await readiness.wait(
+            constants.FAST_START_WAIT_SECONDS
+        ):
+            response = await call_next(request)
+        else:
+            response = not_ready_response(constants.FAST_START_RETRY_SECONDS)
+    finally:
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec()
+    process_time = time.perf_counter() - start_time
     response.headers["x-process-time"] = str(process_time)
+    # the route template, urls would give a label value per path
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        process_time,
+        request.method,
+        route.path if route is not None else "unmatched",
+        response.status_code,
+    )
     log.info(
-        f"Returning [ {request.method} ] Status Code [ {response.status_code} ] "
-        f"URL [ {request.url} ] AFTER [ {format(process_time, '.4f')}ms]"
+        "Returning [ %s ] Status Code [ %s ] URL [ %s ] AFTER [ %.4fms]",
+        request.method,
+        response.status_code,
+        request.url,
+        process_time * 1000,
     )
     return response
 
@@ -69,21 +138,171 @@ def ping():
     return {"test": "successful"}
 
 
+@app.get("/authenv-service/tests/ready", tags=["Main"], summary="Readiness")
+def ready():
+    # no auth, for the platform readiness probe
+    return JSONResponse(
+        content=readiness.stats(),
+        status_code=(
+            http.HTTPStatus.OK
+            if readiness.is_ready
+            else http.HTTPStatus.SERVICE_UNAVAILABLE
+        ),
+    )
+
+
 @app.get("/authenv-service/tests/reset", tags=["Main"], summary="Reset Cache")
-def reset(request: Request):
-    gateway_api.set_env_details(request=request, force_reset=True)
+async def reset(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    # broadcast, so the caches of every worker process are reset
+    await request.app.config_watcher.reset()
     return {"reset": "successful"}
 
 
 @app.get("/authenv-service/tests/log-level", tags=["Main"], summary="Set Log Level")
-def log_level(level: utils.LogLevelOptions):
+def log_level(
+    request: Request,
+    level: utils.LogLevelOptions,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
     log_level_to_set = logging.getLevelNamesMapping().get(level)
     log.set_level(log_level_to_set)
     utils.log.set_level(log_level_to_set)
     gateway_api.log.set_level(log_level_to_set)
+    proxy.log.set_level(log_level_to_set)
     return {"set": "successful"}
 
 
+@app.get("/authenv-service/tests/caches", tags=["Main"], summary="Cache Stats")
+def cache_stats(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return caches.stats()
+
+
+@app.get("/authenv-service/tests/hashing", tags=["Main"], summary="Hashing Stats")
+def hashing_stats(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return request.app.hashing_executor.stats()
+
+
+@app.get(
+    "/authenv-service/tests/login-throttle",
+    tags=["Main"],
+    summary="Login Throttle Stats",
+)
+def login_throttle_stats(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return login_throttle.stats()
+
+
+@app.get(
+    "/authenv-service/tests/circuit-breakers",
+    tags=["Main"],
+    summary="Gateway Circuit Breakers",
+)
+def circuit_breakers(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return circuit_breaker.stats()
+
+
+@app.get(
+    "/authenv-service/tests/gateway-targets",
+    tags=["Main"],
+    summary="Gateway Load Balancer Targets",
+)
+def gateway_targets(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return load_balancer.stats()
+
+
+@app.get(
+    "/authenv-service/tests/response-cache",
+    tags=["Main"],
+    summary="Gateway Response Cache Stats",
+)
+def response_cache_stats(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return response_cache.stats()
+
+
+@app.get(
+    "/authenv-service/tests/single-flights",
+    tags=["Main"],
+    summary="Gateway Single Flight Stats",
+)
+def single_flight_stats(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return singleflight.stats()
+
+
+@app.get(
+    "/authenv-service/tests/rate-limits",
+    tags=["Main"],
+    summary="Gateway Rate Limit Stats",
+)
+def rate_limit_stats(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return request.app.rate_limiter.stats()
+
+
+@app.get("/authenv-service/tests/logging", tags=["Main"], summary="Logging Stats")
+def logging_stats(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return logger.stats()
+
+
+@app.get("/authenv-service/tests/metrics", tags=["Main"], summary="Metrics")
+def metrics_scrape(
+    request: Request,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    # prometheus text format, scrape with basic auth
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/authenv-service/tests/traces", tags=["Main"], summary="Recent Spans")
+def trace_spans(
+    request: Request,
+    trace_id: str = None,
+    http_basic_credentials: HTTPBasicCredentials = Depends(utils.http_basic_security),
+):
+    # spans are kept only when TRACE_EXPORTER is memory
+    utils.validate_http_basic_credentials(request, http_basic_credentials)
+    return tracing.spans(trace_id)
+
+
 @app.get("/authenv-service/docs", include_in_schema=False)
 async def custom_docs_url(
     request: Request,
@@ -97,4 +316,11 @@ async def custom_docs_url(
 
 if __name__ == "__main__":
     port = os.getenv(constants.ENV_APP_PORT, "9999")
-    uvicorn.run(app, port=int(port), host="0.0.0.0", log_level=logging.WARNING)
+    # workers import the app by name, each runs the lifespan and warms its own caches
+    uvicorn.run(
+        "main:app" if constants.APP_WORKERS > 1 else app,
+        port=int(port),
+        host="0.0.0.0",
+        log_level=logging.WARNING,
+        workers=constants.APP_WORKERS,
+    )
@@ -0,0 +1,267 @@
+from bisect import bisect_left
+from typing import Callable, Iterator
+
+import caches
+from pymongo import monitoring
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# seconds, from a fast cache hit to a slow upstream
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# bcrypt takes hundreds of milliseconds at the usual rounds
+BCRYPT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+# every metric registers here by name, in the order they are rendered
+registry: dict[str, "Metric"] = {}
+
+
+class Metric:
+    """
+    Values per label values tuple, updated from the event loop without locks
+    Label values must come from a bounded set (eg: route template, not url)
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values: dict[tuple, float] = {}
+        registry[name] = self
+
+    def samples(self) -> Iterator[tuple[str, tuple, tuple, float]]:
+        # (name, label names, label values, value)
+        for label_values, value in self.values.items():
+            yield self.name, self.label_names, label_values, value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *label_values, amount: float = 1):
+        values = self.values
+        values[label_values] = values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, *label_values, amount: float = 1):
+        values = self.values
+        values[label_values] = values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount: float = 1):
+        values = self.values
+        values[label_values] = values.get(label_values, 0) - amount
+
+
+class Histogram(Metric):
+    """
+    Fixed buckets, an observation is one bisect and three additions
+    Bucket counts are kept per bucket and only made cumulative when rendered
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+        # label values -> [count per bucket and +Inf, sum, count]
+        self.observations: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        observation = self.observations.get(label_values)
+        if observation is None:
+            observation = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self.observations[label_values] = observation
+        observation[0][bisect_left(self.buckets, value)] += 1
+        observation[1] += value
+        observation[2] += 1
+
+    def samples(self) -> Iterator[tuple[str, tuple, tuple, float]]:
+        bucket_label_names = self.label_names + ("le",)
+        for label_values, (counts, total, count) in self.observations.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield (
+                    self.name + "_bucket",
+                    bucket_label_names,
+                    label_values + (format_value(bound),),
+                    cumulative,
+                )
+            yield self.name + "_sum", self.label_names, label_values, total
+            yield self.name + "_count", self.label_names, label_values, count
+
+
+class CallbackMetric(Metric):
+    """
+    Read at scrape time from stats kept elsewhere, costs nothing per request
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        label_names: tuple,
+        callback: Callable[[], dict[tuple, float]],
+    ):
+        super().__init__(name, documentation, label_names)
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self) -> Iterator[tuple[str, tuple, tuple, float]]:
+        for label_values, value in self.callback().items():
+            yield self.name, self.label_names, label_values, value
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def __escape(label_value) -> str:
+    return (
+        str(label_value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def render() -> str:
+    # prometheus text exposition format
+    lines = []
+    for metric in registry.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, label_names, label_values, value in metric.samples():
+            if label_names:
+                labels = ",".join(
+                    f'{label_name}="{__escape(label_value)}"'
+                    for label_name, label_value in zip(label_names, label_values)
+                )
+                name = name + "{" + labels + "}"
+            lines.append(f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Times every command the mongo client runs, passed in its event_listeners
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        MONGO_COMMAND_SECONDS.observe(
+            event.duration_micros / 1e6, event.command_name, "success"
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        MONGO_COMMAND_SECONDS.observe(
+            event.duration_micros / 1e6, event.command_name, "failure"
+        )
+
+
+def observe_gateway_request(
+    appname: str, status_code: int, elapsed_seconds: float, upstream_seconds: float
+):
+    GATEWAY_REQUEST_SECONDS.observe(elapsed_seconds, appname, int(status_code))
+    GATEWAY_OVERHEAD_SECONDS.observe(
+        max(0.0, elapsed_seconds - upstream_seconds), appname
+    )
+
+
+def __cache_stats(stat: str) -> dict[tuple, float]:
+    return {(name,): cache.stats()[stat] for name, cache in caches.registry.items()}
+
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "authenv_http_requests_in_flight", "Requests being handled right now"
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "authenv_http_request_duration_seconds",
+    "Time to the response start, by route template",
+    ("method", "route", "status"),
+)
+GATEWAY_REQUESTS_IN_FLIGHT = Gauge(
+    "authenv_gateway_requests_in_flight",
+    "Gateway requests being handled right now, by appname",
+    ("appname",),
+)
+GATEWAY_REQUEST_SECONDS = Histogram(
+    "authenv_gateway_request_duration_seconds",
+    "Gateway time to the response start, by appname",
+    ("appname", "status"),
+)
+GATEWAY_UPSTREAM_SECONDS = Histogram(
+    "authenv_gateway_upstream_duration_seconds",
+    "Upstream time to the response headers, by appname",
+    ("appname",),
+)
+GATEWAY_OVERHEAD_SECONDS = Histogram(
+    "authenv_gateway_overhead_seconds",
+    "Gateway time spent outside of upstream calls, by appname",
+    ("appname",),
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "authenv_mongo_command_duration_seconds",
+    "Mongo command round trips, by command and outcome",
+    ("command", "outcome"),
+)
+BCRYPT_SECONDS = Histogram(
+    "authenv_bcrypt_duration_seconds",
+    "Time bcrypt ran on a hashing thread, by operation",
+    ("operation",),
+    buckets=BCRYPT_BUCKETS,
+)
+BCRYPT_QUEUE_WAIT_SECONDS = Histogram(
+    "authenv_bcrypt_queue_wait_seconds",
+    "Time bcrypt work waited for a hashing thread",
+    buckets=BCRYPT_BUCKETS,
+)
+CACHE_HITS = CallbackMetric(
+    "authenv_cache_hits_total",
+    "Cache lookups that found an entry, by cache",
+    "counter",
+    ("cache",),
+    lambda: __cache_stats("hits"),
+)
+CACHE_MISSES = CallbackMetric(
+    "authenv_cache_misses_total",
+    "Cache lookups that found no entry, by cache",
+    "counter",
+    ("cache",),
+    lambda: __cache_stats("misses"),
+)
+CACHE_HIT_RATIO = CallbackMetric(
+    "authenv_cache_hit_ratio",
+    "Hits over lookups since start, by cache",
+    "gauge",
+    ("cache",),
+    lambda: __cache_stats("hit_ratio"),
+)
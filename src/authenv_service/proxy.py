@@ -0,0 +1,109 @@
+import logging
+
+import constants
+import httpx
+from fastapi import FastAPI
+from logger import Logger
+
+log = Logger(logging.getLogger(__name__))
+
+
+def startup_proxy_engine(app: FastAPI):
+    app.proxy_engine = ProxyEngine(
+        max_connections=constants.GATEWAY_MAX_CONNECTIONS,
+        max_keepalive_connections=constants.GATEWAY_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=constants.GATEWAY_KEEPALIVE_EXPIRY,
+        connect_timeout=constants.GATEWAY_CONNECT_TIMEOUT,
+        read_timeout=constants.GATEWAY_READ_TIMEOUT,
+        http2=constants.GATEWAY_HTTP2 and is_http2_available(),
+    )
+    log.info("Started Gateway Proxy Engine...")
+
+
+async def shutdown_proxy_engine(app: FastAPI):
+    await app.proxy_engine.aclose()
+    log.info("Stopped Gateway Proxy Engine...")
+
+
+def is_http2_available():
+    # http2 support in httpx needs the optional `h2` package
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+class ProxyEngine:
+    """
+    Async upstream client for the gateway, one keep-alive pool per upstream base url
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        connect_timeout: float,
+        read_timeout: float,
+        http2: bool = False,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http2 = http2
+        self.clients: dict[str, httpx.AsyncClient] = {}
+
+    def client(self, base_url: str) -> httpx.AsyncClient:
+        # no await between lookup and insert, so this is safe on the event loop
+        client = self.clients.get(base_url)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                # same as the requests calls it replaced, clients get the final response
+                follow_redirects=True,
+            )
+            self.clients[base_url] = client
+        return client
+
+    async def request(
+        self,
+        method: str,
+        base_url: str,
+        url: str,
+        params=None,
+        headers: dict = None,
+        auth: tuple = None,
+        content=None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        # when stream is True, the caller must close the response (aclose)
+        client = self.client(base_url)
+        upstream_request = client.build_request(
+            method=method,
+            url=url,
+            params=params,
+            headers=headers,
+            content=content,
+        )
+        # a streamed body is read once, a 307/308 could not send it again,
+        # so the redirect and its location are passed to the caller instead
+        is_streamed = content is not None and not isinstance(content, (bytes, str))
+        return await client.send(
+            upstream_request,
+            auth=auth,
+            stream=stream,
+            follow_redirects=client.follow_redirects and not is_streamed,
+        )
+
+    async def aclose(self):
+        clients = list(self.clients.values())
+        self.clients.clear()
+        for client in clients:
+            await client.aclose()
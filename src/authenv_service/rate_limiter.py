@@ -0,0 +1,349 @@
+import http
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import constants
+from fastapi import FastAPI, Request
+from logger import Logger
+from pymongo import AsyncMongoClient, ReturnDocument
+from pymongo.errors import PyMongoError
+from utils import raise_http_exception
+
+log = Logger(logging.getLogger(__name__))
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Per route limits from the rateLimits env detail, any of them can be left out
+    User limits apply per username, or per client address on auth excluded paths
+    """
+
+    requests_per_second: Optional[float] = None
+    burst: Optional[float] = None
+    user_requests_per_second: Optional[float] = None
+    user_burst: Optional[float] = None
+    max_concurrent: Optional[int] = None
+    user_max_concurrent: Optional[int] = None
+
+
+def build_rate_limit(config) -> Optional[RateLimit]:
+    # eg: {"requestsPerSecond": 50, "burst": 100, "userRequestsPerSecond": 5, ...}
+    if not isinstance(config, dict):
+        return None
+    rate_limit = RateLimit(
+        requests_per_second=__positive(config.get("requestsPerSecond"), float),
+        burst=__positive(config.get("burst"), float),
+        user_requests_per_second=__positive(config.get("userRequestsPerSecond"), float),
+        user_burst=__positive(config.get("userBurst"), float),
+        max_concurrent=__positive(config.get("maxConcurrent"), int),
+        user_max_concurrent=__positive(config.get("userMaxConcurrent"), int),
+    )
+    return rate_limit if rate_limit != RateLimit() else None
+
+
+def __positive(value, value_type):
+    try:
+        value = value_type(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def take_token(
+    tokens: float, updated_at: float, now: float, rate: float, burst: float
+) -> tuple[float, float]:
+    """
+    Token bucket step, returns (tokens left, seconds to wait, 0 when allowed)
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class RateLimitStore(ABC):
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """
+        Takes a token from the bucket of key, returns seconds to wait, 0 when allowed
+        """
+
+    @abstractmethod
+    async def peek(self, key: str, rate: float, burst: float) -> float:
+        """
+        Seconds to wait for a token from the bucket of key, without taking it
+        """
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """
+    Buckets of this process only, least recently used ones go beyond max_keys
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.__buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self.__buckets.get(key, (burst, now))
+        tokens, retry_after_seconds = take_token(tokens, updated_at, now, rate, burst)
+        self.__buckets[key] = (tokens, now)
+        self.__buckets.move_to_end(key)
+        if len(self.__buckets) > self.max_keys:
+            self.__buckets.popitem(last=False)
+        return retry_after_seconds
+
+    async def peek(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self.__buckets.get(key, (burst, now))
+        return take_token(tokens, updated_at, now, rate, burst)[1]
+
+
+class MongoRateLimitStore(RateLimitStore):
+    """
+    Buckets shared by every process, one atomic upsert per take
+    The refill runs server side in an update pipeline, so concurrent takes never
+    lose tokens, documents expire once a bucket would be full again anyway
+    """
+
+    def __init__(self, mongo_client: AsyncMongoClient):
+        self.__collection = mongo_client[constants.RATE_LIMITS_DATABASE][
+            constants.RATE_LIMITS_COLLECTION
+        ]
+
+    async def create_indexes(self):
+        await self.__collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.time()
+        tokens = {
+            "$min": [
+                burst,
+                {
+                    "$add": [
+                        {"$ifNull": ["$tokens", burst]},
+                        {
+                            "$multiply": [
+                                {
+                                    "$max": [
+                                        0,
+                                        {
+                                            "$subtract": [
+                                                now,
+                                                {"$ifNull": ["$updated_at", now]},
+                                            ]
+                                        },
+                                    ]
+                                },
+                                rate,
+                            ]
+                        },
+                    ]
+                },
+            ]
+        }
+        is_allowed = {"$gte": ["$tokens", 1]}
+        bucket = await self.__collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": tokens, "updated_at": now}},
+                {
+                    "$set": {
+                        "allowed": is_allowed,
+                        "tokens": {
+                            "$cond": [
+                                is_allowed,
+                                {"$subtract": ["$tokens", 1]},
+                                "$tokens",
+                            ]
+                        },
+                        "expires_at": datetime.now(timezone.utc)
+                        + timedelta(seconds=burst / rate + 1),
+                    }
+                },
+            ],
+            projection={"_id": 0, "allowed": 1, "tokens": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / rate
+
+    async def peek(self, key: str, rate: float, burst: float) -> float:
+        bucket = await self.__collection.find_one(
+            {"_id": key}, projection={"_id": 0, "tokens": 1, "updated_at": 1}
+        )
+        if bucket is None:
+            return 0.0
+        now = time.time()
+        return take_token(bucket["tokens"], bucket["updated_at"], now, rate, burst)[1]
+
+
+class ConcurrencyLimiter:
+    """
+    In flight requests per key, in this process, only used from the event loop
+    """
+
+    def __init__(self):
+        self.__in_flight: dict[str, int] = {}
+
+    def acquire(self, key: str, limit: int) -> bool:
+        in_flight = self.__in_flight.get(key, 0)
+        if in_flight >= limit:
+            return False
+        self.__in_flight[key] = in_flight + 1
+        return True
+
+    def release(self, key: str):
+        in_flight = self.__in_flight.get(key, 0) - 1
+        if in_flight > 0:
+            self.__in_flight[key] = in_flight
+        else:
+            self.__in_flight.pop(key, None)
+
+    def in_flight(self) -> int:
+        return sum(self.__in_flight.values())
+
+
+class Admission:
+    """
+    Concurrency slots taken by an admitted request, released once, at the end of
+    its limit block, or later by the caller that holds them, eg: after a streamed body
+    """
+
+    def __init__(self, concurrency_limiter: ConcurrencyLimiter):
+        self.concurrency_limiter = concurrency_limiter
+        self.keys: list[str] = []
+        self.is_held = False
+
+    def hold(self) -> Callable[[], None]:
+        self.is_held = True
+        return self.release
+
+    def release(self):
+        keys, self.keys = self.keys, []
+        for key in keys:
+            self.concurrency_limiter.release(key)
+
+
+async def startup_rate_limiter(app: FastAPI):
+    if constants.RATE_LIMIT_STORE == "mongo":
+        store = MongoRateLimitStore(app.mongo_client)
+        await store.create_indexes()
+    else:
+        store = InMemoryRateLimitStore(max_keys=constants.RATE_LIMIT_MAX_KEYS)
+    app.rate_limiter = RateLimiter(store=store)
+    log.info("Started Rate Limiter: [ %s ]...", type(store).__name__)
+
+
+class RateLimiter:
+    """
+    Admission control for gateway requests, concurrency first as it is the cheapest
+    then the app and the user token buckets, a store failure lets requests through
+    """
+
+    def __init__(self, store: RateLimitStore):
+        self.store = store
+        self.concurrency_limiter = ConcurrencyLimiter()
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_concurrency = 0
+        self.store_errors = 0
+
+    @asynccontextmanager
+    async def limit(self, request: Request, appname: str, rate_limit: RateLimit):
+        user_key = f"{appname}:{self.__user(request)}"
+        admission = Admission(self.concurrency_limiter)
+        try:
+            for key, limit in (
+                (appname, rate_limit.max_concurrent),
+                (user_key, rate_limit.user_max_concurrent),
+            ):
+                if limit is None:
+                    continue
+                if not self.concurrency_limiter.acquire(key, limit):
+                    self.rejected_concurrency += 1
+                    self.__reject(request, appname, retry_after_seconds=1)
+                admission.keys.append(key)
+
+            buckets = [
+                (key, rate, burst or rate)
+                for key, rate, burst in (
+                    (appname, rate_limit.requests_per_second, rate_limit.burst),
+                    (
+                        user_key,
+                        rate_limit.user_requests_per_second,
+                        rate_limit.user_burst,
+                    ),
+                )
+                if rate is not None
+            ]
+            # the later buckets are checked before the first token is taken, so a
+            # request rejected by the user bucket does not drain the app bucket
+            for key, rate, burst in buckets[1:]:
+                self.__check_rate(request, appname, await self.__peek(key, rate, burst))
+            for key, rate, burst in buckets:
+                self.__check_rate(request, appname, await self.__take(key, rate, burst))
+
+            self.admitted += 1
+            yield admission
+        finally:
+            if not admission.is_held:
+                admission.release()
+
+    def __check_rate(self, request: Request, appname: str, retry_after_seconds: float):
+        if retry_after_seconds > 0:
+            self.rejected_rate += 1
+            self.__reject(request, appname, retry_after_seconds)
+
+    async def __take(self, key: str, rate: float, burst: float) -> float:
+        try:
+            return await self.store.take(key, rate, burst)
+        except PyMongoError as ex:
+            self.store_errors += 1
+            log.error("Rate Limit Store Error: [ %s ]", key, extra=ex)
+            return 0.0
+
+    async def __peek(self, key: str, rate: float, burst: float) -> float:
+        try:
+            return await self.store.peek(key, rate, burst)
+        except PyMongoError as ex:
+            self.store_errors += 1
+            log.error("Rate Limit Store Error: [ %s ]", key, extra=ex)
+            return 0.0
+
+    @staticmethod
+    def __user(request: Request) -> str:
+        username = getattr(request.state, "username", None)
+        if username:
+            return username
+        return "client:" + (request.client.host if request.client else "")
+
+    @staticmethod
+    def __reject(request: Request, appname: str, retry_after_seconds: float):
+        raise_http_exception(
+            request=request,
+            status_code=http.HTTPStatus.TOO_MANY_REQUESTS,
+            error=f"Error! Too Many Requests for {appname}!! Please Try Again!!!",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after_seconds)))},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "store": type(self.store).__name__,
+            "admitted": self.admitted,
+            "rejected_rate": self.rejected_rate,
+            "rejected_concurrency": self.rejected_concurrency,
+            "store_errors": self.store_errors,
+            "in_flight": self.concurrency_limiter.in_flight(),
+        }
@@ -0,0 +1,120 @@
+import asyncio
+import http
+import logging
+import time
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable, Optional
+
+from fastapi.responses import JSONResponse
+from logger import Logger
+
+log = Logger(logging.getLogger(__name__))
+
+# answered while warming up, so the platform sees the instance as started
+NOT_WAITING_PATHS = frozenset(
+    ["/authenv-service/tests/ping", "/authenv-service/tests/ready"]
+)
+# from import, close to process start, startup time is measured from here
+STARTED_AT = time.perf_counter()
+
+
+class Readiness:
+    """
+    Startup work that waits on the network, eg: mongodb client, indexes, gateway config
+    Run before serving, or in the background while requests wait on the ready future
+    A warm up registers its shutdowns on the exit stack, a failed one is undone and
+    retried, so a slow or unavailable database never blocks the server from listening
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.ready_seconds: Optional[float] = None
+        self.__ready: Optional[asyncio.Future] = None
+        self.__task: Optional[asyncio.Task] = None
+        self.__exit_stack = AsyncExitStack()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.__ready is not None and self.__ready.done()
+
+    async def warm_up(self, warmup: Callable[[AsyncExitStack], Awaitable]):
+        # awaited, a failure fails the startup
+        self.__ready = asyncio.get_running_loop().create_future()
+        await self.__warm_up(warmup)
+
+    def start(
+        self, warmup: Callable[[AsyncExitStack], Awaitable], retry_seconds: float
+    ):
+        # in the background, retried until it completes
+        self.__ready = asyncio.get_running_loop().create_future()
+        self.__task = asyncio.create_task(
+            self.__run(warmup, retry_seconds), name="readiness"
+        )
+
+    async def stop(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+        await self.__exit_stack.aclose()
+
+    async def wait(self, timeout_seconds: float) -> bool:
+        if self.is_ready:
+            return True
+        if self.__ready is None:
+            return False
+        try:
+            # shielded, a request timing out must not cancel the future for others
+            await asyncio.wait_for(asyncio.shield(self.__ready), timeout_seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def __run(
+        self, warmup: Callable[[AsyncExitStack], Awaitable], retry_seconds: float
+    ):
+        while True:
+            try:
+                await self.__warm_up(warmup)
+                return
+            except Exception as ex:
+                log.error("Error warming up, retrying...", extra=ex)
+                await asyncio.sleep(retry_seconds)
+
+    async def __warm_up(self, warmup: Callable[[AsyncExitStack], Awaitable]):
+        self.attempts += 1
+        exit_stack = AsyncExitStack()
+        try:
+            await warmup(exit_stack)
+        except BaseException as ex:
+            self.error = type(ex).__name__
+            await exit_stack.aclose()
+            raise
+        self.__exit_stack = exit_stack
+        self.error = None
+        self.ready_seconds = time.perf_counter() - STARTED_AT
+        self.__ready.set_result(True)
+        log.info("Ready after [ %.4fs ]...", self.ready_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.is_ready,
+            "ready_seconds": self.ready_seconds,
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
+def not_ready_response(retry_after_seconds: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=http.HTTPStatus.SERVICE_UNAVAILABLE,
+        content={"detail": {"error": "Service is starting, retry shortly"}},
+        headers={"Retry-After": str(max(1, round(retry_after_seconds)))},
+    )
+
+
+readiness = Readiness()
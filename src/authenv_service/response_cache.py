@@ -0,0 +1,210 @@
+import hashlib
+import time
+from typing import Hashable, Mapping, NamedTuple, Optional
+
+import constants
+from caches import LRUTTLCache
+from fastapi import Request
+from singleflight import SingleFlight
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: dict
+    body: bytes
+    etag: Optional[str]
+    # request header values the upstream response varies on, at the time it was stored
+    vary: tuple[tuple[str, str], ...]
+    fresh_until: float
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() < self.fresh_until
+
+    def matches(self, request_headers: Mapping[str, str]) -> bool:
+        return all(request_headers.get(name, "") == value for name, value in self.vary)
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of upstream GET responses, for routes that opt in
+    Freshness follows upstream Cache-Control capped by the route ttl, stale entries
+    with an ETag are revalidated, concurrent misses of a key wait for one fetch
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, max_body_bytes: int):
+        self.max_body_bytes = max_body_bytes
+        # stale entries are kept until this ttl, so they can still be revalidated
+        self.__cache = LRUTTLCache(
+            name="gateway_responses", max_size=max_size, ttl_seconds=ttl_seconds
+        )
+        self.__flights = SingleFlight(
+            name="gateway_responses",
+            max_wait_seconds=constants.GATEWAY_SINGLE_FLIGHT_MAX_WAIT_SECONDS,
+        )
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.bytes_saved = 0
+
+    def get(
+        self, key: Hashable, request_headers: Mapping[str, str]
+    ) -> Optional[CachedResponse]:
+        entry = self.__cache.get(key)
+        if entry is None or not entry.matches(request_headers):
+            return None
+        return entry
+
+    def hit(self, entry: CachedResponse):
+        self.hits += 1
+        self.bytes_saved += len(entry.body)
+
+    def miss(self):
+        self.misses += 1
+
+    async def wait_for_leader(self, key: Hashable) -> bool:
+        # the leader fills the cache, so what it shares is not needed here
+        has_waited, _ = await self.__flights.wait(key)
+        return has_waited
+
+    def lead(self, key: Hashable):
+        return self.__flights.lead(key)
+
+    def is_storable(self, key: Hashable, upstream_headers: Mapping[str, str]) -> bool:
+        freshness = freshness_seconds(upstream_headers, 1.0, key[-1] is not None)
+        return (
+            freshness is not None
+            and (freshness > 0 or "etag" in upstream_headers)
+            and self.__vary(upstream_headers, {}) is not None
+        )
+
+    def store(
+        self,
+        key: Hashable,
+        request_headers: Mapping[str, str],
+        upstream_headers: Mapping[str, str],
+        response_headers: dict,
+        body: bytes,
+        max_ttl_seconds: float,
+    ) -> Optional[CachedResponse]:
+        freshness = freshness_seconds(
+            upstream_headers, max_ttl_seconds, key[-1] is not None
+        )
+        vary = self.__vary(upstream_headers, request_headers)
+        etag = upstream_headers.get("etag")
+        if (
+            freshness is None
+            or vary is None
+            or len(body) > self.max_body_bytes
+            or (freshness <= 0 and etag is None)
+        ):
+            return None
+        entry = CachedResponse(
+            status_code=200,
+            headers=response_headers,
+            body=body,
+            etag=etag,
+            vary=vary,
+            fresh_until=time.monotonic() + freshness,
+        )
+        # without an etag a stale entry is useless, so let it go when it goes stale
+        self.__cache.set(key, entry, ttl_seconds=None if etag else freshness)
+        return entry
+
+    def revalidate(
+        self,
+        key: Hashable,
+        entry: CachedResponse,
+        upstream_headers: Mapping[str, str],
+        max_ttl_seconds: float,
+    ) -> CachedResponse:
+        # 304 may carry a new Cache-Control, otherwise the old freshness applies again
+        freshness = freshness_seconds(
+            upstream_headers, max_ttl_seconds, key[-1] is not None
+        )
+        entry = entry._replace(fresh_until=time.monotonic() + (freshness or 0))
+        self.__cache.set(key, entry)
+        self.revalidations += 1
+        return entry
+
+    @staticmethod
+    def __vary(
+        upstream_headers: Mapping[str, str], request_headers: Mapping[str, str]
+    ) -> Optional[tuple[tuple[str, str], ...]]:
+        names = {
+            name.strip().lower()
+            for name in upstream_headers.get("vary", "").split(",")
+            if name.strip()
+        }
+        if "*" in names:
+            return None
+        return tuple((name, request_headers.get(name, "")) for name in sorted(names))
+
+    def clear(self):
+        self.__cache.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            **self.__cache.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "revalidations": self.revalidations,
+            "collapsed": self.__flights.collapsed,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+def cache_key(request: Request, appname: str, path: str) -> tuple:
+    query = tuple(sorted(request.query_params.multi_items()))
+    # bodies are kept as upstream encoded them, so only reused for the same encodings
+    accept_encoding = request.headers.get("accept-encoding", "")
+    return appname, path, query, accept_encoding, __user_key(request)
+
+
+def __user_key(request: Request) -> Optional[tuple[str, str]]:
+    # validated token username, auth excluded paths fall back to the raw header
+    username = getattr(request.state, "username", None)
+    if username:
+        return "username", username
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return "authorization", hashlib.sha256(authorization.encode()).hexdigest()
+    return None
+
+
+def freshness_seconds(
+    upstream_headers: Mapping[str, str], max_ttl_seconds: float, is_per_user: bool
+) -> Optional[float]:
+    directives = cache_control_directives(upstream_headers.get("cache-control", ""))
+    if "no-store" in directives or ("private" in directives and not is_per_user):
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    for directive in ("s-maxage", "max-age"):
+        if directive in directives:
+            try:
+                return max(0.0, min(max_ttl_seconds, float(directives[directive])))
+            except ValueError:
+                return 0.0
+    return max_ttl_seconds
+
+
+def cache_control_directives(cache_control: str) -> dict[str, str]:
+    directives = {}
+    for directive in cache_control.split(","):
+        name, _, value = directive.partition("=")
+        if name.strip():
+            directives[name.strip().lower()] = value.strip().strip('"')
+    return directives
+
+
+response_cache = ResponseCache(
+    max_size=constants.GATEWAY_RESPONSE_CACHE_MAX_SIZE,
+    ttl_seconds=constants.GATEWAY_RESPONSE_CACHE_TTL_SECONDS,
+    max_body_bytes=constants.GATEWAY_RESPONSE_CACHE_MAX_BODY_BYTES,
+)
+
+
+def stats() -> dict:
+    return response_cache.stats()
@@ -0,0 +1,136 @@
+import re
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from constants import (
+    GATEWAY_AUTH_CONFIGS,
+    GATEWAY_AUTH_EXCLUSIONS,
+    GATEWAY_BASE_URLS,
+    GATEWAY_HEADER_POLICIES,
+    GATEWAY_LOAD_BALANCER_STRATEGY,
+    GATEWAY_LOAD_BALANCERS,
+    GATEWAY_RATE_LIMITS,
+    GATEWAY_RESPONSE_CACHES,
+    SERVICE_AUTH_PWD,
+    SERVICE_AUTH_USR,
+)
+from env_props import EnvDetails
+from exclusion_matcher import ExclusionMatcher
+from header_policy import DEFAULT_HEADER_POLICY, HeaderPolicy, build_header_policy
+from load_balancer import LoadBalancerStrategy
+from rate_limiter import RateLimit, build_rate_limit
+
+# base url keys look like `/appname/`
+APPNAME_PATTERN = re.compile("/(.*?)/")
+
+
+@dataclass(frozen=True)
+class Route:
+    appname: str
+    base_urls: tuple[str, ...]
+    auth: Optional[tuple[str, str]] = None
+    strategy: LoadBalancerStrategy = LoadBalancerStrategy.ROUND_ROBIN
+    # GET responses are cached up to these many seconds, None when not opted in
+    cache_ttl_seconds: Optional[float] = None
+    header_policy: HeaderPolicy = DEFAULT_HEADER_POLICY
+    rate_limit: Optional[RateLimit] = None
+
+
+@dataclass(frozen=True)
+class RouteTable:
+    """
+    Immutable snapshot of gateway config, never modified after it is built
+    A reload builds a new table and swaps the reference, so readers never see it empty
+    """
+
+    env_details: tuple[EnvDetails, ...] = ()
+    routes: Mapping[str, Route] = field(default_factory=lambda: MappingProxyType({}))
+    auth_exclusions: ExclusionMatcher = field(default_factory=ExclusionMatcher)
+    is_loaded: bool = False
+
+    def route(self, appname: str) -> Optional[Route]:
+        return self.routes.get(appname)
+
+
+EMPTY_ROUTE_TABLE = RouteTable()
+
+
+def build_route_table(env_details: list[EnvDetails], app_env: str) -> RouteTable:
+    env_details_by_name = {env_detail.name: env_detail for env_detail in env_details}
+    base_urls = __map_value(env_details_by_name, GATEWAY_BASE_URLS.format(app_env))
+    auth_configs = __map_value(env_details_by_name, GATEWAY_AUTH_CONFIGS)
+    load_balancers = __map_value(env_details_by_name, GATEWAY_LOAD_BALANCERS)
+    response_caches = __map_value(env_details_by_name, GATEWAY_RESPONSE_CACHES)
+    header_policies = __map_value(env_details_by_name, GATEWAY_HEADER_POLICIES)
+    rate_limits = __map_value(env_details_by_name, GATEWAY_RATE_LIMITS)
+    auth_exclusions = env_details_by_name.get(GATEWAY_AUTH_EXCLUSIONS)
+
+    routes = {}
+    for k, v in base_urls.items():
+        appname = APPNAME_PATTERN.findall(k)[0]
+        routes[appname] = Route(
+            appname=appname,
+            base_urls=__base_urls(v),
+            auth=__auth(auth_configs, appname),
+            strategy=__strategy(load_balancers, appname),
+            cache_ttl_seconds=__cache_ttl_seconds(response_caches, appname),
+            header_policy=__header_policy(header_policies, appname),
+            rate_limit=build_rate_limit(rate_limits.get(appname)),
+        )
+
+    return RouteTable(
+        env_details=tuple(env_details),
+        routes=MappingProxyType(routes),
+        auth_exclusions=ExclusionMatcher(
+            auth_exclusions.list_value if auth_exclusions else []
+        ),
+        is_loaded=True,
+    )
+
+
+def __map_value(env_details_by_name: dict[str, EnvDetails], name: str) -> dict:
+    env_detail = env_details_by_name.get(name)
+    return env_detail.map_value if env_detail else {}
+
+
+def __base_urls(value) -> tuple[str, ...]:
+    # one base url, or a list of them to load balance across
+    if isinstance(value, str):
+        value = value.split(",")
+    return tuple(base_url.strip().rstrip("/") for base_url in value if base_url.strip())
+
+
+def __strategy(load_balancers: dict, appname: str) -> LoadBalancerStrategy:
+    strategy = load_balancers.get(appname, GATEWAY_LOAD_BALANCER_STRATEGY)
+    try:
+        return LoadBalancerStrategy(strategy)
+    except ValueError:
+        return LoadBalancerStrategy(GATEWAY_LOAD_BALANCER_STRATEGY)
+
+
+def __cache_ttl_seconds(response_caches: dict, appname: str) -> Optional[float]:
+    try:
+        cache_ttl_seconds = float(response_caches.get(appname, 0))
+    except (TypeError, ValueError):
+        return None
+    return cache_ttl_seconds if cache_ttl_seconds > 0 else None
+
+
+def __header_policy(header_policies: dict, appname: str) -> HeaderPolicy:
+    # eg: {"appname": {"restrictedHeaders": [...], "responseHeaders": [...]}}
+    header_policy = header_policies.get(appname)
+    if not isinstance(header_policy, dict):
+        return DEFAULT_HEADER_POLICY
+    return build_header_policy(
+        restricted_headers=header_policy.get("restrictedHeaders", []),
+        response_headers=header_policy.get("responseHeaders", []),
+    )
+
+
+def __auth(auth_configs: dict, appname: str):
+    username = auth_configs.get(appname + SERVICE_AUTH_USR)
+    password = auth_configs.get(appname + SERVICE_AUTH_PWD)
+    if username and password:
+        return username, password
+    return None
@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Hashable, Optional
+
+# every single flight group registers here by name, so its stats can be exposed
+registry: dict[str, "SingleFlight"] = {}
+
+
+class Flight:
+    def __init__(self, future: Optional[asyncio.Future]):
+        self.__future = future
+
+    @property
+    def is_leader(self) -> bool:
+        return self.__future is not None
+
+    def share(self, value: Any):
+        if self.__future is not None and not self.__future.done():
+            self.__future.set_result(value)
+
+
+class SingleFlight:
+    """
+    Lets identical concurrent calls wait on the one already in flight
+    The leader shares its result, or None when it has nothing reusable (eg: failed,
+    streamed body), then waiters make their own call
+    Waits are bounded, only used from the event loop, so it needs no locking
+    """
+
+    def __init__(self, name: str, max_wait_seconds: float):
+        self.name = name
+        self.max_wait_seconds = max_wait_seconds
+        self.leaders = 0
+        self.collapsed = 0
+        self.shared = 0
+        self.timeouts = 0
+        self.__in_flight: dict[Hashable, asyncio.Future] = {}
+        registry[name] = self
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        return key in self.__in_flight
+
+    async def wait(self, key: Hashable) -> tuple[bool, Any]:
+        """
+        (True, shared value) after waiting for a leader, (False, None) when none
+        """
+        future = self.__in_flight.get(key)
+        if future is None:
+            return False, None
+        self.collapsed += 1
+        try:
+            # shield, so a waiter timing out does not cancel the leader result
+            value = await asyncio.wait_for(
+                asyncio.shield(future), timeout=self.max_wait_seconds
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return True, None
+        if value is not None:
+            self.shared += 1
+        return True, value
+
+    @contextmanager
+    def lead(self, key: Hashable):
+        # only the first caller leads, later ones run without blocking anyone
+        if key in self.__in_flight:
+            yield Flight(None)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.__in_flight[key] = future
+        self.leaders += 1
+        try:
+            yield Flight(future)
+        finally:
+            del self.__in_flight[key]
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "max_wait_seconds": self.max_wait_seconds,
+            "in_flight": len(self.__in_flight),
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+            "shared": self.shared,
+            "timeouts": self.timeouts,
+        }
+
+
+def stats() -> dict:
+    return {name: single_flight.stats() for name, single_flight in registry.items()}
@@ -0,0 +1,210 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import NamedTuple, Optional
+
+import constants
+from fastapi import Request
+from logger import LogQueueHandler, LogQueueListener
+
+TRACEPARENT = "traceparent"
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+class TraceContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    trace_flags: str = "01"
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{self.trace_flags}"
+
+
+def parse_traceparent(traceparent: Optional[str]) -> Optional[TraceContext]:
+    # eg: 00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01, None when invalid
+    if not traceparent:
+        return None
+    parts = traceparent.strip().lower().split("-")
+    if len(parts) < 4:
+        return None
+    version, trace_id, span_id, trace_flags = parts[:4]
+    # later versions may add fields, version 00 has exactly four
+    if version == "ff" or (version == "00" and len(parts) != 4):
+        return None
+    if (len(version), len(trace_id), len(span_id), len(trace_flags)) != (2, 32, 16, 2):
+        return None
+    if not set(version + trace_id + span_id + trace_flags) <= HEX_DIGITS:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return TraceContext(trace_id=trace_id, span_id=span_id, trace_flags=trace_flags)
+
+
+def new_trace_id() -> str:
+    return f"{random.getrandbits(128) or 1:032x}"
+
+
+def new_span_id() -> str:
+    return f"{random.getrandbits(64) or 1:016x}"
+
+
+def get_trace_id(request: Request) -> str:
+    trace_context = getattr(request.state, "trace_context", None)
+    return trace_context.trace_id if trace_context is not None else ""
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    trace_flags: str
+    # epoch seconds, so spans from many services line up
+    start_time: float
+    attributes: dict = field(default_factory=dict)
+    duration_seconds: float = 0.0
+    error: Optional[str] = None
+
+    def traceparent(self) -> str:
+        return TraceContext(self.trace_id, self.span_id, self.trace_flags).traceparent()
+
+    def __str__(self) -> str:
+        # serialized only when written, eg: by the file exporter thread
+        return json.dumps(asdict(self), default=str)
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, span: Span):
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """
+    Keeps the last max_spans spans of this process, for tests and the traces endpoint
+    """
+
+    def __init__(self, max_spans: int):
+        self.__spans: deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self.__spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> list[Span]:
+        return [s for s in self.__spans if trace_id is None or s.trace_id == trace_id]
+
+    def clear(self):
+        self.__spans.clear()
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Appends spans to a file as json lines, one background thread does the writes
+    Same queue and listener as the log pipeline, so an export is one enqueue
+    """
+
+    def __init__(self, file_location: str, queue_max_size: int):
+        os.makedirs(os.path.dirname(file_location) or ".", exist_ok=True)
+        file_handler = logging.FileHandler(file_location, encoding="utf-8", delay=True)
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self.queue_handler = LogQueueHandler(queue.Queue(maxsize=queue_max_size))
+        self.listener = LogQueueListener(self.queue_handler.queue, file_handler)
+        self.listener.start()
+        self.is_started = True
+        atexit.register(self.stop)
+
+    def stop(self):
+        # writes out the spans still queued
+        if self.is_started:
+            self.listener.stop()
+            self.is_started = False
+
+    def export(self, span: Span):
+        self.queue_handler.enqueue(
+            logging.LogRecord(
+                name="spans",
+                level=logging.INFO,
+                pathname="",
+                lineno=0,
+                msg="%s",
+                args=(span,),
+                exc_info=None,
+            )
+        )
+
+
+class Tracer:
+    """
+    Spans per request, the current one is kept in request.state.trace_context
+    The first span continues the caller trace from its traceparent, or starts one
+    Without an exporter spans are still timed and propagated, just not kept
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter]):
+        self.exporter = exporter
+
+    @contextmanager
+    def span(self, request: Request, name: str, **attributes):
+        current = getattr(request.state, "trace_context", None)
+        parent = current or parse_traceparent(request.headers.get(TRACEPARENT))
+        if parent is None:
+            trace_id, parent_span_id, trace_flags = new_trace_id(), None, "01"
+        else:
+            trace_id, parent_span_id, trace_flags = parent
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=new_span_id(),
+            parent_span_id=parent_span_id,
+            trace_flags=trace_flags,
+            start_time=time.time(),
+            attributes=attributes,
+        )
+        request.state.trace_context = TraceContext(trace_id, span.span_id, trace_flags)
+        started_at = time.perf_counter()
+        try:
+            yield span
+        except Exception as ex:
+            span.error = str(getattr(ex, "status_code", "") or type(ex).__name__)
+            raise
+        finally:
+            span.duration_seconds = time.perf_counter() - started_at
+            # back to the parent span, the first one stays for logs after it ends
+            if current is not None:
+                request.state.trace_context = current
+            if self.exporter is not None:
+                self.exporter.export(span)
+
+
+def build_span_exporter(exporter: str) -> Optional[SpanExporter]:
+    if exporter == "memory":
+        return InMemorySpanExporter(max_spans=constants.TRACE_MEMORY_MAX_SPANS)
+    if exporter == "file":
+        file_location = constants.TRACE_FILE
+        if not file_location:
+            file_location = (
+                constants.REPO_HOME or "."
+            ) + "/logs/authenv-service/authenv-service-spans.jsonl"
+        return FileSpanExporter(
+            file_location=file_location, queue_max_size=constants.LOG_QUEUE_MAX_SIZE
+        )
+    return None
+
+
+tracer = Tracer(exporter=build_span_exporter(constants.TRACE_EXPORTER))
+
+
+def spans(trace_id: Optional[str] = None) -> list[dict]:
+    # only the in memory exporter can be read back
+    if not isinstance(tracer.exporter, InMemorySpanExporter):
+        return []
+    return [asdict(span) for span in tracer.exporter.spans(trace_id)]
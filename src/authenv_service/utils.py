@@ -1,11 +1,12 @@
 import datetime
+import hashlib
 import http
 import logging
 import secrets
-import threading
 import time
 from enum import Enum
 
+import caches
 import constants
 import jwt
 from fastapi import FastAPI, HTTPException, Request
@@ -17,7 +18,9 @@ from fastapi.security import (
 )
 from jwt import PyJWTError
 from logger import Logger
-from pymongo import MongoClient
+from metrics import MongoCommandListener
+from pymongo import AsyncMongoClient
+from tracing import get_trace_id
 
 log = Logger(logging.getLogger(__name__))
 
@@ -27,8 +30,8 @@ def startup_db_client(app: FastAPI):
     log.info("Connected to MongoDb Client...")
 
 
-def shutdown_db_client(app: FastAPI):
-    app.mongo_client.close()
+async def shutdown_db_client(app: FastAPI):
+    await app.mongo_client.close()
     log.info("Disconnected from MongoDb Client...")
 
 
@@ -39,7 +42,30 @@ def __get_mongo_client():
             constants.MONGODB_USR_NAME, constants.MONGODB_USR_PWD
         )
     )
-    return MongoClient(connection_string)
+    return AsyncMongoClient(
+        connection_string,
+        maxPoolSize=constants.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=constants.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=constants.MONGODB_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=constants.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=constants.MONGODB_CONNECT_TIMEOUT_MS,
+        event_listeners=[MongoCommandListener()],
+    )
+
+
+async def is_collection_scan(cursor) -> bool:
+    # query plan self check, true if the winning plan scans the whole collection
+    explain = await cursor.explain()
+    stages = [explain.get("queryPlanner", {}).get("winningPlan", {})]
+    while stages:
+        stage = stages.pop()
+        if stage.get("stage") == "COLLSCAN":
+            return True
+        stages.extend(v for k, v in stage.items() if k.endswith("Stage"))
+        stages.extend(stage.get("inputStages", []))
+        if "queryPlan" in stage:
+            stages.append(stage["queryPlan"])
+    return False
 
 
 # security
@@ -77,21 +103,51 @@ def encode_http_auth_credentials(username, source_ip):
     return jwt.encode(payload=token_claim, key=constants.SECRET_KEY, algorithm="HS256")
 
 
+def get_client_ip(request: Request) -> str:
+    # behind app engine the peer is its front end, the client is in its headers
+    client_ip = request.headers.get("x-appengine-user-ip", "").strip()
+    if not client_ip:
+        client_ip = request.headers.get("x-forwarded-for", "").split(",")[0].strip()
+    if not client_ip and request.client:
+        client_ip = request.client.host
+    return client_ip
+
+
 def get_err_msg(msg: str, err_msg: str = ""):
     return msg + "\n" + err_msg
 
 
+# verified token claims, keyed by token digest, so repeat tokens skip jwt.decode
+token_cache = caches.LRUTTLCache(
+    name="tokens",
+    max_size=constants.TOKEN_CACHE_MAX_SIZE,
+    ttl_seconds=constants.TOKEN_CACHE_TTL_SECONDS,
+)
+
+
+def decode_http_auth_credentials(token: str) -> dict:
+    secret_key = constants.SECRET_KEY
+    token_cache.set_generation(secret_key)
+    token_digest = hashlib.sha256(token.encode("utf-8")).digest()
+    token_claims = token_cache.get(token_digest)
+    if token_claims is None:
+        token_claims = jwt.decode(jwt=token, key=secret_key, algorithms=["HS256"])
+        exp = token_claims.get("exp")
+        token_cache.set(
+            token_digest,
+            token_claims,
+            ttl_seconds=None if exp is None else exp - time.time(),
+        )
+    return token_claims
+
+
 def validate_http_auth_credentials(
     request: Request,
     http_auth_credentials: HTTPAuthorizationCredentials,
     username: str = None,
 ) -> str:
     try:
-        token_claims = jwt.decode(
-            jwt=http_auth_credentials.credentials,
-            key=constants.SECRET_KEY,
-            algorithms=["HS256"],
-        )
+        token_claims = decode_http_auth_credentials(http_auth_credentials.credentials)
         token_username = token_claims.get("username")
 
         if username is None:
@@ -112,64 +168,26 @@ def validate_http_auth_credentials(
         )
 
 
-# scheduler
-def run_scheduler_gateway():
-    log.info("Starting Run Scheduler Gateway...")
-    from gateway import set_env_details
-
-    app = FastAPI()
-    app.mongo_client = __get_mongo_client()
-    request = Request(scope={"type": "http", "app": app})
-    set_env_details(request=request, force_reset=True)
-    app.mongo_client.close()
-
-
-def start_scheduler():
-    log.info("Starting Scheduler Thread...")
-    # run scheduler gateway to set cache for the first time
-    run_scheduler_gateway()
-    stop_event = threading.Event()
-
-    class ScheduleThread(threading.Thread):
-        @classmethod
-        def run(cls):
-            while not stop_event.is_set():
-                current_time = datetime.datetime.now().time().strftime("%H:%M:%S")
-                if current_time in constants.SCHEDULER_ENV_DETAILS_EXECUTE_TIME:
-                    run_scheduler_gateway()
-                time.sleep(1)
-
-    schedule_thread = ScheduleThread()
-    schedule_thread.start()
-    return stop_event, schedule_thread
-
-
-def stop_scheduler(stop_event: threading.Event, schedule_thread: threading.Thread):
-    stop_event.set()
-    schedule_thread.join()
-    log.info("Stopped Scheduler Thread...")
-
-
 # other utility functions
 def is_production():
     return constants.APP_ENV == "production"
 
 
 def raise_http_exception(
-    request: Request, status_code: http.HTTPStatus | int, error: str = ""
+    request: Request,
+    status_code: http.HTTPStatus | int,
+    error: str = "",
+    headers: dict = None,
 ):
     log.info(
-        f"[ {get_trace_int(request)} ] | RESPONSE::: Outgoing: [ {request.url} ] "
-        f"| Status: [ {status_code} ]"
+        "[ %s ] | RESPONSE::: Outgoing: [ %s ] | Status: [ %s ]",
+        get_trace_id(request),
+        request.url,
+        status_code,
+    )
+    raise HTTPException(
+        status_code=status_code, detail={"error": error}, headers=headers
     )
-    raise HTTPException(status_code=status_code, detail={"error": error})
-
-
-def get_trace_int(request: Request):
-    try:
-        return request.state.trace_int
-    except AttributeError:
-        return ""
 
 
 class LogLevelOptions(str, Enum):
@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasicCredentials
+
+from src.authenv_service import auth_users, constants
+from src.authenv_service.utils import encode_http_auth_credentials
+from tests.authenv_service_test.utils_test import app, dummy_url_request
+
+USER_DETAILS = {
+    "username": "some-user",
+    "firstName": "First",
+    "lastName": "Last",
+    "status": "ACTIVE",
+    "email": "some@email.com",
+    "phone": "1234567890",
+}
+
+
+class AuthUsersTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        auth_users.user_details_cache.clear()
+        auth_users.login_throttle.counter.reset("user:some-user")
+        self.mongo_collection = Mock()
+        self.mongo_collection.find_one = AsyncMock(return_value=dict(USER_DETAILS))
+        self.mongo_collection.update_one = AsyncMock(
+            return_value=Mock(modified_count=1)
+        )
+        app.mongo_client = Mock()
+        app.mongo_client.user_details.userdetails = self.mongo_collection
+        token = encode_http_auth_credentials("some-user", "127.0.0.1")
+        self.credentials = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=token
+        )
+
+    async def test_find_reads_through_cache(self):
+        for _ in range(3):
+            response = await auth_users.find(
+                dummy_url_request, "some-user", self.credentials
+            )
+            self.assertEqual(response.user_details.first_name, "First")
+        self.mongo_collection.find_one.assert_awaited_once()
+        projection = self.mongo_collection.find_one.call_args.kwargs["projection"]
+        self.assertNotIn("password", projection)
+
+    async def test_update_invalidates_cache(self):
+        await auth_users.find(dummy_url_request, "some-user", self.credentials)
+        user_details_request = auth_users.UserDetailsRequest.model_validate(
+            {"user_details": {**USER_DETAILS, "firstName": "Changed"}}
+        )
+        await auth_users.update(
+            dummy_url_request, "some-user", user_details_request, self.credentials
+        )
+        self.assertIsNone(auth_users.user_details_cache.get("some-user"))
+        await auth_users.find(dummy_url_request, "some-user", self.credentials)
+        self.assertEqual(self.mongo_collection.find_one.await_count, 2)
+
+    async def test_login_throttled_before_db(self):
+        self.mongo_collection.find_one = AsyncMock(return_value=None)
+        login_request = auth_users.LoginRequest(
+            username="some-user", password="some-password"
+        )
+        basic_credentials = HTTPBasicCredentials(
+            username=constants.BASIC_AUTH_USR, password=constants.BASIC_AUTH_PWD
+        )
+        status_codes = []
+        for _ in range(constants.LOGIN_THROTTLE_USER_DELAY_AFTER + 1):
+            with self.assertRaises(HTTPException) as ex:
+                await auth_users.login(
+                    dummy_url_request, login_request, basic_credentials
+                )
+            status_codes.append(ex.exception.status_code)
+        self.assertEqual(
+            status_codes, [404] * constants.LOGIN_THROTTLE_USER_DELAY_AFTER + [429]
+        )
+        self.assertEqual(
+            self.mongo_collection.find_one.await_count,
+            constants.LOGIN_THROTTLE_USER_DELAY_AFTER,
+        )
+
+    async def test_login_parallel_burst_throttled(self):
+        async def find_one(*args, **kwargs):
+            await asyncio.sleep(0.01)
+
+        self.mongo_collection.find_one = AsyncMock(side_effect=find_one)
+        login_request = auth_users.LoginRequest(
+            username="some-user", password="some-password"
+        )
+        basic_credentials = HTTPBasicCredentials(
+            username=constants.BASIC_AUTH_USR, password=constants.BASIC_AUTH_PWD
+        )
+        attempts = constants.LOGIN_THROTTLE_USER_DELAY_AFTER + 3
+        # all in flight at once, none has failed yet when the others are checked
+        results = await asyncio.gather(
+            *(
+                auth_users.login(dummy_url_request, login_request, basic_credentials)
+                for _ in range(attempts)
+            ),
+            return_exceptions=True,
+        )
+        self.assertEqual(
+            sorted(ex.status_code for ex in results),
+            [404] * constants.LOGIN_THROTTLE_USER_DELAY_AFTER + [429] * 3,
+        )
+        self.assertEqual(
+            self.mongo_collection.find_one.await_count,
+            constants.LOGIN_THROTTLE_USER_DELAY_AFTER,
+        )
@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import patch
+
+from src.authenv_service.caches import LRUTTLCache, clear_all
+
+
+class LRUTTLCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUTTLCache(name="test-lru", max_size=2, ttl_seconds=60)
+        cache.set("one", 1)
+        cache.set("two", 2)
+        self.assertEqual(cache.get("one"), 1)
+        cache.set("three", 3)
+        self.assertIsNone(cache.get("two"))
+        self.assertEqual(cache.get("one"), 1)
+        self.assertEqual(cache.get("three"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["hits"], 3)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_expires_after_ttl(self):
+        cache = LRUTTLCache(name="test-ttl", max_size=2, ttl_seconds=60)
+        with patch("src.authenv_service.caches.time.monotonic", return_value=100.0):
+            cache.set("one", 1)
+            cache.set("two", 2, ttl_seconds=5)
+            cache.set("three", 3, ttl_seconds=0)
+        with patch("src.authenv_service.caches.time.monotonic", return_value=110.0):
+            self.assertEqual(cache.get("one"), 1)
+            self.assertIsNone(cache.get("two"))
+            self.assertIsNone(cache.get("three"))
+
+    def test_set_generation_flushes(self):
+        cache = LRUTTLCache(name="test-generation", max_size=2, ttl_seconds=60)
+        cache.set_generation("one")
+        cache.set("one", 1)
+        cache.set_generation("one")
+        self.assertEqual(cache.get("one"), 1)
+        cache.set_generation("two")
+        self.assertIsNone(cache.get("one"))
+
+    def test_clear_all(self):
+        one = LRUTTLCache(name="test-clear-one", max_size=2, ttl_seconds=60)
+        two = LRUTTLCache(name="test-clear-two", max_size=2, ttl_seconds=60)
+        one.set("one", 1)
+        two.set("two", 2)
+        clear_all()
+        self.assertEqual((len(one), len(two)), (0, 0))
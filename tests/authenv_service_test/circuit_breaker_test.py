@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import patch
+
+from src.authenv_service.circuit_breaker import CircuitBreaker, CircuitState
+
+
+def circuit_breaker():
+    return CircuitBreaker(
+        name="app-one",
+        window_size=4,
+        minimum_calls=4,
+        failure_rate_threshold=0.5,
+        slow_call_rate_threshold=1.0,
+        slow_call_seconds=1.0,
+        open_seconds=10,
+        half_open_calls=1,
+    )
+
+
+@patch("src.authenv_service.circuit_breaker.time.monotonic", return_value=100.0)
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_on_failure_rate(self, mock_monotonic):
+        cb = circuit_breaker()
+        for is_failure in (False, True, False):
+            generation = cb.allow()
+            self.assertIsNotNone(generation)
+            cb.record(generation, is_failure=is_failure, elapsed_seconds=0.1)
+        self.assertEqual(cb.state, CircuitState.CLOSED)
+        cb.record(cb.allow(), is_failure=True, elapsed_seconds=0.1)
+        self.assertEqual(cb.state, CircuitState.OPEN)
+        self.assertIsNone(cb.allow())
+        self.assertEqual(cb.retry_after_seconds(), 10)
+
+    def test_opens_on_slow_calls(self, mock_monotonic):
+        cb = circuit_breaker()
+        for _ in range(4):
+            cb.record(cb.allow(), is_failure=False, elapsed_seconds=2.0)
+        self.assertEqual(cb.state, CircuitState.OPEN)
+
+    def test_half_open_probe(self, mock_monotonic):
+        cb = circuit_breaker()
+        for _ in range(4):
+            cb.record(cb.allow(), is_failure=True, elapsed_seconds=0.1)
+        mock_monotonic.return_value = 111.0
+        probe = cb.allow()
+        self.assertIsNotNone(probe)
+        self.assertEqual(cb.state, CircuitState.HALF_OPEN)
+        # only one probe at a time
+        self.assertIsNone(cb.allow())
+        cb.record(probe, is_failure=True, elapsed_seconds=0.1)
+        self.assertEqual(cb.state, CircuitState.OPEN)
+
+        mock_monotonic.return_value = 122.0
+        cb.record(cb.allow(), is_failure=False, elapsed_seconds=0.1)
+        self.assertEqual(cb.state, CircuitState.CLOSED)
+        self.assertEqual(cb.stats()["rejected"], 1)
+
+    def test_call_from_before_trip_is_not_a_probe(self, mock_monotonic):
+        cb = circuit_breaker()
+        slow_call = cb.allow()
+        for _ in range(4):
+            cb.record(cb.allow(), is_failure=True, elapsed_seconds=0.1)
+        self.assertEqual(cb.state, CircuitState.OPEN)
+
+        mock_monotonic.return_value = 111.0
+        probe = cb.allow()
+        self.assertEqual(cb.state, CircuitState.HALF_OPEN)
+        # admitted while closed, it finishes during half open and is ignored
+        cb.record(slow_call, is_failure=False, elapsed_seconds=0.1)
+        cb.release(slow_call)
+        self.assertEqual(cb.state, CircuitState.HALF_OPEN)
+        self.assertIsNone(cb.allow())
+
+        cb.record(probe, is_failure=False, elapsed_seconds=0.1)
+        self.assertEqual(cb.state, CircuitState.CLOSED)
@@ -0,0 +1,161 @@
+import gzip
+import unittest
+import zlib
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+
+from src.authenv_service.compression import CompressionMiddleware, negotiate_encoding
+
+BIG_BODY = b'{"key": "value"}' * 100
+
+
+def compression_app():
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=500, gzip_level=6, brotli_quality=4
+    )
+
+    @app.get("/big")
+    def big():
+        return Response(content=BIG_BODY, media_type="application/json")
+
+    @app.get("/small")
+    def small():
+        return Response(content=b'{"key": "value"}', media_type="application/json")
+
+    @app.get("/image")
+    def image():
+        return Response(content=BIG_BODY, media_type="image/png")
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(
+            content=gzip.compress(BIG_BODY),
+            media_type="application/json",
+            headers={"content-encoding": "gzip"},
+        )
+
+    @app.get("/partial")
+    def partial():
+        return Response(
+            content=BIG_BODY[:1000],
+            status_code=206,
+            media_type="application/json",
+            headers={"content-range": f"bytes 0-999/{len(BIG_BODY)}"},
+        )
+
+    @app.get("/no-transform")
+    def no_transform():
+        return Response(
+            content=BIG_BODY,
+            media_type="application/json",
+            headers={"cache-control": "public, no-transform"},
+        )
+
+    @app.get("/stream")
+    def stream():
+        async def chunks():
+            for _ in range(10):
+                yield BIG_BODY
+
+        return StreamingResponse(content=chunks(), media_type="text/csv")
+
+    return app
+
+
+class CompressionMiddlewareTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=compression_app()),
+            base_url="http://compression",
+            headers={"accept-encoding": "gzip"},
+        )
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_compresses_big_body(self):
+        response = await self.client.get("/big")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "accept-encoding")
+        self.assertLess(int(response.headers["content-length"]), len(BIG_BODY))
+        self.assertEqual(response.content, BIG_BODY)
+
+    async def test_skips_small_body(self):
+        response = await self.client.get("/small")
+        self.assertNotIn("content-encoding", response.headers)
+
+    async def test_skips_incompressible_type(self):
+        response = await self.client.get("/image")
+        self.assertNotIn("content-encoding", response.headers)
+
+    async def test_passes_encoded_body_through(self):
+        response = await self.client.get("/encoded")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.content, BIG_BODY)
+
+    async def test_compresses_stream(self):
+        response = await self.client.get("/stream")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertNotIn("content-length", response.headers)
+        self.assertEqual(response.content, BIG_BODY * 10)
+
+    async def test_skips_partial_body(self):
+        response = await self.client.get("/partial")
+        self.assertEqual(response.status_code, 206)
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["content-range"], "bytes 0-999/1600")
+        self.assertEqual(response.content, BIG_BODY[:1000])
+
+    async def test_skips_no_transform(self):
+        response = await self.client.get("/no-transform")
+        self.assertNotIn("content-encoding", response.headers)
+
+    async def test_flushes_each_streamed_chunk(self):
+        lines = [b'{"line": %d}\n' % i for i in range(3)]
+
+        async def ndjson_app(scope, receive, send):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson")],
+                }
+            )
+            for i, line in enumerate(lines):
+                more_body = i < len(lines) - 1
+                await send(
+                    {"type": "http.response.body", "body": line, "more_body": more_body}
+                )
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = CompressionMiddleware(
+            ndjson_app, minimum_size=500, gzip_level=6, brotli_quality=4
+        )
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "headers": [(b"accept-encoding", b"gzip")],
+        }
+        await middleware(scope, None, send)
+        # every line can be decoded as soon as it is sent, not only at the end
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        bodies = [m["body"] for m in sent if m["type"] == "http.response.body"]
+        self.assertEqual([decompressor.decompress(b) for b in bodies], lines)
+
+    async def test_skips_when_client_accepts_none(self):
+        response = await self.client.get("/big", headers={"accept-encoding": ""})
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding("deflate, gzip;q=0.5"), "gzip")
+        self.assertEqual(negotiate_encoding("*"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+        self.assertIsNone(negotiate_encoding("identity"))
+        self.assertIsNone(negotiate_encoding(None))
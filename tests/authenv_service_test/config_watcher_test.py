@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import unittest
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+from fastapi import FastAPI
+from pymongo.errors import OperationFailure, PyMongoError
+
+from src.authenv_service import config_watcher
+from src.authenv_service.env_props import EnvDetails
+
+ENV_DETAILS = [EnvDetails.model_validate({"name": "authExclusions"})]
+
+
+class ChangeStream:
+    def __init__(self, changes):
+        self.changes = changes
+        self.resume_token = {"_data": "token"}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def __aiter__(self):
+        for change in self.changes:
+            yield change
+        await asyncio.Event().wait()
+
+
+class FailingChangeStream(ChangeStream):
+    def __init__(self, changes, error):
+        super().__init__(changes)
+        self.error = error
+
+    async def __aiter__(self):
+        for change in self.changes:
+            yield change
+        raise self.error
+
+
+def watcher_app(watch, reset=None, reset_watch=None):
+    app = FastAPI()
+    app.mongo_client = MagicMock()
+    app.mongo_client.__getitem__.return_value.watch = watch
+    reset_collection = app.mongo_client.__getitem__.return_value.__getitem__
+    reset_collection.return_value.watch = reset_watch or AsyncMock(
+        return_value=ChangeStream([])
+    )
+    reset_collection.return_value.find_one = AsyncMock(return_value=reset)
+    reset_collection.return_value.update_one = AsyncMock()
+    return app
+
+
+def not_supported():
+    return AsyncMock(side_effect=OperationFailure("not supported", code=40573))
+
+
+@patch.object(config_watcher, "env_props")
+@patch.object(config_watcher, "gateway")
+class ConfigWatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def run_watcher(self, app):
+        watcher = config_watcher.ConfigWatcher(
+            app=app, poll_interval_seconds=0, poll_jitter_seconds=0, retry_seconds=0
+        )
+        await watcher.start()
+        await asyncio.sleep(0.05)
+        await watcher.stop()
+        return watcher
+
+    async def test_change_stream_reloads_gateway(self, mock_gateway, mock_env_props):
+        mock_gateway.reload_env_details = AsyncMock()
+        changes = [{"ns": {"coll": "app_other"}}, {"ns": {"coll": "app_authgateway"}}]
+        app = watcher_app(AsyncMock(return_value=ChangeStream(changes)))
+        watcher = await self.run_watcher(app)
+        self.assertEqual(
+            watcher.stats(), {"mode": "change_stream", "reloads": 1, "resets": 0}
+        )
+        # initial load and one reload
+        self.assertEqual(mock_gateway.reload_env_details.await_count, 2)
+        mock_env_props.invalidate_env_details_cache.assert_any_call(
+            app_name="app_other"
+        )
+
+    async def test_reload_error_does_not_stop_watcher(
+        self, mock_gateway, mock_env_props
+    ):
+        # initial load, a failed reload, then the same change seen again
+        mock_gateway.reload_env_details = AsyncMock(
+            side_effect=itertools.chain(
+                [None, PyMongoError("connection reset")], itertools.repeat(None)
+            )
+        )
+        watch = AsyncMock(
+            return_value=ChangeStream([{"ns": {"coll": "app_authgateway"}}])
+        )
+        watcher = await self.run_watcher(watcher_app(watch))
+        self.assertEqual(watcher.stats()["reloads"], 1)
+        self.assertEqual(watch.await_count, 2)
+        # the failed change was not acknowledged, so the stream is not resumed past it
+        self.assertIsNone(watch.await_args.kwargs["resume_after"])
+
+    async def test_history_lost_reopens_change_stream(
+        self, mock_gateway, mock_env_props
+    ):
+        mock_gateway.reload_env_details = AsyncMock()
+        watch = AsyncMock(
+            side_effect=[
+                FailingChangeStream(
+                    [{"ns": {"coll": "app_authgateway"}}],
+                    OperationFailure("history lost", code=286),
+                ),
+                ChangeStream([]),
+            ]
+        )
+        watcher = await self.run_watcher(watcher_app(watch))
+        self.assertEqual(watcher.stats()["mode"], "change_stream")
+        self.assertEqual(watch.await_count, 2)
+        self.assertIsNone(watch.await_args.kwargs["resume_after"])
+
+    async def test_falls_back_to_polling(self, mock_gateway, mock_env_props):
+        mock_gateway.reload_env_details = AsyncMock()
+        mock_gateway.route_table = Mock(env_details=())
+        mock_gateway.apply_env_details = Mock(
+            side_effect=lambda env_details: setattr(
+                mock_gateway.route_table, "env_details", tuple(env_details)
+            )
+        )
+        mock_env_props.load_env_details = AsyncMock(return_value=ENV_DETAILS)
+        app = watcher_app(not_supported())
+        watcher = await self.run_watcher(app)
+        self.assertEqual(
+            watcher.stats(), {"mode": "polling", "reloads": 1, "resets": 0}
+        )
+        mock_gateway.apply_env_details.assert_called_once()
+
+    @patch.object(config_watcher, "caches")
+    async def test_reset_broadcasts_to_other_workers(
+        self, mock_caches, mock_gateway, mock_env_props
+    ):
+        mock_gateway.reload_env_details = AsyncMock()
+        app = watcher_app(not_supported())
+        watcher = config_watcher.ConfigWatcher(
+            app=app, poll_interval_seconds=0, poll_jitter_seconds=0, retry_seconds=0
+        )
+        await watcher.reset()
+        mock_caches.clear_all.assert_called_once()
+        self.assertEqual(watcher.resets, 1)
+        update_one = app.mongo_client["gateway"]["cache_resets"].update_one
+        reset_filter, reset_update = update_one.await_args.args
+        self.assertEqual(reset_filter, {"name": "cacheReset"})
+        self.assertEqual(len(reset_update["$set"]["resetId"]), 32)
+        # outside env_details, so env props never lists the broadcast as an app
+        app.mongo_client.__getitem__.assert_called_with("gateway")
+
+    @patch.object(config_watcher, "caches")
+    async def test_change_stream_resets_caches(
+        self, mock_caches, mock_gateway, mock_env_props
+    ):
+        mock_gateway.reload_env_details = AsyncMock()
+        changes = [
+            {
+                "ns": {"db": "gateway", "coll": "cache_resets"},
+                "updateDescription": {"updatedFields": {"resetId": "reset-2"}},
+            },
+            # already applied, eg: the same reset seen again after a resume
+            {
+                "ns": {"db": "gateway", "coll": "cache_resets"},
+                "fullDocument": {"name": "cacheReset", "resetId": "reset-2"},
+            },
+        ]
+        app = watcher_app(
+            AsyncMock(return_value=ChangeStream([])),
+            reset={"resetId": "reset-1"},
+            reset_watch=AsyncMock(return_value=ChangeStream(changes)),
+        )
+        watcher = await self.run_watcher(app)
+        self.assertEqual(
+            watcher.stats(), {"mode": "change_stream", "reloads": 0, "resets": 1}
+        )
+        mock_caches.clear_all.assert_called_once()
+        mock_env_props.invalidate_env_details_cache.assert_not_called()
+
+    @patch.object(config_watcher, "caches")
+    async def test_polling_resets_caches(
+        self, mock_caches, mock_gateway, mock_env_props
+    ):
+        mock_gateway.reload_env_details = AsyncMock()
+        mock_gateway.route_table = Mock(env_details=tuple(ENV_DETAILS))
+        mock_env_props.load_env_details = AsyncMock(return_value=ENV_DETAILS)
+        app = watcher_app(not_supported(), reset_watch=not_supported())
+        find_one = app.mongo_client["gateway"]["cache_resets"].find_one
+        # none when this worker started, then one reset broadcast by another worker
+        find_one.side_effect = itertools.chain(
+            [None], itertools.repeat({"resetId": "reset-1"})
+        )
+        watcher = await self.run_watcher(app)
+        self.assertEqual(
+            watcher.stats(), {"mode": "polling", "reloads": 0, "resets": 1}
+        )
+        mock_caches.clear_all.assert_called_once()
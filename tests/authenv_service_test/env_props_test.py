@@ -0,0 +1,101 @@
+import json
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+from fastapi import FastAPI
+from fastapi.security import HTTPBasicCredentials
+from starlette.requests import Request
+
+from src.authenv_service import env_props
+
+ENV_DETAILS = [{"name": "some-name", "stringValue": "some-value"}]
+
+
+class AsyncCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def __aiter__(self):
+        for document in self.documents:
+            yield document
+
+
+def env_props_request(mongo_collection, headers=None):
+    app = FastAPI()
+    app.mongo_client = Mock()
+    app.mongo_client.env_details = {"app_one": mongo_collection}
+    headers = [(k.encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request(scope={"type": "http", "app": app, "path": "/", "headers": headers})
+
+
+class EnvPropsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        env_props.invalidate_env_details_cache("app_one")
+        env_props.indexed_app_names.discard("app_one")
+        self.mongo_collection = Mock()
+        self.mongo_collection.find = Mock(
+            side_effect=lambda **_: AsyncCursor(ENV_DETAILS)
+        )
+        self.mongo_collection.update_one = AsyncMock()
+        self.mongo_collection.create_index = AsyncMock()
+        self.credentials = HTTPBasicCredentials(
+            username="some-auth-user", password="some-auth-password"
+        )
+
+    async def find(self, headers=None):
+        return await env_props.find(
+            env_props_request(self.mongo_collection, headers),
+            "app_one",
+            self.credentials,
+        )
+
+    async def test_find_cached_with_etag(self):
+        response = await self.find()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.body)[0]["stringValue"], "some-value")
+        etag = response.headers["etag"]
+
+        response = await self.find(headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], etag)
+        self.mongo_collection.find.assert_called_once()
+
+    async def test_save_reloads_etag_from_content(self):
+        etag = (await self.find()).headers["etag"]
+        env_detail = env_props.EnvDetails.model_validate({"name": "some-name"})
+        await env_props.save(
+            env_props_request(self.mongo_collection),
+            "app_one",
+            env_detail,
+            self.credentials,
+        )
+        self.mongo_collection.update_one.assert_awaited_once()
+        self.mongo_collection.find.assert_called_once()
+
+        # same content, same etag, from any worker or after a restart
+        response = await self.find(headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.mongo_collection.find.call_count, 2)
+
+        ENV_DETAILS.append({"name": "other-name", "stringValue": "other-value"})
+        try:
+            env_props.invalidate_env_details_cache("app_one")
+            response = await self.find(headers={"if-none-match": etag})
+        finally:
+            ENV_DETAILS.pop()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["etag"], etag)
+
+    async def test_save_indexes_new_app_once(self):
+        env_detail = env_props.EnvDetails.model_validate({"name": "some-name"})
+        for _ in range(2):
+            await env_props.save(
+                env_props_request(self.mongo_collection),
+                "app_one",
+                env_detail,
+                self.credentials,
+            )
+        self.mongo_collection.create_index.assert_awaited_once_with(
+            [("name", 1)], unique=True
+        )
+        self.assertEqual(self.mongo_collection.update_one.await_count, 2)
@@ -0,0 +1,26 @@
+import random
+import unittest
+
+from src.authenv_service.exclusion_matcher import ExclusionMatcher
+
+
+class ExclusionMatcherTest(unittest.TestCase):
+    def test_matches_path_substring(self):
+        matcher = ExclusionMatcher(["/tests/ping", "/app-one/public/", ""])
+        self.assertEqual(len(matcher), 2)
+        self.assertTrue(matcher.matches("/gateway/app-two/tests/ping"))
+        self.assertTrue(matcher.matches("/gateway/app-one/public/items"))
+        self.assertFalse(matcher.matches("/gateway/app-one/private/items"))
+        self.assertFalse(matcher.matches("/gateway/app-one/tests/pin"))
+        self.assertFalse(ExclusionMatcher().matches("/gateway/app-one/tests/ping"))
+
+    def test_matches_same_as_substring_scan(self):
+        rng = random.Random(86)
+        exclusions = [
+            "".join(rng.choices("ab/", k=rng.randint(1, 6))) for _ in range(50)
+        ]
+        matcher = ExclusionMatcher(exclusions)
+        for _ in range(2000):
+            path = "".join(rng.choices("ab/c", k=rng.randint(0, 20)))
+            expected = any(exclusion in path for exclusion in exclusions)
+            self.assertEqual(matcher.matches(path), expected, path)
@@ -0,0 +1,456 @@
+import asyncio
+import gzip
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+from src.authenv_service import gateway
+from src.authenv_service.env_props import EnvDetails
+from src.authenv_service.rate_limiter import InMemoryRateLimitStore, RateLimiter
+from src.authenv_service.tracing import InMemorySpanExporter
+from tests.authenv_service_test.proxy_test import proxy_engine
+
+UPSTREAM_BASE_URL = "http://upstream.test"
+
+
+def gateway_env_details(app_env="some-app-env"):
+    return [
+        EnvDetails.model_validate(
+            {
+                "name": f"baseUrls_{app_env}",
+                "mapValue": {
+                    "/app-one/": UPSTREAM_BASE_URL,
+                    "/app-err/": UPSTREAM_BASE_URL,
+                    "/app-cache/": UPSTREAM_BASE_URL,
+                    "/app-limited/": UPSTREAM_BASE_URL,
+                    "/app-single/": UPSTREAM_BASE_URL,
+                },
+            }
+        ),
+        EnvDetails.model_validate(
+            {"name": "responseCaches", "mapValue": {"app-cache": "60"}}
+        ),
+        EnvDetails.model_validate(
+            {
+                "name": "rateLimits",
+                "mapValue": {
+                    "app-limited": {"requestsPerSecond": 0.1, "burst": 2},
+                    "app-single": {"maxConcurrent": 1},
+                },
+            }
+        ),
+        EnvDetails.model_validate(
+            {
+                "name": "authConfigs",
+                "mapValue": {"app-one-usr": "u", "app-one-pwd": "p"},
+            }
+        ),
+        EnvDetails.model_validate({"name": "authExclusions", "listValue": ["/app-"]}),
+    ]
+
+
+upstream_calls = Counter()
+
+
+async def upstream_handler(request: httpx.Request):
+    upstream_calls[request.url.path] += 1
+    if request.url.path == "/app-cache/ref":
+        await asyncio.sleep(0.05)
+        return httpx.Response(
+            200,
+            content=b'{"ref": 1}',
+            headers={"content-type": "application/json", "cache-control": "max-age=30"},
+        )
+    if request.url.path == "/app-one/slow":
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, content=b"slow")
+    if request.url.path == "/app-one/slow-missing":
+        await asyncio.sleep(0.05)
+        return httpx.Response(404, content=b"missing")
+    if request.url.path == "/app-one/range":
+        await asyncio.sleep(0.05)
+        if request.headers.get("range") == "bytes=0-3":
+            return httpx.Response(
+                206, content=b"0123", headers={"content-range": "bytes 0-3/10"}
+            )
+        return httpx.Response(200, content=b"0123456789")
+    if request.url.path == "/app-one/gzip":
+        return httpx.Response(
+            200,
+            content=gzip.compress(b'{"big": "json"}'),
+            headers={
+                "content-type": "application/json",
+                "content-encoding": "gzip",
+                "x-accept-encoding": request.headers.get("accept-encoding", ""),
+            },
+        )
+    if request.url.path == "/app-cache/no-store":
+        return httpx.Response(200, content=b"{}", headers={"cache-control": "no-store"})
+    if request.url.path == "/app-cache/etag":
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(
+            200, content=b"v1", headers={"cache-control": "no-cache", "etag": '"v1"'}
+        )
+    if request.url.path == "/app-one/csv":
+        return httpx.Response(
+            200, content=b"a,b\n1,2\n", headers={"content-type": "text/csv"}
+        )
+    if request.url.path == "/app-err/error":
+        return httpx.Response(500)
+    if request.url.path == "/app-one/headers":
+        return httpx.Response(
+            200,
+            content=b"{}",
+            headers={
+                "content-type": "application/json",
+                "cache-control": "max-age=60",
+                "etag": '"v1"',
+                "server": "upstream",
+                "x-received-host": request.headers.get("host", ""),
+                "x-received-hop": request.headers.get("x-hop", ""),
+            },
+        )
+    if request.url.path == "/app-one/empty":
+        return httpx.Response(204)
+    if request.url.path == "/app-one/echo":
+        return httpx.Response(
+            200,
+            content=request.read(),
+            headers={
+                "x-authorization": request.headers.get("authorization", ""),
+                "content-type": request.headers.get("content-type", ""),
+                "x-content-length": request.headers.get("content-length", ""),
+                "x-received-traceparent": request.headers.get("traceparent", ""),
+            },
+        )
+    return httpx.Response(404)
+
+
+class UpstreamStream(httpx.AsyncByteStream):
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def __aiter__(self):
+        yield self.body
+
+
+class BrokenUpstreamStream(httpx.AsyncByteStream):
+    def __init__(self):
+        self.is_closed = False
+
+    async def __aiter__(self):
+        yield b'{"partial": '
+        raise httpx.ReadError("connection reset")
+
+    async def aclose(self):
+        self.is_closed = True
+
+
+class HeldUpstreamStream(httpx.AsyncByteStream):
+    def __init__(self, release: asyncio.Event):
+        self.release = release
+
+    async def __aiter__(self):
+        yield b"first,"
+        await self.release.wait()
+        yield b"last"
+
+
+broken_streams: list[BrokenUpstreamStream] = []
+held_stream_releases: list[asyncio.Event] = []
+
+
+async def streaming_upstream_handler(request: httpx.Request):
+    if request.url.path.endswith("/broken"):
+        # upstream resets the connection in the middle of the body
+        broken_streams.append(BrokenUpstreamStream())
+        return httpx.Response(
+            200, headers={"cache-control": "max-age=30"}, stream=broken_streams[-1]
+        )
+    if request.url.path.endswith("/held"):
+        # a slow download, the body is held until the test releases it
+        return httpx.Response(200, stream=HeldUpstreamStream(held_stream_releases[-1]))
+    # mock responses are read up front, a real upstream body arrives as a stream
+    response = await upstream_handler(request)
+    return httpx.Response(
+        response.status_code,
+        headers=response.headers,
+        stream=UpstreamStream(b"".join(response.stream)),
+    )
+
+
+def gateway_app():
+    app = FastAPI()
+    app.include_router(gateway.router)
+    app.proxy_engine = proxy_engine()
+    app.rate_limiter = RateLimiter(store=InMemoryRateLimitStore(max_keys=10))
+    app.proxy_engine.clients[UPSTREAM_BASE_URL] = httpx.AsyncClient(
+        transport=httpx.MockTransport(streaming_upstream_handler)
+    )
+    return app
+
+
+class GatewayTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        upstream_calls.clear()
+        broken_streams.clear()
+        held_stream_releases.clear()
+        gateway.response_cache.clear()
+        gateway.route_table = gateway.build_route_table(
+            env_details=gateway_env_details(), app_env="some-app-env"
+        )
+        self.app = gateway_app()
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.app), base_url="http://gateway"
+        )
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await self.app.proxy_engine.aclose()
+        gateway.route_table = gateway.EMPTY_ROUTE_TABLE
+        gateway.tracer.exporter = None
+
+    async def test_gateway_streams_non_json_response(self):
+        response = await self.client.get("/gateway/app-one/csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"a,b\n1,2\n")
+        self.assertTrue(response.headers["content-type"].startswith("text/csv"))
+
+    async def test_gateway_empty_response(self):
+        response = await self.client.delete("/gateway/app-one/empty")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.content, b"")
+
+    async def test_gateway_streams_raw_request_body(self):
+        body = b"0123456789" * 100_000
+        response = await self.client.post(
+            "/gateway/app-one/echo",
+            content=body,
+            headers={"content-type": "application/octet-stream"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, body)
+        self.assertEqual(response.headers["x-content-length"], str(len(body)))
+
+    async def test_gateway_route_not_found(self):
+        response = await self.client.get("/gateway/app-two/csv")
+        self.assertEqual(response.status_code, 503)
+
+    async def test_gateway_single_flight_collapses_gets(self):
+        responses = await asyncio.gather(
+            *(self.client.get("/gateway/app-one/slow") for _ in range(5)),
+            self.client.get("/gateway/app-one/slow?other=1"),
+        )
+        self.assertTrue(all(r.content == b"slow" for r in responses))
+        self.assertEqual(upstream_calls["/app-one/slow"], 2)
+
+    async def test_gateway_single_flight_skips_range_gets(self):
+        responses = await asyncio.gather(
+            self.client.get("/gateway/app-one/range", headers={"range": "bytes=0-3"}),
+            self.client.get("/gateway/app-one/range"),
+        )
+        self.assertEqual(
+            [(r.status_code, r.content) for r in responses],
+            [(206, b"0123"), (200, b"0123456789")],
+        )
+        self.assertEqual(upstream_calls["/app-one/range"], 2)
+
+    async def test_gateway_single_flight_shares_only_ok(self):
+        responses = await asyncio.gather(
+            *(self.client.get("/gateway/app-one/slow-missing") for _ in range(3))
+        )
+        self.assertTrue(all(r.status_code == 404 for r in responses))
+        self.assertEqual(upstream_calls["/app-one/slow-missing"], 3)
+
+    async def test_gateway_passes_compressed_body_through(self):
+        response = await self.client.get(
+            "/gateway/app-one/gzip", headers={"accept-encoding": "gzip"}
+        )
+        self.assertEqual(response.headers["x-accept-encoding"], "gzip")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.content, b'{"big": "json"}')
+
+    async def test_gateway_asks_identity_when_client_accepts_none(self):
+        del self.client.headers["accept-encoding"]
+        response = await self.client.get("/gateway/app-one/gzip")
+        self.assertEqual(response.headers["x-accept-encoding"], "identity")
+
+    async def test_gateway_header_policy(self):
+        response = await self.client.get(
+            "/gateway/app-one/headers",
+            headers={"connection": "x-hop", "x-hop": "1"},
+        )
+        self.assertEqual(response.headers["cache-control"], "max-age=60")
+        self.assertEqual(response.headers["etag"], '"v1"')
+        self.assertNotIn("server", response.headers)
+        self.assertEqual(response.headers["x-received-host"], "upstream.test")
+        self.assertEqual(response.headers["x-received-hop"], "")
+
+    async def test_gateway_rate_limit(self):
+        for _ in range(2):
+            response = await self.client.get("/gateway/app-limited/csv")
+            self.assertEqual(response.status_code, 404)
+        response = await self.client.get("/gateway/app-limited/csv")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "10")
+        self.assertEqual(upstream_calls["/app-limited/csv"], 2)
+
+    async def test_gateway_concurrency_limit_holds_streamed_body(self):
+        held_stream_releases.append(asyncio.Event())
+        held = asyncio.create_task(self.client.get("/gateway/app-single/held"))
+        await asyncio.sleep(0.05)
+        # the first body is still streaming, so its slot is still taken
+        response = await self.client.get("/gateway/app-single/csv")
+        self.assertEqual(response.status_code, 429)
+        held_stream_releases[-1].set()
+        self.assertEqual((await held).content, b"first,last")
+        response = await self.client.get("/gateway/app-single/csv")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.app.rate_limiter.stats()["in_flight"], 0)
+
+    async def test_gateway_metrics(self):
+        metrics = gateway.metrics
+
+        def observed(histogram, *label_values):
+            return histogram.observations.get(label_values, [None, 0.0, 0])[2]
+
+        upstream_count = observed(metrics.GATEWAY_UPSTREAM_SECONDS, "app-one")
+        request_count = observed(metrics.GATEWAY_REQUEST_SECONDS, "app-one", 200)
+        await self.client.get("/gateway/app-one/csv")
+        self.assertEqual(
+            observed(metrics.GATEWAY_UPSTREAM_SECONDS, "app-one"), upstream_count + 1
+        )
+        self.assertEqual(
+            observed(metrics.GATEWAY_REQUEST_SECONDS, "app-one", 200),
+            request_count + 1,
+        )
+        self.assertEqual(metrics.GATEWAY_REQUESTS_IN_FLIGHT.values[("app-one",)], 0)
+        self.assertIn(
+            'authenv_gateway_overhead_seconds_count{appname="app-one"}',
+            metrics.render(),
+        )
+
+    async def test_gateway_propagates_trace_context(self):
+        exporter = gateway.tracer.exporter = InMemorySpanExporter(max_spans=10)
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        response = await self.client.post(
+            "/gateway/app-one/echo",
+            content=b"{}",
+            headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"},
+        )
+        spans = {span.name: span for span in exporter.spans(trace_id)}
+        self.assertEqual(
+            set(spans), {"gateway", "route_lookup", "auth", "upstream", "response"}
+        )
+        self.assertEqual(spans["gateway"].parent_span_id, "00f067aa0ba902b7")
+        self.assertEqual(spans["gateway"].attributes["status"], 200)
+        for name in ("route_lookup", "auth", "upstream", "response"):
+            self.assertEqual(spans[name].parent_span_id, spans["gateway"].span_id)
+        # upstream sees the upstream span as its parent
+        self.assertEqual(
+            response.headers["x-received-traceparent"],
+            f"00-{trace_id}-{spans['upstream'].span_id}-01",
+        )
+
+    def test_build_route_table(self):
+        table = gateway.route_table
+        self.assertTrue(table.is_loaded)
+        self.assertEqual(table.route("app-one").base_urls, (UPSTREAM_BASE_URL,))
+        self.assertEqual(table.route("app-one").auth, ("u", "p"))
+        self.assertIsNone(table.route("app-one").cache_ttl_seconds)
+        self.assertEqual(table.route("app-cache").cache_ttl_seconds, 60.0)
+        self.assertIsNone(table.route("app-two"))
+        self.assertEqual(table.auth_exclusions.exclusions, ("/app-",))
+        with self.assertRaises(TypeError):
+            table.routes["app-two"] = table.route("app-one")
+
+    async def test_gateway_sends_route_auth(self):
+        response = await self.client.post("/gateway/app-one/echo", content=b"{}")
+        self.assertTrue(response.headers["x-authorization"].startswith("Basic "))
+
+    async def test_gateway_circuit_breaker_fails_fast(self):
+        for _ in range(10):
+            response = await self.client.get("/gateway/app-err/error")
+            self.assertEqual(response.status_code, 500)
+        response = await self.client.get("/gateway/app-err/error")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("retry-after", response.headers)
+
+    async def test_gateway_response_cache_hit(self):
+        first = await self.client.get("/gateway/app-cache/ref?b=2&a=1")
+        second = await self.client.get("/gateway/app-cache/ref?a=1&b=2")
+        self.assertEqual(first.headers["x-cache"], "MISS")
+        self.assertEqual(second.headers["x-cache"], "HIT")
+        self.assertEqual(second.content, b'{"ref": 1}')
+        self.assertEqual(upstream_calls["/app-cache/ref"], 1)
+
+    async def test_gateway_response_cache_per_user(self):
+        await self.client.get("/gateway/app-cache/ref")
+        response = await self.client.get(
+            "/gateway/app-cache/ref", headers={"Authorization": "Bearer other"}
+        )
+        self.assertEqual(response.headers["x-cache"], "MISS")
+        self.assertEqual(upstream_calls["/app-cache/ref"], 2)
+
+    async def test_gateway_response_cache_collapses_misses(self):
+        responses = await asyncio.gather(
+            *(self.client.get("/gateway/app-cache/ref") for _ in range(5))
+        )
+        self.assertTrue(all(r.content == b'{"ref": 1}' for r in responses))
+        self.assertEqual(upstream_calls["/app-cache/ref"], 1)
+
+    async def test_gateway_response_cache_no_store(self):
+        await self.client.get("/gateway/app-cache/no-store")
+        response = await self.client.get("/gateway/app-cache/no-store")
+        self.assertNotIn("x-cache", response.headers)
+        self.assertEqual(upstream_calls["/app-cache/no-store"], 2)
+
+    async def test_gateway_response_cache_revalidates_etag(self):
+        await self.client.get("/gateway/app-cache/etag")
+        response = await self.client.get("/gateway/app-cache/etag")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["x-cache"], "REVALIDATED")
+        self.assertEqual(response.content, b"v1")
+        self.assertEqual(upstream_calls["/app-cache/etag"], 2)
+
+    def assert_upstream_released(self, appname: str):
+        target = gateway.choose_target(
+            appname=appname,
+            base_urls=(UPSTREAM_BASE_URL,),
+            strategy=gateway.route_table.route(appname).strategy,
+        )
+        self.assertEqual(target.outstanding, 0)
+        self.assertTrue(all(stream.is_closed for stream in broken_streams))
+
+    async def test_gateway_response_cache_upstream_read_error(self):
+        response = await self.client.get("/gateway/app-cache/broken")
+        self.assertEqual(response.status_code, 502)
+        self.assert_upstream_released("app-cache")
+
+    async def test_gateway_stream_upstream_read_error(self):
+        # raised once the response started, from the task group that streams it
+        with self.assertRaises(ExceptionGroup) as raised:
+            await self.client.get("/gateway/app-one/broken")
+        self.assertIsNotNone(raised.exception.subgroup(httpx.ReadError))
+        self.assertEqual(len(broken_streams), 1)
+        self.assert_upstream_released("app-one")
+
+    async def test_gateway_response_cache_big_body_upstream_read_error(self):
+        with patch.object(gateway.response_cache, "max_body_bytes", 4):
+            # raised once the response started, from the task group that streams it
+            with self.assertRaises(ExceptionGroup) as raised:
+                await self.client.get("/gateway/app-cache/broken")
+            self.assertIsNotNone(raised.exception.subgroup(httpx.ReadError))
+        self.assertEqual(len(broken_streams), 1)
+        self.assert_upstream_released("app-cache")
+
+    async def test_gateway_response_cache_skips_big_body(self):
+        with patch.object(gateway.response_cache, "max_body_bytes", 4):
+            await self.client.get("/gateway/app-cache/ref")
+            response = await self.client.get("/gateway/app-cache/ref")
+        self.assertEqual(response.content, b'{"ref": 1}')
+        self.assertEqual(upstream_calls["/app-cache/ref"], 2)
@@ -0,0 +1,48 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+from src.authenv_service import hashing
+from tests.authenv_service_test.utils_test import app, dummy_url_request
+
+
+class HashingTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        app.hashing_executor = hashing.HashingExecutor(max_workers=1, max_queue_depth=1)
+
+    def tearDown(self):
+        app.hashing_executor.shutdown()
+
+    @patch.object(hashing.constants, "BCRYPT_ROUNDS", 4)
+    async def test_hash_and_check_password(self):
+        hashed_password = await hashing.hash_password(
+            dummy_url_request, "some-password"
+        )
+        self.assertTrue(hashed_password.startswith("$2b$04$"))
+        self.assertTrue(
+            await hashing.check_password(
+                dummy_url_request, "some-password", hashed_password
+            )
+        )
+        self.assertFalse(
+            await hashing.check_password(
+                dummy_url_request, "other-password", hashed_password
+            )
+        )
+        stats = app.hashing_executor.stats()
+        self.assertEqual(stats["completed"], 3)
+        self.assertEqual(stats["in_flight"], 0)
+
+    async def test_rejects_when_saturated(self):
+        release = threading.Event()
+        futures = [app.hashing_executor.submit(release.wait) for _ in range(2)]
+        with self.assertRaises(HTTPException) as ex:
+            await hashing.hash_password(dummy_url_request, "some-password")
+        self.assertEqual(ex.exception.status_code, 503)
+        self.assertIn("Retry-After", ex.exception.headers)
+        release.set()
+        for future in futures:
+            future.result()
+        self.assertEqual(app.hashing_executor.stats()["rejected"], 1)
@@ -0,0 +1,75 @@
+import unittest
+
+import httpx
+from starlette.datastructures import Headers
+
+from src.authenv_service.header_policy import DEFAULT_HEADER_POLICY, build_header_policy
+
+
+class HeaderPolicyTest(unittest.TestCase):
+    def test_request_headers(self):
+        headers = Headers(
+            raw=[
+                (b"accept", b"application/json"),
+                (b"authorization", b"Bearer token"),
+                (b"host", b"gateway"),
+                (b"connection", b"keep-alive, x-hop"),
+                (b"x-hop", b"1"),
+                (b"x-trace", b"2"),
+            ]
+        )
+        self.assertEqual(
+            DEFAULT_HEADER_POLICY.request_headers(headers.items()),
+            {"accept": "application/json", "x-trace": "2"},
+        )
+
+    def test_response_headers(self):
+        headers = httpx.Headers(
+            {
+                "Content-Type": "application/json",
+                "Cache-Control": "max-age=60",
+                "ETag": '"v1"',
+                "Content-Length": "10",
+                "Set-Cookie": "a=b",
+                "Transfer-Encoding": "chunked",
+                "X-Custom": "1",
+                "Connection": "x-hop",
+                "X-Hop": "1",
+            }
+        )
+        self.assertEqual(
+            DEFAULT_HEADER_POLICY.response_headers(headers.multi_items()),
+            {
+                "content-type": "application/json",
+                "cache-control": "max-age=60",
+                "etag": '"v1"',
+                "content-length": "10",
+                "x-custom": "1",
+            },
+        )
+
+    def test_response_headers_for_redirects_backoff_and_ranges(self):
+        headers = {
+            "location": "https://upstream.test/next",
+            "retry-after": "30",
+            "www-authenticate": 'Bearer realm="app"',
+            "content-range": "bytes 0-9/100",
+            "accept-ranges": "bytes",
+        }
+        self.assertEqual(
+            DEFAULT_HEADER_POLICY.response_headers(headers.items()), headers
+        )
+
+    def test_route_header_policy(self):
+        self.assertIs(build_header_policy(), DEFAULT_HEADER_POLICY)
+        header_policy = build_header_policy(
+            restricted_headers=["X-Internal"], response_headers=["Set-Cookie"]
+        )
+        self.assertEqual(
+            header_policy.request_headers([("x-internal", "1"), ("accept", "*/*")]),
+            {"accept": "*/*"},
+        )
+        self.assertEqual(
+            header_policy.response_headers([("set-cookie", "a=b"), ("server", "s")]),
+            {"set-cookie": "a=b"},
+        )
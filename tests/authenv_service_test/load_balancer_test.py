@@ -0,0 +1,128 @@
+import unittest
+from types import SimpleNamespace
+
+import httpx
+
+from src.authenv_service import load_balancer
+from src.authenv_service.load_balancer import (
+    HealthChecker,
+    LoadBalancerStrategy,
+    choose_target,
+    get_target,
+)
+from src.authenv_service.route_table import Route
+from tests.authenv_service_test.proxy_test import proxy_engine
+
+BASE_URLS = ("http://one.test", "http://two.test")
+
+
+class LoadBalancerTest(unittest.TestCase):
+    def setUp(self):
+        load_balancer.targets.clear()
+        load_balancer.round_robin_counters.clear()
+
+    def test_single_target(self):
+        target = choose_target("app-one", BASE_URLS[:1], LoadBalancerStrategy.EWMA)
+        self.assertEqual(target.base_url, BASE_URLS[0])
+        self.assertIs(target, get_target("app-one", BASE_URLS[0]))
+
+    def test_round_robin(self):
+        chosen = [
+            choose_target("app-one", BASE_URLS, LoadBalancerStrategy.ROUND_ROBIN)
+            for _ in range(4)
+        ]
+        self.assertEqual([t.base_url for t in chosen], list(BASE_URLS) * 2)
+
+    def test_least_outstanding(self):
+        get_target("app-one", BASE_URLS[0]).acquire()
+        target = choose_target(
+            "app-one", BASE_URLS, LoadBalancerStrategy.LEAST_OUTSTANDING
+        )
+        self.assertEqual(target.base_url, BASE_URLS[1])
+
+    def test_ewma(self):
+        get_target("app-one", BASE_URLS[0]).observe_latency(0.5)
+        get_target("app-one", BASE_URLS[1]).observe_latency(0.1)
+        target = choose_target("app-one", BASE_URLS, LoadBalancerStrategy.EWMA)
+        self.assertEqual(target.base_url, BASE_URLS[1])
+
+    def test_skips_unhealthy_and_fails_open(self):
+        get_target("app-one", BASE_URLS[0]).healthy = False
+        for _ in range(3):
+            target = choose_target(
+                "app-one", BASE_URLS, LoadBalancerStrategy.ROUND_ROBIN
+            )
+            self.assertEqual(target.base_url, BASE_URLS[1])
+
+        get_target("app-one", BASE_URLS[1]).healthy = False
+        chosen = {
+            choose_target("app-one", BASE_URLS, LoadBalancerStrategy.ROUND_ROBIN)
+            for _ in range(2)
+        }
+        self.assertEqual(len(chosen), 2)
+
+
+class HealthCheckerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        load_balancer.targets.clear()
+
+    async def test_marks_unhealthy_then_healthy(self):
+        statuses = {BASE_URLS[0]: 200, BASE_URLS[1]: 503}
+
+        def handler(request: httpx.Request):
+            self.assertEqual(request.url.path, "/app-one/tests/ping")
+            return httpx.Response(statuses[f"http://{request.url.host}"])
+
+        engine = proxy_engine()
+        for base_url in BASE_URLS:
+            engine.clients[base_url] = httpx.AsyncClient(
+                transport=httpx.MockTransport(handler)
+            )
+        route = Route(
+            appname="app-one",
+            base_urls=BASE_URLS,
+            auth=None,
+            strategy=LoadBalancerStrategy.ROUND_ROBIN,
+        )
+        health_checker = HealthChecker(
+            app=SimpleNamespace(proxy_engine=engine),
+            routes_provider=lambda: [route],
+            interval_seconds=60,
+            timeout_seconds=1,
+        )
+
+        # unhealthy threshold defaults to 2 consecutive failures
+        await health_checker.check_all()
+        self.assertTrue(get_target("app-one", BASE_URLS[1]).healthy)
+        await health_checker.check_all()
+        self.assertTrue(get_target("app-one", BASE_URLS[0]).healthy)
+        self.assertFalse(get_target("app-one", BASE_URLS[1]).healthy)
+
+        statuses[BASE_URLS[1]] = 200
+        await health_checker.check_all()
+        self.assertTrue(get_target("app-one", BASE_URLS[1]).healthy)
+        await engine.aclose()
+
+    async def test_check_error_marks_unhealthy(self):
+        def handler(request: httpx.Request):
+            if request.url.host == "two.test":
+                raise ValueError("not an upstream")
+            return httpx.Response(200)
+
+        engine = proxy_engine()
+        for base_url in BASE_URLS:
+            engine.clients[base_url] = httpx.AsyncClient(
+                transport=httpx.MockTransport(handler)
+            )
+        route = Route(appname="app-one", base_urls=BASE_URLS)
+        health_checker = HealthChecker(
+            app=SimpleNamespace(proxy_engine=engine),
+            routes_provider=lambda: [route],
+            interval_seconds=60,
+            timeout_seconds=1,
+        )
+        await health_checker.check_all()
+        await health_checker.check_all()
+        self.assertTrue(get_target("app-one", BASE_URLS[0]).healthy)
+        self.assertFalse(get_target("app-one", BASE_URLS[1]).healthy)
+        await engine.aclose()
@@ -0,0 +1,65 @@
+import json
+import logging
+import queue
+import unittest
+
+from src.authenv_service.logger import (
+    JsonFormatter,
+    Logger,
+    LogQueueHandler,
+    build_formatter,
+    converter,
+    log_pipeline,
+)
+
+
+def log_record(msg="Status: [ %s ]", args=(200,), extra="some-extra"):
+    record = logging.LogRecord(
+        name="some-logger",
+        level=logging.INFO,
+        pathname=__file__,
+        lineno=1,
+        msg=msg,
+        args=args,
+        exc_info=None,
+    )
+    record.extra = extra
+    return record
+
+
+class LoggerTest(unittest.TestCase):
+    def test_handler_added_once(self):
+        Logger(logging.getLogger("logger-test"))
+        Logger(logging.getLogger("logger-test"))
+        self.assertEqual(
+            logging.getLogger("logger-test").handlers, [log_pipeline.queue_handler]
+        )
+
+    def test_queue_handler_leaves_record_unformatted(self):
+        queue_handler = LogQueueHandler(queue.Queue(maxsize=1))
+        record = log_record()
+        queue_handler.handle(record)
+        queue_handler.handle(log_record())
+        queued = queue_handler.queue.get_nowait()
+        self.assertIs(queued, record)
+        self.assertEqual(queued.args, (200,))
+        self.assertEqual(queue_handler.dropped, 1)
+
+    def test_text_format(self):
+        message = build_formatter("text").format(log_record())
+        self.assertIn("[authenv-service][some-logger][INFO]", message)
+        self.assertTrue(message.endswith("Status: [ 200 ] | some-extra"))
+
+    def test_json_format(self):
+        formatter = build_formatter("json")
+        self.assertIsInstance(formatter, JsonFormatter)
+        log_line = json.loads(formatter.format(log_record()))
+        self.assertEqual(log_line["service"], "authenv-service")
+        self.assertEqual(log_line["level"], "INFO")
+        self.assertEqual(log_line["message"], "Status: [ 200 ]")
+        self.assertEqual(log_line["extra"], "some-extra")
+
+    def test_converter(self):
+        # 2024-01-01T12:00:00Z is 05:00 in Denver
+        self.assertEqual(converter(1704110400.5).tm_hour, 5)
+        self.assertIs(converter(1704110400.5), converter(1704110400.9))
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.authenv_service.login_throttle import (
+    LoginThrottle,
+    SlidingWindowCounter,
+    ThrottleLimit,
+)
+
+
+def login_request(host="10.0.0.1", headers=None):
+    return Request(
+        scope={
+            "type": "http",
+            "path": "/authenv-service/auth-users/login",
+            "headers": [(k.encode(), v.encode()) for k, v in (headers or {}).items()],
+            "query_string": b"",
+            "client": (host, 1234),
+        }
+    )
+
+
+def login_throttle():
+    return LoginThrottle(
+        counter=SlidingWindowCounter(window_seconds=100, max_keys=10),
+        user_limit=ThrottleLimit(delay_after=2, lockout_after=4),
+        ip_limit=ThrottleLimit(delay_after=10, lockout_after=20),
+        base_delay_seconds=1,
+        max_delay_seconds=60,
+        lockout_seconds=300,
+    )
+
+
+class SlidingWindowCounterTest(unittest.TestCase):
+    def test_count_slides_over_windows(self):
+        counter = SlidingWindowCounter(window_seconds=100, max_keys=10)
+        for now in (0, 10, 20, 30):
+            counter.add("key", now)
+        self.assertEqual(counter.count("key", 50), (4, 30))
+        # next window, previous failures weigh by how much of them is still in range
+        self.assertEqual(counter.count("key", 125), (3.0, 30))
+        self.assertEqual(counter.count("key", 250), (0.0, 30))
+        self.assertEqual(counter.count("key", 450), (0.0, 0.0))
+        self.assertEqual(len(counter), 0)
+
+    def test_max_keys(self):
+        counter = SlidingWindowCounter(window_seconds=100, max_keys=1)
+        counter.add("one", 0)
+        counter.add("two", 0)
+        self.assertEqual(counter.count("one", 0), (0.0, 0.0))
+        self.assertEqual(counter.count("two", 0), (1, 0))
+
+
+@patch("src.authenv_service.login_throttle.time.monotonic")
+class LoginThrottleTest(unittest.TestCase):
+    def assert_throttled(self, throttle, retry_after, host="10.0.0.1"):
+        with self.assertRaises(HTTPException) as ex:
+            throttle.reserve(login_request(host), "some-user")
+        self.assertEqual(ex.exception.status_code, 429)
+        self.assertEqual(ex.exception.headers["Retry-After"], retry_after)
+
+    def test_progressive_delay_then_lockout(self, mock_monotonic):
+        throttle = login_throttle()
+        mock_monotonic.return_value = 10.0
+        for _ in range(2):
+            throttle.reserve(login_request(), "some-user")
+        self.assert_throttled(throttle, "1")
+
+        mock_monotonic.return_value = 11.0
+        throttle.reserve(login_request(), "some-user")
+        self.assert_throttled(throttle, "2")
+
+        mock_monotonic.return_value = 13.0
+        throttle.reserve(login_request(), "some-user")
+        self.assert_throttled(throttle, "300", host="10.0.0.2")
+        self.assertEqual(throttle.stats()["locked"], 1)
+
+    def test_success_resets_username(self, mock_monotonic):
+        throttle = login_throttle()
+        mock_monotonic.return_value = 10.0
+        for _ in range(3):
+            throttle.counter.add("ip:10.0.0.1", 10.0)
+        for _ in range(2):
+            throttle.reserve(login_request(), "some-user")
+        throttle.release(login_request(), "some-user")
+        throttle.record_success(login_request(), "some-user")
+        throttle.reserve(login_request(), "some-user")
+        # failures before and the one reserved now, successes do not count
+        self.assertEqual(throttle.counter.count("ip:10.0.0.1", 10.0), (4, 10.0))
+        self.assertEqual(throttle.counter.count("user:some-user", 10.0), (1, 10.0))
+
+    def test_keys_on_forwarded_client_ip(self, mock_monotonic):
+        throttle = login_throttle()
+        mock_monotonic.return_value = 10.0
+        for username, headers in (
+            ("user-one", {"x-appengine-user-ip": "203.0.113.7"}),
+            ("user-two", {"x-forwarded-for": "203.0.113.7, 10.0.0.1"}),
+        ):
+            throttle.reserve(login_request(headers=headers), username)
+        # the front end address is not a client, it is never throttled as one
+        self.assertEqual(throttle.counter.count("ip:203.0.113.7", 10.0), (2, 10.0))
+        self.assertEqual(throttle.counter.count("ip:10.0.0.1", 10.0), (0.0, 0.0))
@@ -1,16 +1,62 @@
+import asyncio
 import unittest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, Mock, patch
 
-from src.authenv_service.main import ping, reset
-from tests.authenv_service_test.utils_test import dummy_request
+from fastapi import HTTPException
+from fastapi.security import HTTPBasicCredentials
+
+from src.authenv_service import constants, utils
+from src.authenv_service.main import log_level, ping, ready, reset
+from tests.authenv_service_test.utils_test import dummy_request, dummy_url_request
 
 
 class MainTest(unittest.TestCase):
     def test_ping(self):
         self.assertEqual(ping(), {"test": "successful"})
 
-    @patch("src.authenv_service.main.gateway_api")
-    def test_reset(self, mock_gateway_api):
-        mock_gateway_api.set_env_details.return_value = "return value"
-        self.assertEqual(reset(request=dummy_request), {"reset": "successful"})
-        assert mock_gateway_api.set_env_details.called
+    @patch("src.authenv_service.main.readiness")
+    def test_ready(self, mock_readiness):
+        mock_readiness.stats.return_value = {"ready": False}
+        mock_readiness.is_ready = False
+        self.assertEqual(ready().status_code, 503)
+        mock_readiness.is_ready = True
+        self.assertEqual(ready().status_code, 200)
+
+    def test_reset(self):
+        config_watcher = Mock(reset=AsyncMock())
+        credentials = HTTPBasicCredentials(
+            username=constants.BASIC_AUTH_USR, password=constants.BASIC_AUTH_PWD
+        )
+        with patch.object(
+            dummy_request.app, "config_watcher", config_watcher, create=True
+        ):
+            self.assertEqual(
+                asyncio.run(
+                    reset(request=dummy_request, http_basic_credentials=credentials)
+                ),
+                {"reset": "successful"},
+            )
+        config_watcher.reset.assert_awaited_once()
+
+    def test_reset_needs_basic_auth(self):
+        config_watcher = Mock(reset=AsyncMock())
+        credentials = HTTPBasicCredentials(username="some-user", password="wrong")
+        with patch.object(
+            dummy_request.app, "config_watcher", config_watcher, create=True
+        ):
+            with self.assertRaises(HTTPException) as ex:
+                asyncio.run(
+                    reset(request=dummy_url_request, http_basic_credentials=credentials)
+                )
+        self.assertEqual(ex.exception.status_code, 401)
+        config_watcher.reset.assert_not_awaited()
+
+    def test_log_level_needs_basic_auth(self):
+        credentials = HTTPBasicCredentials(username="some-user", password="wrong")
+        with self.assertRaises(HTTPException) as ex:
+            log_level(
+                request=dummy_url_request,
+                level=utils.LogLevelOptions.DEBUG,
+                http_basic_credentials=credentials,
+            )
+        self.assertEqual(ex.exception.status_code, 401)
@@ -0,0 +1,78 @@
+import unittest
+from types import SimpleNamespace
+
+from src.authenv_service import metrics
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = dict(metrics.registry)
+        metrics.registry.clear()
+
+    def tearDown(self):
+        metrics.registry.clear()
+        metrics.registry.update(self.registry)
+
+    def test_counter_and_gauge(self):
+        counter = metrics.Counter("test_total", "Some counter", ("route",))
+        gauge = metrics.Gauge("test_in_flight", "Some gauge")
+        counter.inc("/one")
+        counter.inc("/one", amount=2)
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEqual(
+            metrics.render(),
+            "# HELP test_total Some counter\n"
+            "# TYPE test_total counter\n"
+            'test_total{route="/one"} 3\n'
+            "# HELP test_in_flight Some gauge\n"
+            "# TYPE test_in_flight gauge\n"
+            "test_in_flight 1\n",
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram(
+            "test_seconds", "Some histogram", ("appname",), buckets=(0.1, 1.0)
+        )
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value, "app-one")
+        lines = metrics.render().splitlines()
+        self.assertEqual(
+            lines[2:],
+            [
+                'test_seconds_bucket{appname="app-one",le="0.1"} 2',
+                'test_seconds_bucket{appname="app-one",le="1"} 3',
+                'test_seconds_bucket{appname="app-one",le="+Inf"} 4',
+                'test_seconds_sum{appname="app-one"} 5.65',
+                'test_seconds_count{appname="app-one"} 4',
+            ],
+        )
+
+    def test_label_values_escaped(self):
+        counter = metrics.Counter("test_total", "Some counter", ("route",))
+        counter.inc('a"b\\c\nd')
+        self.assertIn('test_total{route="a\\"b\\\\c\\nd"} 1', metrics.render())
+
+    def test_cache_hit_ratio(self):
+        metrics.registry.update(self.registry)
+        # the caches module metrics reads from, not a second copy of it
+        cache = metrics.caches.LRUTTLCache(
+            name="metrics-test", max_size=2, ttl_seconds=60
+        )
+        cache.set("one", 1)
+        cache.get("one")
+        cache.get("two")
+        rendered = metrics.render()
+        self.assertIn('authenv_cache_hits_total{cache="metrics-test"} 1', rendered)
+        self.assertIn('authenv_cache_misses_total{cache="metrics-test"} 1', rendered)
+        self.assertIn('authenv_cache_hit_ratio{cache="metrics-test"} 0.5', rendered)
+
+    def test_mongo_command_listener(self):
+        metrics.registry.update(self.registry)
+        listener = metrics.MongoCommandListener()
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=2000))
+        listener.failed(SimpleNamespace(command_name="find", duration_micros=1000))
+        observations = metrics.MONGO_COMMAND_SECONDS.observations
+        self.assertEqual(observations[("find", "success")][1:], [0.002, 1])
+        self.assertEqual(observations[("find", "failure")][1:], [0.001, 1])
@@ -0,0 +1,58 @@
+import unittest
+
+import httpx
+
+from src.authenv_service.proxy import ProxyEngine
+
+
+def proxy_engine():
+    return ProxyEngine(
+        max_connections=10,
+        max_keepalive_connections=5,
+        keepalive_expiry=5.0,
+        connect_timeout=1.0,
+        read_timeout=2.0,
+    )
+
+
+class ProxyEngineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_client_reused_per_base_url(self):
+        engine = proxy_engine()
+        client_one = engine.client("http://one.test")
+        self.assertIs(client_one, engine.client("http://one.test"))
+        self.assertIsNot(client_one, engine.client("http://two.test"))
+        self.assertEqual(client_one.timeout.connect, 1.0)
+        self.assertEqual(client_one.timeout.read, 2.0)
+        self.assertTrue(client_one.follow_redirects)
+        await engine.aclose()
+        self.assertTrue(client_one.is_closed)
+        self.assertEqual(engine.clients, {})
+
+    async def test_streamed_body_does_not_follow_redirects(self):
+        def upstream_handler(request: httpx.Request):
+            if request.url.path == "/moved":
+                return httpx.Response(307, headers={"location": "/echo"})
+            return httpx.Response(200, content=request.read())
+
+        async def body():
+            yield b"some-body"
+
+        engine = proxy_engine()
+        engine.clients["http://one.test"] = httpx.AsyncClient(
+            transport=httpx.MockTransport(upstream_handler), follow_redirects=True
+        )
+        response = await engine.request(
+            "GET", "http://one.test", "http://one.test/moved"
+        )
+        self.assertEqual(response.status_code, 200)
+        # the body was already sent once, the caller gets the redirect itself
+        response = await engine.request(
+            "POST", "http://one.test", "http://one.test/moved", content=body()
+        )
+        self.assertEqual(response.status_code, 307)
+        self.assertEqual(response.headers["location"], "/echo")
+        response = await engine.request(
+            "POST", "http://one.test", "http://one.test/moved", content=b"some-body"
+        )
+        self.assertEqual(response.content, b"some-body")
+        await engine.aclose()
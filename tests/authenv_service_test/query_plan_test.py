@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from pymongo import AsyncMongoClient
+
+from src.authenv_service import auth_users, env_props, utils
+
+# needs a local mongod, eg: MONGODB_TEST_URI="mongodb://localhost:27017" pytest
+MONGODB_TEST_URI = os.getenv("MONGODB_TEST_URI")
+
+
+@unittest.skipUnless(MONGODB_TEST_URI, "MONGODB_TEST_URI is not set")
+class QueryPlanTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.mongo_client = AsyncMongoClient(MONGODB_TEST_URI)
+        await self.mongo_client.env_details.app_queryplantest.update_one(
+            {"name": "some-name"}, {"$set": {"stringValue": "value"}}, upsert=True
+        )
+        await auth_users.create_indexes(self.mongo_client)
+        await env_props.create_indexes(self.mongo_client)
+
+    async def asyncTearDown(self):
+        await self.mongo_client.env_details.app_queryplantest.drop()
+        await self.mongo_client.close()
+
+    async def test_find_user_by_username_uses_index(self):
+        for projection in (
+            auth_users.USER_DETAILS_OUTPUT_PROJECTION,
+            auth_users.USER_DETAILS_PASSWORD_PROJECTION,
+        ):
+            cursor = self.mongo_client.user_details.userdetails.find(
+                {"username": "some-username"}, projection=projection
+            ).limit(1)
+            self.assertFalse(await utils.is_collection_scan(cursor))
+
+    async def test_find_env_detail_by_name_uses_index(self):
+        cursor = self.mongo_client.env_details.app_queryplantest.find(
+            {"name": "some-name"}, projection=env_props.ENV_DETAILS_PROJECTION
+        )
+        self.assertFalse(await utils.is_collection_scan(cursor))
+
+
+class CollectionScanTest(unittest.IsolatedAsyncioTestCase):
+    async def test_is_collection_scan(self):
+        class Cursor:
+            def __init__(self, winning_plan):
+                self.winning_plan = winning_plan
+
+            async def explain(self):
+                return {"queryPlanner": {"winningPlan": self.winning_plan}}
+
+        index_scan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+        collection_scan = {
+            "queryPlan": {
+                "stage": "PROJECTION_SIMPLE",
+                "inputStage": {"stage": "COLLSCAN"},
+            }
+        }
+        self.assertFalse(await utils.is_collection_scan(Cursor(index_scan)))
+        self.assertTrue(await utils.is_collection_scan(Cursor(collection_scan)))
@@ -0,0 +1,159 @@
+import os
+import unittest
+
+from fastapi import HTTPException
+from pymongo import AsyncMongoClient
+from starlette.requests import Request
+
+from src.authenv_service.rate_limiter import (
+    ConcurrencyLimiter,
+    InMemoryRateLimitStore,
+    MongoRateLimitStore,
+    RateLimit,
+    RateLimiter,
+    RateLimitStore,
+    build_rate_limit,
+    take_token,
+)
+
+# needs a local mongod, eg: MONGODB_TEST_URI="mongodb://localhost:27017" pytest
+MONGODB_TEST_URI = os.getenv("MONGODB_TEST_URI")
+
+
+def client_request(username=None):
+    request = Request(
+        scope={
+            "type": "http",
+            "path": "/gateway/app-one/items",
+            "headers": [],
+            "query_string": b"",
+            "client": ("10.0.0.1", 1234),
+        }
+    )
+    request.state.username = username
+    return request
+
+
+class RateLimitTest(unittest.TestCase):
+    def test_take_token(self):
+        self.assertEqual(take_token(2.0, 0.0, 0.0, rate=1.0, burst=2.0), (1.0, 0.0))
+        self.assertEqual(take_token(0.0, 0.0, 0.5, rate=1.0, burst=2.0), (0.5, 0.5))
+        # refill never goes beyond burst
+        self.assertEqual(take_token(0.0, 0.0, 60.0, rate=1.0, burst=2.0), (1.0, 0.0))
+
+    def test_build_rate_limit(self):
+        self.assertIsNone(build_rate_limit(None))
+        self.assertIsNone(build_rate_limit({"requestsPerSecond": "zero"}))
+        self.assertEqual(
+            build_rate_limit({"requestsPerSecond": "5", "userMaxConcurrent": 2}),
+            RateLimit(requests_per_second=5.0, user_max_concurrent=2),
+        )
+
+    def test_incomplete_store_fails_on_construction(self):
+        class IncompleteStore(RateLimitStore):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteStore()
+
+    def test_concurrency_limiter(self):
+        concurrency_limiter = ConcurrencyLimiter()
+        self.assertTrue(concurrency_limiter.acquire("key", 1))
+        self.assertFalse(concurrency_limiter.acquire("key", 1))
+        concurrency_limiter.release("key")
+        self.assertEqual(concurrency_limiter.in_flight(), 0)
+        self.assertTrue(concurrency_limiter.acquire("key", 1))
+
+
+class RateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_in_memory_store(self):
+        store = InMemoryRateLimitStore(max_keys=1)
+        self.assertEqual(await store.take("one", rate=1.0, burst=2.0), 0.0)
+        self.assertEqual(await store.take("one", rate=1.0, burst=2.0), 0.0)
+        self.assertGreater(await store.take("one", rate=1.0, burst=2.0), 0.0)
+        # least recently used bucket is dropped, so it starts full again
+        await store.take("two", rate=1.0, burst=2.0)
+        self.assertEqual(await store.take("one", rate=1.0, burst=2.0), 0.0)
+
+    async def test_rate_limit_per_user(self):
+        rate_limiter = RateLimiter(store=InMemoryRateLimitStore(max_keys=10))
+        rate_limit = RateLimit(user_requests_per_second=0.1, user_burst=1)
+        async with rate_limiter.limit(client_request("one"), "app-one", rate_limit):
+            pass
+        with self.assertRaises(HTTPException) as ex:
+            async with rate_limiter.limit(client_request("one"), "app-one", rate_limit):
+                pass
+        self.assertEqual(ex.exception.status_code, 429)
+        self.assertEqual(ex.exception.headers["Retry-After"], "10")
+        async with rate_limiter.limit(client_request("two"), "app-one", rate_limit):
+            pass
+        self.assertEqual(rate_limiter.stats()["admitted"], 2)
+        self.assertEqual(rate_limiter.stats()["rejected_rate"], 1)
+
+    async def test_user_rejection_keeps_app_tokens(self):
+        rate_limiter = RateLimiter(store=InMemoryRateLimitStore(max_keys=10))
+        rate_limit = RateLimit(
+            requests_per_second=0.1,
+            burst=2,
+            user_requests_per_second=0.1,
+            user_burst=1,
+        )
+        async with rate_limiter.limit(client_request("one"), "app-one", rate_limit):
+            pass
+        for _ in range(3):
+            with self.assertRaises(HTTPException):
+                async with rate_limiter.limit(
+                    client_request("one"), "app-one", rate_limit
+                ):
+                    pass
+        # the rejected requests of one did not take the app token left for two
+        async with rate_limiter.limit(client_request("two"), "app-one", rate_limit):
+            pass
+        self.assertEqual(rate_limiter.stats()["admitted"], 2)
+
+    async def test_held_admission_keeps_slot(self):
+        rate_limiter = RateLimiter(store=InMemoryRateLimitStore(max_keys=10))
+        rate_limit = RateLimit(max_concurrent=1)
+        async with rate_limiter.limit(
+            client_request(), "app-one", rate_limit
+        ) as admission:
+            release = admission.hold()
+        self.assertEqual(rate_limiter.stats()["in_flight"], 1)
+        release()
+        release()
+        self.assertEqual(rate_limiter.stats()["in_flight"], 0)
+
+    async def test_concurrency_limit(self):
+        rate_limiter = RateLimiter(store=InMemoryRateLimitStore(max_keys=10))
+        rate_limit = RateLimit(max_concurrent=1)
+        async with rate_limiter.limit(client_request(), "app-one", rate_limit):
+            with self.assertRaises(HTTPException) as ex:
+                async with rate_limiter.limit(client_request(), "app-one", rate_limit):
+                    pass
+            self.assertEqual(ex.exception.status_code, 429)
+        async with rate_limiter.limit(client_request(), "app-one", rate_limit):
+            self.assertEqual(rate_limiter.stats()["in_flight"], 1)
+        self.assertEqual(rate_limiter.stats()["in_flight"], 0)
+
+
+@unittest.skipUnless(MONGODB_TEST_URI, "MONGODB_TEST_URI is not set")
+class MongoRateLimitStoreTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.mongo_client = AsyncMongoClient(MONGODB_TEST_URI)
+        self.store = MongoRateLimitStore(self.mongo_client)
+        await self.store.create_indexes()
+
+    async def asyncTearDown(self):
+        await self.mongo_client.gateway.rate_limits.delete_many(
+            {"_id": "rate-limiter-test"}
+        )
+        await self.mongo_client.close()
+
+    async def test_shared_bucket(self):
+        for _ in range(2):
+            self.assertEqual(
+                await self.store.take("rate-limiter-test", rate=0.1, burst=2), 0.0
+            )
+        self.assertGreater(
+            await self.store.take("rate-limiter-test", rate=0.1, burst=2), 0.0
+        )
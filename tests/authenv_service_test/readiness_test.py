@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+from src.authenv_service import readiness
+
+
+class ReadinessTest(unittest.IsolatedAsyncioTestCase):
+    async def test_warm_up(self):
+        shutdown = AsyncMock()
+
+        async def warmup(exit_stack):
+            exit_stack.push_async_callback(shutdown)
+
+        ready = readiness.Readiness()
+        self.assertFalse(await ready.wait(timeout_seconds=0))
+        await ready.warm_up(warmup)
+        self.assertTrue(await ready.wait(timeout_seconds=0))
+        self.assertEqual(ready.stats()["attempts"], 1)
+        self.assertIsNotNone(ready.stats()["ready_seconds"])
+        shutdown.assert_not_awaited()
+        await ready.stop()
+        shutdown.assert_awaited_once()
+
+    async def test_warm_up_fails(self):
+        async def warmup(exit_stack):
+            raise ConnectionError("no database")
+
+        ready = readiness.Readiness()
+        with self.assertRaises(ConnectionError):
+            await ready.warm_up(warmup)
+        self.assertFalse(ready.is_ready)
+        self.assertEqual(ready.stats()["error"], "ConnectionError")
+
+    async def test_start_waits_and_retries_in_background(self):
+        attempts = []
+        undo = AsyncMock()
+        release = asyncio.Event()
+
+        async def warmup(exit_stack):
+            attempts.append(len(attempts) + 1)
+            exit_stack.push_async_callback(undo)
+            if len(attempts) == 1:
+                raise ConnectionError("no database")
+            await release.wait()
+
+        ready = readiness.Readiness()
+        ready.start(warmup, retry_seconds=0)
+        self.assertFalse(await ready.wait(timeout_seconds=0.01))
+        # the failed attempt is undone before the retry
+        self.assertEqual(attempts, [1, 2])
+        undo.assert_awaited_once()
+        release.set()
+        self.assertTrue(await ready.wait(timeout_seconds=1))
+        self.assertEqual(ready.stats()["attempts"], 2)
+        self.assertIsNone(ready.stats()["error"])
+        await ready.stop()
+        self.assertEqual(undo.await_count, 2)
+
+    async def test_stop_while_warming_up(self):
+        undo = AsyncMock()
+
+        async def warmup(exit_stack):
+            exit_stack.push_async_callback(undo)
+            await asyncio.Event().wait()
+
+        ready = readiness.Readiness()
+        ready.start(warmup, retry_seconds=0)
+        await asyncio.sleep(0)
+        await ready.stop()
+        self.assertFalse(ready.is_ready)
+        undo.assert_awaited_once()
+
+    def test_not_ready_response(self):
+        response = readiness.not_ready_response(retry_after_seconds=5.0)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "5")
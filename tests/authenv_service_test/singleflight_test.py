@@ -0,0 +1,58 @@
+import asyncio
+import unittest
+
+from src.authenv_service.singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_wait_without_leader(self):
+        single_flight = SingleFlight(name="test-none", max_wait_seconds=1)
+        self.assertEqual(await single_flight.wait("key"), (False, None))
+        self.assertEqual(single_flight.collapsed, 0)
+
+    async def test_waiters_get_shared_value(self):
+        single_flight = SingleFlight(name="test-share", max_wait_seconds=1)
+
+        async def leader():
+            with single_flight.lead("key") as flight:
+                self.assertTrue(flight.is_leader)
+                await asyncio.sleep(0.01)
+                flight.share("value")
+
+        task = asyncio.create_task(leader())
+        await asyncio.sleep(0)
+        self.assertTrue(single_flight.is_in_flight("key"))
+        results = await asyncio.gather(*(single_flight.wait("key") for _ in range(3)))
+        await task
+        self.assertEqual(results, [(True, "value")] * 3)
+        self.assertFalse(single_flight.is_in_flight("key"))
+        self.assertEqual(single_flight.stats()["collapsed"], 3)
+        self.assertEqual(single_flight.stats()["shared"], 3)
+
+    async def test_leader_failure_shares_nothing(self):
+        single_flight = SingleFlight(name="test-fail", max_wait_seconds=1)
+
+        async def leader():
+            with single_flight.lead("key"):
+                await asyncio.sleep(0.01)
+                raise ValueError("upstream down")
+
+        task = asyncio.create_task(leader())
+        await asyncio.sleep(0)
+        self.assertEqual(await single_flight.wait("key"), (True, None))
+        with self.assertRaises(ValueError):
+            await task
+
+    async def test_second_lead_is_not_leader(self):
+        single_flight = SingleFlight(name="test-lead", max_wait_seconds=1)
+        with single_flight.lead("key") as flight:
+            with single_flight.lead("key") as other_flight:
+                self.assertTrue(flight.is_leader)
+                self.assertFalse(other_flight.is_leader)
+        self.assertEqual(single_flight.leaders, 1)
+
+    async def test_wait_is_bounded(self):
+        single_flight = SingleFlight(name="test-wait", max_wait_seconds=0.01)
+        with single_flight.lead("key"):
+            self.assertEqual(await single_flight.wait("key"), (True, None))
+        self.assertEqual(single_flight.timeouts, 1)
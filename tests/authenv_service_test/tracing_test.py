@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from starlette.requests import Request
+
+from src.authenv_service.tracing import (
+    FileSpanExporter,
+    InMemorySpanExporter,
+    SpanExporter,
+    Tracer,
+    get_trace_id,
+    parse_traceparent,
+)
+
+TRACEPARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+def traced_request(traceparent=None):
+    headers = [(b"traceparent", traceparent.encode())] if traceparent else []
+    return Request(
+        scope={"type": "http", "path": "/", "headers": headers, "query_string": b""}
+    )
+
+
+class TracingTest(unittest.TestCase):
+    def test_parse_traceparent(self):
+        trace_context = parse_traceparent(TRACEPARENT)
+        self.assertEqual(trace_context.trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+        self.assertEqual(trace_context.span_id, "00f067aa0ba902b7")
+        self.assertEqual(trace_context.traceparent(), TRACEPARENT)
+        # later versions may carry more fields
+        self.assertIsNotNone(parse_traceparent("01" + TRACEPARENT[2:] + "-more"))
+
+    def test_parse_traceparent_invalid(self):
+        for traceparent in (
+            None,
+            "",
+            "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7",
+            "ff" + TRACEPARENT[2:],
+            TRACEPARENT + "-more",
+            "00-00000000000000000000000000000000-00f067aa0ba902b7-01",
+            "00-4bf92f3577b34da6a3ce929d0e0e4736-0000000000000000-01",
+            "00-4bf92f3577b34da6a3ce929d0e0e473g-00f067aa0ba902b7-01",
+            "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b-01",
+        ):
+            self.assertIsNone(parse_traceparent(traceparent), traceparent)
+
+    def test_spans_nest(self):
+        exporter = InMemorySpanExporter(max_spans=10)
+        tracer = Tracer(exporter=exporter)
+        request = traced_request()
+        with tracer.span(request, "root") as root:
+            with tracer.span(request, "child") as child:
+                self.assertEqual(child.parent_span_id, root.span_id)
+            self.assertEqual(request.state.trace_context.span_id, root.span_id)
+        self.assertIsNone(root.parent_span_id)
+        self.assertEqual(get_trace_id(request), root.trace_id)
+        self.assertEqual(
+            [s.name for s in exporter.spans(root.trace_id)], ["child", "root"]
+        )
+
+    def test_span_continues_caller_trace_and_records_error(self):
+        exporter = InMemorySpanExporter(max_spans=1)
+        tracer = Tracer(exporter=exporter)
+        request = traced_request(TRACEPARENT)
+        with self.assertRaises(ValueError):
+            with tracer.span(request, "root"):
+                raise ValueError("some error")
+        (span,) = exporter.spans()
+        self.assertEqual(span.trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+        self.assertEqual(span.parent_span_id, "00f067aa0ba902b7")
+        self.assertEqual(span.error, "ValueError")
+
+    def test_file_exporter(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_location = os.path.join(tmp_dir, "spans.jsonl")
+            exporter = FileSpanExporter(file_location=file_location, queue_max_size=10)
+            tracer = Tracer(exporter=exporter)
+            with tracer.span(traced_request(TRACEPARENT), "root", appname="app-one"):
+                time.sleep(0.001)
+            exporter.stop()
+            with open(file_location, encoding="utf-8") as spans_file:
+                span = json.loads(spans_file.readline())
+        self.assertEqual(span["name"], "root")
+        self.assertEqual(span["attributes"], {"appname": "app-one"})
+        self.assertGreater(span["duration_seconds"], 0)
+
+    def test_incomplete_exporter_fails_on_construction(self):
+        class IncompleteExporter(SpanExporter):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteExporter()
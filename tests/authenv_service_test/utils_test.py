@@ -1,8 +1,42 @@
-from unittest.mock import Mock
+import unittest
+from unittest.mock import Mock, patch
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
 from starlette.requests import Request
 
+from src.authenv_service import utils
+
 app = FastAPI()
 app.mongo_client = Mock()
 dummy_request = Request(scope={"type": "http", "app": app})
+dummy_url_request = Request(
+    scope={"type": "http", "app": app, "path": "/", "headers": [], "query_string": b""}
+)
+
+
+class UtilsTest(unittest.TestCase):
+    def setUp(self):
+        utils.token_cache.clear()
+
+    def test_validate_http_auth_credentials_caches_token(self):
+        token = utils.encode_http_auth_credentials("some-user", "127.0.0.1")
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        hits = utils.token_cache.hits
+        for _ in range(3):
+            self.assertEqual(
+                utils.validate_http_auth_credentials(dummy_request, credentials),
+                "some-user",
+            )
+        self.assertEqual(utils.token_cache.hits, hits + 2)
+        self.assertEqual(len(utils.token_cache), 1)
+
+    def test_validate_http_auth_credentials_flushes_on_secret_rotation(self):
+        token = utils.encode_http_auth_credentials("some-user", "127.0.0.1")
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        utils.validate_http_auth_credentials(dummy_request, credentials, "some-user")
+        with patch.object(utils.constants, "SECRET_KEY", "rotated-secret-key"):
+            with self.assertRaises(HTTPException) as ex:
+                utils.validate_http_auth_credentials(dummy_url_request, credentials)
+        self.assertEqual(ex.exception.status_code, 401)
+        self.assertEqual(len(utils.token_cache), 0)